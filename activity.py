@@ -0,0 +1,325 @@
+"""
+Unbounded, append-only activity log kept outside the main database.
+
+Profile activity ("Recent Activity") and rebalance summaries ("Rebalancing
+History") used to live in capped lists inside each profile document. They are
+now appended to a separate SQLite file as events are committed, so history
+grows without bound while the database document stays small:
+
+- appends are O(log n) inserts; nothing is ever rewritten or truncated
+- (profile, kind, ts) is indexed, so pages and time ranges are read with a
+  keyset cursor in O(page) however long the history is
+- messages are indexed with SQLite FTS5 for keyword search (plain LIKE
+  matching when the SQLite build lacks FTS5)
+
+The same file holds the global audit stream: one row per event and ticker
+across all profiles (trades, asset edits, settings), indexed by timestamp,
+profile and ticker, so questions like "all AAPL trades last quarter" are
+answered from an index range instead of by loading profiles.
+
+Entries recorded in the capped lists of older databases, and their
+purchases and rebalance events, are imported once per profile (see
+`import_profile`; `python -m activity import` backfills every profile).
+
+Usage:
+    python -m activity import
+    python -m activity audit --ticker AAPL --since 2025-07-01 --until 2025-09-30 --trades
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import events as ev
+
+ACTIVITY_PATH = os.environ.get("ALPHASTREAM_ACTIVITY_DB", "alphastream_activity.db")
+
+ACTIVITY = "activity"    # event log messages
+REBALANCE = "rebalance"  # rebalance summary lines
+
+PAGE_SIZE = 10
+
+ACTIVITY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_profile_kind_ts ON entries (profile, kind, ts);
+CREATE TABLE IF NOT EXISTS imported (
+    profile TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS audit (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    type TEXT NOT NULL,
+    ticker TEXT,
+    quantity REAL,
+    price REAL,
+    amount REAL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS audit_ts ON audit (ts);
+CREATE INDEX IF NOT EXISTS audit_profile_ts ON audit (profile, ts);
+CREATE INDEX IF NOT EXISTS audit_ticker_ts ON audit (ticker, ts);
+"""
+
+AUDIT_FIELDS = ["id", "ts", "profile", "type", "ticker", "quantity", "price", "amount", "message"]
+
+# Event types that move units
+TRADE_TYPES = (ev.DEPLOYMENT, ev.REBALANCE)
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(message, content='entries', content_rowid='id');
+"""
+
+
+def entries_for(event):
+    """(kind, message) pairs an event adds to the activity log."""
+    entries = []
+    if event.get("log"):
+        entries.append((ACTIVITY, str(event["log"])))
+    if event.get("stat"):
+        entries.append((REBALANCE, str(event["stat"])))
+    return entries
+
+
+def audit_rows(event):
+    """
+    (ts, profile, type, ticker, quantity, price, amount, message) rows of an
+    event: one per ticker it touches, or a single row without a ticker.
+    """
+    ts, name, kind, message = event["ts"], event["profile"], event["type"], event.get("log")
+    if kind == ev.DEPLOYMENT:
+        # Stamped with the trade date the user recorded, like imported purchases
+        return [(str(p.get("date", ts)), name, kind, t, p.get("quantity"), p.get("price"), p.get("amount"), message)
+                for t, p in event["purchases"].items()]
+    if kind == ev.REBALANCE:
+        prices = event.get("prices", {})
+        return [(ts, name, kind, t, change, prices.get(t),
+                 change * prices[t] if t in prices else None, event.get("stat"))
+                for t, change in event["changes"].items()]
+    if kind == ev.ASSET_UPSERTED:
+        return [(ts, name, kind, event["ticker"], event["units"], event.get("price"), None, message)]
+    if kind == ev.ASSET_REMOVED:
+        return [(ts, name, kind, event["ticker"], None, None, None, message)]
+    if kind == ev.SETTINGS_CHANGED:
+        return [(ts, name, kind, None, None, None, None, message or json.dumps(event["changes"], default=str))]
+    return [(ts, name, kind, None, None, None, None, message)]
+
+
+def _legacy_audit_rows(name, prof):
+    """Audit rows for the purchases and rebalance events of a profile saved before the audit log."""
+    rows = []
+    for t, asset in prof.get("assets", {}).items():
+        for p in asset.get("purchases", []):
+            rows.append((str(p.get("date", "")), name, ev.DEPLOYMENT, t, p.get("quantity"), p.get("price"),
+                         p.get("amount"), None))
+    for e in prof.get("rebalance_events", []):
+        rows.extend((str(e.get("date", "")), name, ev.REBALANCE, t, change, None, None, None)
+                    for t, change in e.get("changes", {}).items())
+    return sorted(rows, key=lambda r: r[0])
+
+
+def _fts_query(text):
+    """Quote every word so user input is matched as keywords, not FTS syntax."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class ActivityLog:
+    """Per-profile activity entries with time-ordered paging and keyword search."""
+
+    def __init__(self, path=ACTIVITY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(ACTIVITY_SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self._imported = {row[0] for row in self._conn.execute("SELECT profile FROM imported")}
+
+    def close(self):
+        self._conn.close()
+
+    def _insert(self, c, rows):
+        """Insert (ts, profile, kind, message) rows and index their messages."""
+        for row in rows:
+            rowid = c.execute("INSERT INTO entries (ts, profile, kind, message) VALUES (?, ?, ?, ?)", row).lastrowid
+            if self.fts:
+                c.execute("INSERT INTO entries_fts (rowid, message) VALUES (?, ?)", (rowid, row[3]))
+
+    @staticmethod
+    def _insert_audit(c, rows):
+        c.executemany("INSERT INTO audit (ts, profile, type, ticker, quantity, price, amount, message) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def record(self, events):
+        """Append the log entries and audit rows of committed events."""
+        rows = [(e["ts"], e["profile"], kind, message) for e in events for kind, message in entries_for(e)]
+        audit = [row for e in events for row in audit_rows(e)]
+        # Profiles created from here on have no history to import
+        created = [e["profile"] for e in events if e["type"] == ev.PROFILE_CREATED]
+        with self._lock, self._conn as c:
+            self._insert(c, rows)
+            self._insert_audit(c, audit)
+            c.executemany("INSERT OR IGNORE INTO imported (profile) VALUES (?)", [(n,) for n in created])
+        self._imported.update(created)
+
+    def append(self, profile, kind, message, ts):
+        with self._lock, self._conn as c:
+            self._insert(c, [(ts, profile, kind, str(message))])
+
+    def import_profile(self, name, prof):
+        """
+        Import the capped `rebalance_logs` / `rebalance_stats` lists, purchases
+        and rebalance events of a profile saved before this log existed. Runs
+        once per profile name.
+        """
+        if name in self._imported:
+            return 0
+        rows = [(e.get("date", ""), name, ACTIVITY, str(e.get("event", ""))) for e in prof.get("rebalance_logs", [])]
+        # Summary lines start with their "YYYY-mm-dd HH:MM" timestamp
+        rows += [(str(s)[:16], name, REBALANCE, str(s)) for s in prof.get("rebalance_stats", [])]
+        with self._lock, self._conn as c:
+            # Lists are newest first; insert oldest first so ids follow time
+            self._insert(c, reversed(rows))
+            self._insert_audit(c, _legacy_audit_rows(name, prof))
+            c.execute("INSERT OR IGNORE INTO imported (profile) VALUES (?)", (name,))
+        self._imported.add(name)
+        return len(rows)
+
+    def page(self, profile, kind=ACTIVITY, before=None, limit=PAGE_SIZE, query=None, since=None, until=None):
+        """
+        Newest-first page of a profile's entries.
+
+        Args:
+            profile: Profile name
+            kind: ACTIVITY or REBALANCE
+            before: Cursor returned by the previous page (None for the newest)
+            limit: Page size
+            query: Keywords that must all appear in the message
+            since, until: Optional "YYYY-mm-dd[ HH:MM]" bounds (inclusive)
+
+        Returns:
+            tuple: (list of entry dicts, cursor for the next older page or None)
+        """
+        sql = "SELECT e.id, e.ts, e.profile, e.kind, e.message FROM entries e"
+        where, params = ["e.profile = ?", "e.kind = ?"], [profile, kind]
+        if query and query.strip():
+            if self.fts:
+                # Matched once through the FTS index, not per row of the profile scan
+                where.append("e.id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+                params.append(_fts_query(query))
+            else:
+                for word in query.split():
+                    where.append("e.message LIKE ?")
+                    params.append(f"%{word}%")
+        if since:
+            where.append("e.ts >= ?")
+            params.append(since)
+        if until:
+            where.append("e.ts <= ?")
+            params.append(until + "\uffff")
+        if before:
+            where.append("(e.ts, e.id) < (?, ?)")
+            params.extend(before)
+        sql += f" WHERE {' AND '.join(where)} ORDER BY e.ts DESC, e.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        entries = [dict(zip(("id", "ts", "profile", "kind", "message"), r)) for r in rows[:limit]]
+        cursor = (entries[-1]["ts"], entries[-1]["id"]) if len(rows) > limit else None
+        return entries, cursor
+
+    def count(self, profile, kind=ACTIVITY):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE profile = ? AND kind = ?", (profile, kind)).fetchone()[0]
+
+    def audit(self, since=None, until=None, profile=None, ticker=None, types=None, limit=1000):
+        """
+        Cross-profile audit rows, newest first.
+
+        Args:
+            since, until: Optional "YYYY-mm-dd[ HH:MM:SS]" bounds (inclusive)
+            profile: Only this profile
+            ticker: Only rows for this ticker
+            types: Only these event types (e.g. TRADE_TYPES)
+            limit: Maximum rows (None for all)
+
+        Returns:
+            list of dicts with AUDIT_FIELDS keys
+        """
+        where, params = [], []
+        for column, value in (("profile", profile), ("ticker", ticker)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if types:
+            where.append(f"type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+        if since:
+            where.append("ts >= ?")
+            params.append(since)
+        if until:
+            where.append("ts <= ?")
+            params.append(until + "\uffff")
+        sql = f"SELECT {', '.join(AUDIT_FIELDS)} FROM audit"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        sql += " ORDER BY ts DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(zip(AUDIT_FIELDS, row)) for row in self._conn.execute(sql, params)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AlphaStream activity and audit log tools")
+    parser.add_argument("--path", default=ACTIVITY_PATH, help="Activity log file (default: ALPHASTREAM_ACTIVITY_DB)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import the history stored in every profile of the database")
+    imp.add_argument("--storage", default=None, help="Storage backend (default: ALPHASTREAM_STORAGE)")
+    imp.add_argument("--db", default=None, help="Database path (default: ALPHASTREAM_DB_PATH)")
+    query = sub.add_parser("audit", help="Query the cross-profile audit log")
+    query.add_argument("--since", default=None, help="YYYY-mm-dd")
+    query.add_argument("--until", default=None, help="YYYY-mm-dd")
+    query.add_argument("--profile", default=None)
+    query.add_argument("--ticker", default=None)
+    query.add_argument("--trades", action="store_true", help="Only deployments and rebalance trades")
+    query.add_argument("--limit", type=int, default=1000, help="Maximum rows (0 for all)")
+    query.add_argument("--format", choices=["csv", "json"], default="csv")
+    args = parser.parse_args(argv)
+
+    log = ActivityLog(args.path)
+    if args.command == "import":
+        from storage import STORAGE_BACKEND, STORAGE_PATH, open_backend
+        db = open_backend(args.storage or STORAGE_BACKEND, args.db or STORAGE_PATH).load()
+        count = sum(log.import_profile(name, prof) for name, prof in db["profiles"].items())
+        print(f"Imported {count} log entries from {len(db['profiles'])} profile(s) into {args.path}")
+    else:
+        rows = log.audit(args.since, args.until, args.profile, args.ticker and args.ticker.upper(),
+                         TRADE_TYPES if args.trades else None, args.limit or None)
+        if args.format == "json":
+            json.dump(rows, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            writer = csv.DictWriter(sys.stdout, fieldnames=AUDIT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Return analytics: time- and money-weighted returns, risk and rolling windows.
+
+- TWR: compounded flow-free daily returns (see valuation.portfolio_returns),
+  so deposits and their timing do not count as performance
+- XIRR: money-weighted return over the actual purchase cash flows plus
+  today's value, solved with Newton's method (bisection fallback)
+- volatility, Sharpe and Sortino ratios (annualized, ALPHASTREAM_RISK_FREE)
+- maximum drawdown of the TWR wealth index
+- rolling 1/3/5-year annualized returns: latest, best and worst window
+
+The TWR-based statistics are kept as running state (sums, log wealth,
+running peak, best/worst windows) that `AnalyticsCache` extends with only
+the days that arrived since the last call, instead of recomputing them from
+inception. The latest day is applied on top of the stored state without
+being committed, since today's bar may still change.
+"""
+import copy
+import math
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+# Annual risk-free rate in percent, used by the Sharpe and Sortino ratios
+RISK_FREE_RATE = float(os.environ.get("ALPHASTREAM_RISK_FREE", "0"))
+
+ROLLING_YEARS = (1, 3, 5)
+
+ANALYTICS_CACHE_SIZE = 64
+
+
+class ReturnState:
+    """Running statistics of a daily return series, extendable in O(new days)."""
+
+    def __init__(self):
+        self.start = None       # first return date
+        self.end = None         # last return date included
+        self.last_return = None
+        self.size = 0           # days, including days with nothing held
+        self.n = 0              # days with a return
+        self.s1 = 0.0           # sum of returns
+        self.s2 = 0.0           # sum of squared returns
+        self.down2 = 0.0        # sum of squared negative returns
+        self.peak = 0.0         # running maximum of log wealth
+        self.max_drawdown = 0.0
+        self.best = {y: None for y in ROLLING_YEARS}
+        self.worst = {y: None for y in ROLLING_YEARS}
+        # Log wealth after each day; a growable buffer, only [:size] is valid
+        self._log_wealth = np.zeros(1024)
+
+    def _wealth_at(self, positions):
+        """Log wealth at day positions; position -1 is the start (0.0)."""
+        positions = np.asarray(positions)
+        return np.where(positions >= 0, self._log_wealth[np.maximum(positions, 0)], 0.0)
+
+    def extend(self, returns):
+        """Add the days of a return Series (NaN: nothing held, counted as flat)."""
+        if not len(returns):
+            return self
+        r = returns.to_numpy(dtype="float64")
+        held = ~np.isnan(r)
+        flat = np.where(held, r, 0.0)
+
+        k = len(r)
+        if self.size + k > len(self._log_wealth):
+            grown = np.zeros(max(2 * len(self._log_wealth), self.size + k))
+            grown[:self.size] = self._log_wealth[:self.size]
+            self._log_wealth = grown
+        previous = self._log_wealth[self.size - 1] if self.size else 0.0
+        lw = previous + np.cumsum(np.log1p(flat))
+        positions = np.arange(self.size, self.size + k)
+        self._log_wealth[positions] = lw
+
+        valid = r[held]
+        self.n += len(valid)
+        self.s1 += float(valid.sum())
+        self.s2 += float((valid ** 2).sum())
+        self.down2 += float((np.minimum(valid, 0.0) ** 2).sum())
+
+        peaks = np.maximum.accumulate(np.maximum(lw, self.peak))
+        self.peak = float(peaks[-1])
+        self.max_drawdown = min(self.max_drawdown, float(np.expm1(lw - peaks).min()))
+
+        for years in ROLLING_YEARS:
+            window = years * TRADING_DAYS
+            ends = positions[positions >= window - 1]
+            if not len(ends):
+                continue
+            annualized = np.expm1((self._log_wealth[ends] - self._wealth_at(ends - window)) / years)
+            best, worst = float(annualized.max()), float(annualized.min())
+            self.best[years] = best if self.best[years] is None else max(self.best[years], best)
+            self.worst[years] = worst if self.worst[years] is None else min(self.worst[years], worst)
+
+        self.start = self.start if self.start is not None else returns.index[0]
+        self.end = returns.index[-1]
+        self.last_return = r[-1]
+        self.size += k
+        return self
+
+    def tail(self, returns):
+        """A copy extended with `returns`; the stored history buffer is shared, not copied."""
+        state = copy.copy(self)
+        state.best, state.worst = dict(self.best), dict(self.worst)
+        return state.extend(returns)
+
+    def metrics(self, risk_free=RISK_FREE_RATE):
+        """Annualized statistics of the days seen so far (fractions, not percent)."""
+        log_wealth = self._log_wealth[self.size - 1] if self.size else 0.0
+        mean = self.s1 / self.n if self.n else float("nan")
+        var = (self.s2 - self.n * mean ** 2) / (self.n - 1) if self.n > 1 else float("nan")
+        volatility = math.sqrt(max(var, 0.0) * TRADING_DAYS) if self.n > 1 else float("nan")
+        downside = math.sqrt(self.down2 / self.n * TRADING_DAYS) if self.n else float("nan")
+        excess = mean * TRADING_DAYS - risk_free / 100 if self.n else float("nan")
+
+        rolling = {}
+        for years in ROLLING_YEARS:
+            window = years * TRADING_DAYS
+            latest = None
+            if self.size >= window:
+                start = self._wealth_at([self.size - 1 - window])[0]
+                latest = float(np.expm1((log_wealth - start) / years))
+            rolling[f"{years}y"] = {"latest": latest, "best": self.best[years], "worst": self.worst[years]}
+
+        return {
+            "twr": float(np.expm1(log_wealth)),
+            "twr_annualized": float(np.expm1(log_wealth * TRADING_DAYS / self.size)) if self.size else float("nan"),
+            "volatility": volatility,
+            "sharpe": excess / volatility if volatility else float("nan"),
+            "sortino": excess / downside if downside else float("nan"),
+            "max_drawdown": self.max_drawdown,
+            "rolling": rolling,
+            "days": self.size,
+        }
+
+
+def xirr(dates, amounts, guess=0.1, tol=1e-10, max_iter=100):
+    """
+    Money-weighted annual return of dated cash flows (investments negative).
+
+    Returns:
+        float, or None when the flows do not change sign or no rate is found
+    """
+    amounts = np.asarray(amounts, dtype="float64")
+    if not len(amounts) or amounts.min() >= 0 or amounts.max() <= 0:
+        return None
+    # Net the flows per day: the solver then works on distinct dates only
+    days, inverse = np.unique(np.asarray(dates, dtype="datetime64[D]").astype("int64"), return_inverse=True)
+    amounts = np.bincount(inverse, weights=amounts)
+    t = (days - days.min()) / 365.0
+
+    def npv(rate):
+        return float((amounts * (1.0 + rate) ** -t).sum())
+
+    rate = guess
+    for _ in range(max_iter):
+        value = npv(rate)
+        slope = float((-t * amounts * (1.0 + rate) ** (-t - 1.0)).sum())
+        if slope == 0:
+            break
+        step = value / slope
+        rate -= step
+        if rate <= -1:
+            break
+        if abs(step) < tol:
+            return rate
+
+    # Newton failed to converge: bisect, NPV falls as the rate rises for investment-first flows
+    lo, hi = -0.9999, 10.0
+    if npv(lo) * npv(hi) > 0:
+        return None
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if npv(lo) * npv(mid) <= 0:
+            hi = mid
+        else:
+            lo = mid
+        if hi - lo < tol:
+            break
+    return (lo + hi) / 2
+
+
+def cash_flows(prof, curr_v, as_of):
+    """
+    Dated cash flows of a profile: each purchase as an investment (negative)
+    and the current value as the final inflow. Without recorded purchases the
+    principal is taken as invested on the start date.
+    """
+    dates, amounts = [], []
+    for asset in prof.get("assets", {}).values():
+        for p in asset.get("purchases", []):
+            if p.get("amount"):
+                dates.append(str(p["date"])[:10])
+                amounts.append(-float(p["amount"]))
+    if not amounts and prof.get("principal"):
+        dates.append(prof.get("start_date", str(as_of)[:10]))
+        amounts.append(-float(prof["principal"]))
+    dates.append(str(as_of)[:10])
+    amounts.append(float(curr_v))
+    return dates, amounts
+
+
+class AnalyticsCache:
+    """Per-profile running return statistics, extended as new price days arrive."""
+
+    def __init__(self, max_profiles=ANALYTICS_CACHE_SIZE):
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._states = OrderedDict()  # name -> (key, ReturnState)
+        self.extended = 0
+        self.rebuilt = 0
+
+    def _state(self, name, key, committed):
+        """Stored state for `name`, extended to the end of `committed` (rebuilt if history differs)."""
+        entry = self._states.get(name)
+        if entry is not None and entry[0] == key:
+            state = entry[1]
+            end = state.end
+            # Reuse only if the stored history is still a prefix of the new series
+            if end is None or (end in committed.index and committed.index[0] == state.start
+                               and np.isclose(committed.at[end], state.last_return, equal_nan=True)):
+                new = committed[committed.index > end] if end is not None else committed
+                if len(new):
+                    state.extend(new)
+                    self.extended += 1
+                self._states.move_to_end(name)
+                return state
+        state = ReturnState().extend(committed)
+        self.rebuilt += 1
+        self._states[name] = (key, state)
+        self._states.move_to_end(name)
+        while len(self._states) > self.max_profiles:
+            self._states.popitem(last=False)
+        return state
+
+    def analyze(self, name, key, daily_ret, prof, curr_v):
+        """
+        Return analytics of a profile.
+
+        Args:
+            name: Profile name
+            key: Anything that changes when the profile's holdings history
+                changes (e.g. its store version)
+            daily_ret: Flow-free daily returns (analyze_portfolio()["daily_ret"])
+            prof: Profile dict (purchases give the XIRR cash flows)
+            curr_v: Current portfolio value
+
+        Returns:
+            dict: ReturnState.metrics() plus "xirr"
+        """
+        with self._lock:
+            state = self._state(name, key, daily_ret.iloc[:-1])
+            # Today's bar may still move: applied on a copy, never stored
+            result = state.tail(daily_ret.iloc[-1:]).metrics()
+        as_of = daily_ret.index[-1] if len(daily_ret) else datetime.now()
+        result["xirr"] = xirr(*cash_flows(prof, curr_v, as_of))
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
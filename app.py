@@ -1,11 +1,39 @@
 import streamlit as st
-import yfinance as yf
+import os
 import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
 from datetime import datetime, date, timedelta
-import json
-import os
+
+from activity import ACTIVITY, REBALANCE, TRADE_TYPES, ActivityLog
+from analytics import AnalyticsCache
+from backtest import FREQUENCIES, Policy, backtest, policy_grid, prepare_prices
+from benchmarks import (
+    BENCHMARK_OPTIONS,
+    BenchmarkEngine,
+    growth,
+    parse_benchmark,
+    profile_benchmarks,
+    relative_metrics,
+)
+from chart_data import downsample, reference_line, use_webgl
+import events
+from memo import ResultCache, dashboard_key, profile_key
+from portfolio import (
+    allocation_rows as build_allocation_rows,
+    analyze_portfolio,
+    check_recently_rebalanced,
+    dashboard_summary,
+    rebalance_plan,
+    rebalance_rows,
+)
+from price_store import PriceStore
+from providers import provider_from_env
+from quotes import QuoteService
+from rebalance import LOT_SIZE
+from shared_store import ConflictError, SharedStore
+from storage import profile_index
+from symbols import SymbolUniverse
+from ticker_meta import TickerMetadataIndex
+from valuation import unit_changes
 
 # ===== CONFIGURATION =====
 st.set_page_config(
@@ -16,10 +44,15 @@ st.set_page_config(
 )
 
 # ===== PREMIUM STYLING =====
+# Set ALPHASTREAM_WEB_FONTS=0 to skip the Google Fonts request (system font stack instead)
+if os.environ.get("ALPHASTREAM_WEB_FONTS", "1") == "1":
+    st.markdown("""
+        <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+        <link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap">
+    """, unsafe_allow_html=True)
+
 st.markdown("""
     <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
     html, body, [class*="css"] {
         font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
     }
@@ -207,44 +240,83 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ===== PERSISTENCE LAYER =====
-DB_FILE = "alphastream_wealth.json"
+# ===== MARKET DATA =====
+@st.cache_resource
+def get_price_provider():
+    """Market-data source selected by ALPHASTREAM_PROVIDER (yfinance or replay)"""
+    return provider_from_env()
+
+@st.cache_resource
+def get_price_store():
+    """Process-wide local price-history store shared by all sessions"""
+    return PriceStore(provider=get_price_provider())
+
+@st.cache_resource
+def get_benchmark_engine():
+    """Benchmark return series shared by all profiles and sessions"""
+    return BenchmarkEngine(get_price_store())
 
-def load_db():
-    base_schema = {"profiles": {}, "global_logs": []}
-    if os.path.exists(DB_FILE):
-        with open(DB_FILE, "r") as f:
-            try: 
-                data = json.load(f)
-                data.setdefault("profiles", {})
-                data.setdefault("global_logs", [])
-                for p in data["profiles"].values():
-                    p.setdefault("drift_tolerance", 5.0)
-                    p.setdefault("rebalance_stats", [])
-                    p.setdefault("last_rebalanced", None)
-                    p.setdefault("benchmark", None)
-                    # ASSET ALLOCATION: Add new tracking field
-                    p.setdefault("allocated_pct", 0.0)
-                    # ASSET ALLOCATION: Ensure all assets have purchases list
-                    for asset_key, asset_data in p.get("assets", {}).items():
-                        asset_data.setdefault("purchases", [])
-                return data
-            except: 
-                return base_schema
-    return base_schema
+@st.cache_resource
+def get_quote_service():
+    """Process-wide latest-quote cache shared by all sessions"""
+    return QuoteService(provider=get_price_provider())
 
-def save_db(data):
-    with open(DB_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+@st.cache_resource
+def get_ticker_metadata():
+    """Process-wide ticker metadata index (names, exchange, currency)"""
+    return TickerMetadataIndex(provider=get_price_provider())
+
+@st.cache_resource
+def get_symbol_universe():
+    """Process-wide symbol index for ticker validation and autocomplete"""
+    return SymbolUniverse()
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide LRU of valuation, drift and table results"""
+    return ResultCache()
+
+@st.cache_resource
+def get_return_analytics():
+    """Per-profile running return statistics, extended as new price days arrive"""
+    return AnalyticsCache()
+
+# ===== SHARED DATABASE =====
+@st.cache_resource
+def get_activity_log():
+    """Append-only activity log (outside the database) shared by all sessions"""
+    return ActivityLog()
+
+@st.cache_resource
+def get_shared_store():
+    """Database parsed once per process and shared by all sessions"""
+    return SharedStore(activity=get_activity_log())
+
+def commit_event(event, expected=None):
+    """
+    Commit an event through the shared store.
+
+    `expected` is the profile version the user acted on; it defaults to the
+    version displayed by the previous full run. Fragments pass the version
+    they were rendered with, since their reruns skip the top of the script.
+    If another session changed the profile since, the whole app is rerun to
+    load the latest version and the conflict is reported there.
+    """
+    name = event["profile"]
+    if expected is None:
+        expected = seen_versions.get(name, db_versions.get(name, 0))
+    try:
+        st.session_state.seen_versions[name] = store.commit([event], expected)
+        return True
+    except ConflictError:
+        st.session_state.seen_versions.pop(name, None)
+        st.session_state.conflict_notice = f"⚠️ '{name}' was changed in another session. The latest version has been loaded — please review and retry."
+        st.rerun()
 
-def log_profile(prof, message):
-    prof.setdefault("rebalance_logs", [])
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    prof["rebalance_logs"].insert(0, {
-        "date": timestamp, 
-        "event": str(message)
-    })
-    prof["rebalance_logs"] = prof["rebalance_logs"][:50]
+# Partial reruns need st.fragment (Streamlit >= 1.37; experimental_fragment since 1.33).
+# On older versions sections simply run as part of the full script.
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+HAS_FRAGMENTS = hasattr(st, "fragment") or hasattr(st, "experimental_fragment")
 
 def description_box(title, content):
     st.markdown(f'''
@@ -254,96 +326,568 @@ def description_box(title, content):
         </div>
     ''', unsafe_allow_html=True)
 
-def check_recently_rebalanced(last_rebalanced_str):
-    """Check if portfolio was rebalanced in last 24 hours"""
-    if not last_rebalanced_str:
-        return False
-    try:
-        last_rebal_time = datetime.strptime(last_rebalanced_str, "%Y-%m-%d %H:%M:%S")
-        hours_since = (datetime.now() - last_rebal_time).total_seconds() / 3600
-        return hours_since < 24
-    except:
-        return False
+# ===== SIDEBAR SECTIONS =====
+# Each section is a fragment: interacting with its widgets reruns only that
+# section, not the portfolio analysis. Saving calls st.rerun() for a full rerun.
+def use_suggested_ticker():
+    """Copy the picked autocomplete suggestion into the ticker input"""
+    if st.session_state.ticker_suggestion:
+        st.session_state.ticker_input = st.session_state.ticker_suggestion
 
-# ASSET ALLOCATION: New function to calculate average cost per asset
-def calculate_average_cost(asset_data, allocated_pct):
-    """
-    Calculate weighted average cost for an asset.
-    Returns None if portfolio not fully allocated (allocated_pct < 100).
+@fragment
+def drift_strategy_section(prof, version):
+    """Drift tolerance setting"""
+    # Drift Strategy
+    st.markdown("### ⚙️ Drift Strategy")
+    st.caption("Set tolerance threshold for rebalance alerts")
+    with st.expander("ℹ️ What is drift tolerance?", expanded=False):
+        st.markdown("""
+        **Drift tolerance** controls when you get rebalancing alerts.
+        
+        - If an asset's current % differs from target % by more than this amount, you'll see a 🚨 alert
+        - **Example:** 5% tolerance means AAPL at 30% (target 25%) triggers an alert
+        - **Lower tolerance** = more frequent rebalancing, tighter control
+        - **Higher tolerance** = less frequent rebalancing, more flexibility
+        """)
     
-    Args:
-        asset_data: Asset dict with 'purchases' list
-        allocated_pct: Total portfolio allocation percentage
+    new_tolerance = st.number_input(
+        "Drift Tolerance (%)",
+        value=float(prof.get('drift_tolerance', 5.0)),
+        min_value=0.5,
+        max_value=20.0,
+        step=0.5,
+        help="Alert when any asset drifts this much from target",
+        key="drift_tolerance_input"
+    )
+    if st.button("💾 Update Tolerance", use_container_width=True, key="update_tolerance"):
+        event = events.settings_changed(
+            st.session_state.active_profile,
+            log=f"Updated drift tolerance to {new_tolerance}%",
+            drift_tolerance=new_tolerance
+        )
+        if commit_event(event, version):
+            st.success("✅ Updated!")
+            st.rerun()
     
-    Returns:
-        float or None: Average cost per unit, or None if not fully allocated
-    """
-    # CRITICAL: Only calculate after full allocation
-    if allocated_pct < 100.0:
-        return None
+    with st.expander("🧮 Trade Settings", expanded=False):
+        st.caption("Rebalance trades are whole lots and never spend more cash than the sales raise")
+        lot_size = st.number_input(
+            "Lot Size (shares)",
+            value=float(prof.get('lot_size') or LOT_SIZE),
+            min_value=0.0001,
+            step=1.0,
+            help="Trade in multiples of this many shares (use 0.001 for fractional shares)",
+            key="lot_size_input"
+        )
+        min_trade = st.number_input(
+            "Minimum Trade ($)",
+            value=float(prof.get('min_trade', 0.0)),
+            min_value=0.0,
+            step=50.0,
+            help="Skip trades worth less than this",
+            key="min_trade_input"
+        )
+        no_trade_band = st.number_input(
+            "No-Trade Band (%)",
+            value=float(prof.get('no_trade_band', 0.0)),
+            min_value=0.0,
+            max_value=20.0,
+            step=0.25,
+            help="Leave assets alone while their drift is within this many percentage points",
+            key="no_trade_band_input"
+        )
+        relief_methods = {"FIFO (first in, first out)": "FIFO", "LIFO (last in, first out)": "LIFO", "HIFO (highest cost first)": "HIFO"}
+        lot_method = st.selectbox(
+            "Tax-Lot Relief",
+            options=list(relief_methods.keys()),
+            index=list(relief_methods.values()).index(prof.get('lot_method')) if prof.get('lot_method') in relief_methods.values() else 0,
+            help="Which purchase lots a sale consumes; determines realized gains",
+            key="lot_method_input"
+        )
+        if st.button("💾 Save Trade Settings", use_container_width=True, key="save_trade_settings"):
+            event = events.settings_changed(
+                st.session_state.active_profile,
+                log=f"Updated trade settings: lot {lot_size:g}, min trade ${min_trade:,.0f}, band {no_trade_band}%, {relief_methods[lot_method]}",
+                lot_size=lot_size,
+                min_trade=min_trade,
+                no_trade_band=no_trade_band,
+                lot_method=relief_methods[lot_method]
+            )
+            if commit_event(event, version):
+                st.success("✅ Updated!")
+                st.rerun()
+
+@fragment
+def benchmark_section(prof, version):
+    """Benchmark selection"""
+    # Benchmark Selection
+    st.markdown("### 📊 Benchmark Comparison")
+    st.caption("Compare your portfolio against market benchmarks")
+    with st.expander("ℹ️ Why use a benchmark?", expanded=False):
+        st.markdown("""
+        **Benchmarks** help you evaluate your portfolio's performance.
+        
+        - The chart shows what would happen if you invested 100% in the benchmark
+        - **Example:** If you choose SPY, you'll see S&P 500 performance vs your allocation
+        - **Outperforming** the benchmark means your strategy is adding value
+        - **Underperforming** suggests passive investing might be better
+        """)
     
-    purchases = asset_data.get("purchases", [])
-    if not purchases:
-        return None
+    current = profile_benchmarks(prof)
+    labels_by_spec = {v: k for k, v in BENCHMARK_OPTIONS.items()}
+    
+    selected = st.multiselect(
+        "Select Benchmarks",
+        options=list(BENCHMARK_OPTIONS.keys()),
+        default=[labels_by_spec[b] for b in current if b in labels_by_spec],
+        key="benchmark_select"
+    )
+    custom = st.text_input(
+        "Custom benchmarks / blends",
+        value="; ".join(b for b in current if b not in labels_by_spec),
+        placeholder="e.g. ACWI; VTI:60,BND:40",
+        help="Separate benchmarks with ';'. A blend lists TICKER:WEIGHT pairs, rebalanced daily.",
+        key="benchmark_custom"
+    )
+    
+    if st.button("💾 Save Benchmarks", use_container_width=True, key="save_benchmark"):
+        specs = [BENCHMARK_OPTIONS[label] for label in selected]
+        try:
+            for spec in (c.strip() for c in custom.split(";")):
+                if spec:
+                    weights = parse_benchmark(spec)
+                    specs.append(",".join(f"{t}:{w * 100:g}" for t, w in weights.items()) if len(weights) > 1 else next(iter(weights)))
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            specs = list(dict.fromkeys(specs))
+            event = events.settings_changed(
+                st.session_state.active_profile,
+                benchmarks=specs,
+                benchmark=specs[0] if specs else None
+            )
+            if commit_event(event, version):
+                st.success("✅ Benchmarks saved!")
+                st.rerun()
+    
+    if current:
+        st.caption(f"📊 Active: {', '.join(current)} - Shows 100% investment comparison")
+    else:
+        st.caption("No benchmark selected")
+
+@fragment
+def deployment_section(prof, version):
+    """Capital deployment progress and the Record Deployment form"""
+    # ASSET ALLOCATION: New deployment recording section
+    st.markdown("### 💰 Capital Deployment")
+    st.caption("Record partial capital deployment events")
     
-    total_invested = sum(p.get("amount", 0) for p in purchases)
-    total_quantity = sum(p.get("quantity", 0) for p in purchases)
+    allocated_pct = prof.get("allocated_pct", 0.0)
+    remaining_pct = max(0, 100.0 - allocated_pct)
+    
+    # Progress bar
+    progress_color = "#10b981" if allocated_pct >= 100 else "#f97316"
+    st.markdown(f"""
+        <div style="margin: 12px 0;">
+            <div style="background: #e5e7eb; border-radius: 8px; height: 8px; overflow: hidden;">
+                <div style="background: {progress_color}; height: 100%; width: {min(allocated_pct, 100)}%; transition: all 0.3s;"></div>
+            </div>
+        </div>
+    """, unsafe_allow_html=True)
     
-    if total_quantity == 0:
-        return None
+    if allocated_pct >= 100.0:
+        st.success(f"✅ Fully Allocated: {allocated_pct:.1f}%")
+        st.caption("Drift monitoring is active")
+    else:
+        st.warning(f"⚠️ Deployed: {allocated_pct:.1f}% | Remaining: {remaining_pct:.1f}%")
+        st.caption("Drift monitoring activates at 100%")
     
-    return total_invested / total_quantity
+    with st.expander("➕ Record Deployment Event", expanded=False):
+        st.markdown("""
+        **Record new capital deployment** to track your investment journey.
+        
+        - Each deployment buys assets at historical prices from the selected date
+        - Purchase history enables accurate average cost calculation
+        - Drift detection activates only after 100% deployment
+        """)
+        
+        # Show current status
+        st.markdown(f"**Current Status:** {allocated_pct:.1f}% deployed, {remaining_pct:.1f}% remaining")
+        
+        if remaining_pct > 0:
+            deploy_pct = st.number_input(
+                "Deployment % (of total principal)",
+                min_value=0.1,
+                max_value=remaining_pct,
+                value=min(20.0, remaining_pct),
+                step=0.1,
+                help=f"Maximum available: {remaining_pct:.1f}%"
+            )
+            
+            deploy_date = st.date_input(
+                "Deployment Date",
+                value=date.today(),
+                max_value=date.today()
+            )
+            
+            if prof.get("assets"):
+                if deploy_date == date.today():
+                    st.caption("**Assets will be purchased at today's closing prices**")
+                else:
+                    st.caption(f"**Assets will be purchased at {deploy_date} historical prices**")
+                
+                if st.button("📥 Record Deployment", type="primary", use_container_width=True):
+                    # Fetch historical prices for the deployment date
+                    tickers = list(prof["assets"].keys())
+                    try:
+                        with st.spinner(f"Fetching prices for {deploy_date}..."):
+                            # One batched as-of lookup; weekends/holidays resolve to the closest prior trading day
+                            closes = get_price_store().as_of(tickers, deploy_date)
+                            prices = {}
+                            
+                            for ticker in tickers:
+                                if ticker not in closes:
+                                    st.error(f"No price data available for {ticker} on or before {deploy_date}")
+                                    prices = None
+                                    break
+                                closest_date, prices[ticker] = closes[ticker]
+                                if closest_date != deploy_date:
+                                    st.caption(f"ℹ️ {ticker}: Using {closest_date} price (closest trading day)")
+                            
+                            if prices is None or len(prices) != len(tickers):
+                                st.error("Could not fetch prices for all assets")
+                            else:
+                                # Record purchases for each asset
+                                deploy_amount = (deploy_pct / 100) * prof["principal"]
+                                purchases = {}
+                                
+                                for ticker, asset_data in prof["assets"].items():
+                                    target_pct = asset_data["target"]
+                                    # Allocate proportionally based on target weights
+                                    asset_deploy_pct = (target_pct / 100) * deploy_pct
+                                    asset_amount = (asset_deploy_pct / 100) * prof["principal"]
+                                    price = prices[ticker]
+                                    quantity = asset_amount / price
+                                    
+                                    # Add to purchase history
+                                    purchases[ticker] = {
+                                        "date": str(deploy_date),
+                                        "amount": asset_amount,
+                                        "price": price,
+                                        "quantity": quantity,
+                                        "allocated_pct": asset_deploy_pct
+                                    }
+                                
+                                # Appends the purchases, adds their units and updates allocated_pct
+                                event = events.deployment(
+                                    st.session_state.active_profile,
+                                    purchases,
+                                    deploy_pct,
+                                    log=f"Deployed {deploy_pct:.1f}% of capital (${deploy_amount:,.0f})"
+                                )
+                                if commit_event(event, version):
+                                    st.success(f"✅ Deployment recorded: {deploy_pct:.1f}%")
+                                    st.info(f"📊 Total portfolio deployment: {store.db['profiles'][event['profile']]['allocated_pct']:.1f}%")
+                                    st.rerun()
+                    
+                    except Exception as e:
+                        st.error(f"Error recording deployment: {str(e)}")
+            else:
+                st.info("Add assets first before recording deployments")
+        else:
+            st.info("Portfolio fully allocated (100%)")
 
-# ASSET ALLOCATION: Modified drift detection - suppresses drift until 100% allocated
-def calculate_drift_status(p_data, prices):
+@fragment
+def asset_editor_section(prof, version):
+    """Ticker validation and the asset add/update/remove form"""
+    p_flag = "🇺🇸" if prof.get("currency") == "USD" else "🇨🇦"
+    
+    # Asset Allocation
+    st.markdown("### 🎯 Asset Allocation")
+    st.caption("Add assets to your portfolio and set target percentages")
+    with st.expander("ℹ️ How asset allocation works", expanded=False):
+        st.markdown("""
+        **Asset allocation** is your investment strategy blueprint.
+        
+        - **Target %**: Your desired allocation (e.g., 40% AAPL, 30% GOOGL, 30% MSFT)
+        - **Total must equal 100%** to be fully allocated
+        - **Buying Guide**: Shows exactly how many shares to buy
+        - **Rebalancing**: When prices change, your % drifts—rebalance to restore targets
+        
+        💡 **Pro tip:** Diversify across sectors to reduce risk
+        """)
+    
+    with st.expander("💡 Need help finding tickers?", expanded=False):
+        st.caption("**Popular Examples:**")
+        st.caption("• Stocks: AAPL, MSFT, GOOGL, AMZN, TSLA")
+        st.caption("• ETFs: SPY, QQQ, VTI, VOO, IWM")
+        st.caption("• Bonds: AGG, BND, TLT")
+        st.caption("")
+        st.caption("Find more at: finance.yahoo.com")
+    
+    # Calculate current allocation
+    current_alloc = sum(a.get('target', 0) for a in prof.get("assets", {}).values())
+    
+    # Allocation progress bar with color coding
+    progress_color = "🟢" if current_alloc >= 100 else "🟠"
+    bar_color = "#10b981" if current_alloc >= 100 else "#f97316"
+    
+    st.markdown(f"""
+        <div style="margin: 12px 0;">
+            <div style="background: #e5e7eb; border-radius: 8px; height: 8px; overflow: hidden;">
+                <div style="background: {bar_color}; height: 100%; width: {min(current_alloc, 100)}%; transition: all 0.3s;"></div>
+            </div>
+        </div>
+    """, unsafe_allow_html=True)
+    st.markdown(f"**{progress_color} Allocated: {current_alloc:.1f}% / 100%**")
+    
+    # Asset ticker input
+    a_sym = st.text_input(
+        "Ticker Symbol",
+        placeholder="e.g., AAPL, MSFT",
+        help="Enter stock ticker and press Enter",
+        key="ticker_input"
+    ).upper().strip()
+    
+    # Autocomplete from the local symbol index (no network)
+    universe = get_symbol_universe()
+    known = a_sym in universe
+    if a_sym and len(universe) and not known:
+        matches = universe.suggest(a_sym, limit=8)
+        if matches:
+            st.selectbox(
+                "Matching symbols",
+                options=[""] + [m["symbol"] for m in matches],
+                format_func=lambda s: f"{s} — {universe.get(s)['name']}" if s else "Pick a symbol...",
+                key="ticker_suggestion",
+                on_change=use_suggested_ticker
+            )
+        else:
+            st.caption(f"'{a_sym}' is not in the local symbol index; checking online")
+    
+    is_existing = a_sym in prof.get("assets", {})
+    
+    # Calculate available allocation space
+    if is_existing:
+        other_allocs = current_alloc - prof["assets"][a_sym].get("target", 0)
+    else:
+        other_allocs = current_alloc
+    
+    max_available = 100.0 - other_allocs
+    block_new = (not is_existing) and (max_available <= 0) and (a_sym != "")
+    
+    # Show allocation block warning
+    if block_new:
+        st.markdown("""
+            <div class="allocation-blocked">
+                🚫 PORTFOLIO AT 100%<br>
+                Remove or reduce existing assets first!
+            </div>
+        """, unsafe_allow_html=True)
+    
+    valid_ticker = False
+    last_price = 1.0
+    ticker_name = ""
+    
+    # Validate ticker: names come from the symbol index, only the live price needs the network
+    if a_sym and not block_new:
+        try:
+            with st.spinner(f"🔍 Validating {a_sym}..."):
+                quote = get_quote_service().snapshot([a_sym]).prices
+                if a_sym in quote:
+                    last_price = quote[a_sym]
+                    ticker_name = universe.get(a_sym)["name"] if known else get_ticker_metadata().names([a_sym])[a_sym]
+                    st.success(f"✓ {ticker_name}")
+                    st.caption(f"**Current Price:** {p_flag} ${last_price:,.2f}")
+                    valid_ticker = True
+                else:
+                    st.error(f"❌ No price data available for '{a_sym}'")
+        except:
+            if a_sym:
+                st.error(f"❌ Cannot validate '{a_sym}'. Please verify it's a valid stock symbol.")
+                st.caption("💡 Try: AAPL, MSFT, GOOGL, TSLA, SPY, QQQ")
+    
+    # Asset form
+    if valid_ticker:
+        st.markdown("---")
+        
+        default_target = prof.get("assets", {}).get(a_sym, {}).get("target", 0.0)
+        default_units = prof.get("assets", {}).get(a_sym, {}).get("units", 0.0)
+        
+        a_w = st.number_input(
+            f"Target Allocation %",
+            min_value=0.0,
+            max_value=max_available,
+            value=min(float(default_target), max_available),
+            step=0.5,
+            help=f"Maximum available: {max_available:.1f}%",
+            key="target_weight"
+        )
+        
+        # Buying Guide
+        if a_w > 0:
+            target_value = (a_w / 100) * prof['principal']
+            suggested_units = target_value / last_price
+            
+            st.markdown(f"""
+                <div class="buying-guide">
+                    💡 <strong>Buy Guide:</strong> To reach {a_w}% → Buy <span class="buying-guide-highlight">{suggested_units:.4f} units</span> (${target_value:,.0f} @ ${last_price:,.2f}/unit)
+                </div>
+            """, unsafe_allow_html=True)
+        
+        a_u = st.number_input(
+            "Units Currently Owned",
+            min_value=0.0,
+            value=float(default_units),
+            step=0.0001,
+            format="%.4f",
+            help="How many shares do you own?",
+            key="units_owned"
+        )
+        
+        st.markdown("---")
+        
+        col_b1, col_b2 = st.columns(2)
+        
+        with col_b1:
+            save_disabled = (a_w <= 0) or (a_w > max_available)
+            if st.button("💾 Save Asset", use_container_width=True, type="primary", key="save_asset", disabled=save_disabled):
+                action = "Updated" if is_existing else "Added"
+                event = events.asset_upserted(
+                    st.session_state.active_profile, a_sym, a_u, a_w,
+                    log=f"{action} {a_sym}: {a_w}% target, {a_u:.4f} units",
+                    price=last_price
+                )
+                if commit_event(event, version):
+                    st.success(f"✅ {action} {a_sym}!")
+                    st.rerun()
+        
+        with col_b2:
+            if is_existing:
+                if st.button("🗑️ Remove", use_container_width=True, key="remove_asset"):
+                    event = events.asset_removed(
+                        st.session_state.active_profile, a_sym,
+                        log=f"Removed {a_sym} from portfolio"
+                    )
+                    if commit_event(event, version):
+                        st.success(f"✅ Removed {a_sym}!")
+                        st.rerun()
+
+# ===== ACTIVITY LOG =====
+def _older_page(key, cursor):
+    st.session_state[f"{key}_cursors"].append(cursor)
+
+def _newer_page(key):
+    st.session_state[f"{key}_cursors"].pop()
+
+def log_page(name, kind, key, page_size):
     """
-    Calculate if portfolio needs rebalancing.
-    MODIFIED: Drift detection suppressed until allocated_pct >= 100%
+    Search box and one newest-first page of a profile's activity log, read
+    lazily with a keyset cursor. Returns (entries, position of the first
+    entry, cursor of the next older page).
     """
-    p_assets = p_data.get("assets", {})
-    if not p_assets:
-        return False, []
-    
-    curr_v = float(sum(p_assets[t]["units"] * prices.get(t, 0) for t in p_assets))
-    if curr_v == 0:
-        return False, []
-    
-    # ASSET ALLOCATION: Check allocation completion status
-    allocated_pct = p_data.get("allocated_pct", 0.0)
-    if allocated_pct < 100.0:
-        # Allocation in progress - suppress drift detection
-        return False, []
-    
-    has_rebalanced = p_data.get("last_rebalanced") is not None
-    recently_rebalanced = check_recently_rebalanced(p_data.get("last_rebalanced"))
-    
-    # Never rebalanced = needs rebalance
-    if not has_rebalanced:
-        return True, []
-    
-    # Recently rebalanced = don't check drift yet
-    if recently_rebalanced:
-        return False, []
-    
-    # Check actual drift
-    drift_details = []
-    for t in p_assets:
-        actual_pct = float((p_assets[t]["units"] * prices.get(t, 0) / curr_v * 100))
-        target_pct = float(p_assets[t]["target"])
-        drift = abs(actual_pct - target_pct)
-        if drift >= p_data.get("drift_tolerance", 5.0):
-            drift_details.append((t, drift, actual_pct, target_pct))
-    
-    return len(drift_details) > 0, drift_details
+    query = st.text_input("Search", placeholder="Keywords, e.g. AAPL", key=f"{key}_query")
+    # New profile or search: back to the newest page
+    if st.session_state.get(f"{key}_scope") != (name, query):
+        st.session_state[f"{key}_scope"] = (name, query)
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+    
+    entries, older = get_activity_log().page(name, kind, before=cursors[-1], limit=page_size, query=query)
+    if not entries:
+        st.caption("No matching entries" if query else "No activity yet")
+    return entries, (len(cursors) - 1) * page_size, older
+
+def page_buttons(key, older):
+    """Newer/Older buttons for the page shown by log_page"""
+    col_newer, col_older = st.columns(2)
+    with col_newer:
+        st.button("◀ Newer", key=f"{key}_newer", use_container_width=True,
+                  disabled=len(st.session_state[f"{key}_cursors"]) == 1, on_click=_newer_page, args=(key,))
+    with col_older:
+        st.button("Older ▶", key=f"{key}_older", use_container_width=True,
+                  disabled=older is None, on_click=_older_page, args=(key, older))
+
+@fragment
+def activity_section(name):
+    """Paged, searchable Recent Activity"""
+    with st.expander("📋 Recent Activity", expanded=False):
+        entries, _, older = log_page(name, ACTIVITY, "activity", page_size=10)
+        for log_entry in entries:
+            st.caption(f"**{log_entry['ts'][:16]}**: {log_entry['message']}")
+        page_buttons("activity", older)
+
+@fragment
+def rebalance_history_section(name):
+    """Paged, searchable Rebalancing History"""
+    st.divider()
+    st.markdown("### 📜 Rebalancing History")
+    st.caption("Complete log of all portfolio adjustments")
+    
+    with st.expander("📋 View Full History", expanded=False):
+        entries, offset, older = log_page(name, REBALANCE, "rebalance_history", page_size=20)
+        for idx, event in enumerate(entries, offset + 1):
+            st.caption(f"**{idx}.** {event['message']}")
+        page_buttons("rebalance_history", older)
+
+@fragment
+def audit_log_section(profile_names):
+    """Cross-profile audit stream filtered by profile, ticker, period and type"""
+    st.markdown("### 🧾 Audit Log")
+    st.caption("Every trade and change across all profiles")
+    with st.expander("🔎 Search the audit log", expanded=False):
+        col_a1, col_a2, col_a3 = st.columns(3)
+        with col_a1:
+            audit_profile = st.selectbox("Profile", ["All profiles"] + list(profile_names), key="audit_profile")
+        with col_a2:
+            audit_ticker = st.text_input("Ticker", placeholder="e.g. AAPL", key="audit_ticker").strip().upper()
+        with col_a3:
+            audit_period = st.date_input("Period", value=(date.today() - timedelta(days=90), date.today()), key="audit_period")
+        trades_only = st.checkbox("Trades only (deployments and rebalances)", value=True, key="audit_trades")
+        
+        # The range picker returns a single date while the second one is being chosen
+        since = str(audit_period[0]) if audit_period else None
+        until = str(audit_period[1]) if len(audit_period) > 1 else since
+        rows = get_activity_log().audit(
+            since=since,
+            until=until,
+            profile=None if audit_profile == "All profiles" else audit_profile,
+            ticker=audit_ticker or None,
+            types=TRADE_TYPES if trades_only else None,
+            limit=500
+        )
+        if rows:
+            st.dataframe(pd.DataFrame([{
+                "Time": r["ts"],
+                "Profile": r["profile"],
+                "Type": r["type"].replace("_", " ").title(),
+                "Ticker": r["ticker"] or "",
+                "Units": "" if r["quantity"] is None else f"{r['quantity']:+,.4f}",
+                "Price": "" if r["price"] is None else f"${r['price']:,.2f}",
+                "Amount": "" if r["amount"] is None else f"${r['amount']:+,.2f}",
+                "Details": r["message"] or ""
+            } for r in rows]), use_container_width=True, hide_index=True)
+            if len(rows) == 500:
+                st.caption("Showing the latest 500 entries; narrow the filters to see older ones")
+        else:
+            st.caption("No matching entries")
 
 # ===== SESSION STATE =====
-if "db" not in st.session_state:
-    st.session_state.db = load_db()
+if "seen_versions" not in st.session_state:
+    st.session_state.seen_versions = {}
 if "current_page" not in st.session_state:
     st.session_state.current_page = "Global Dashboard"
 if "active_profile" not in st.session_state:
     st.session_state.active_profile = None
 
+# Consistent snapshot of the shared database for this rerun
+store = get_shared_store()
+db, db_versions = store.snapshot()
+# Profile versions as displayed by the previous run, i.e. what the user acted on
+seen_versions = dict(st.session_state.seen_versions)
+if "conflict_notice" in st.session_state:
+    st.error(st.session_state.pop("conflict_notice"))
+
 # ===== SIDEBAR =====
 with st.sidebar:
     st.markdown("### 🛡️ AlphaStream")
@@ -373,8 +917,8 @@ with st.sidebar:
             submitted = st.form_submit_button("🚀 Initialize Profile", use_container_width=True)
             
             if submitted:
-                if n_name and n_name not in st.session_state.db["profiles"]:
-                    st.session_state.db["profiles"][n_name] = {
+                if n_name and n_name not in db["profiles"]:
+                    event = events.profile_created(n_name, {
                         "currency": n_curr,
                         "principal": n_p,
                         "yearly_goal_pct": n_goal,
@@ -385,23 +929,23 @@ with st.sidebar:
                         "rebalance_stats": [],
                         "last_rebalanced": None,
                         "benchmark": None,
+                        "rebalance_events": [],
                         "allocated_pct": 0.0  # ASSET ALLOCATION: New field
-                    }
-                    save_db(st.session_state.db)
-                    log_profile(st.session_state.db["profiles"][n_name], "Profile created")
-                    st.success(f"✅ Profile '{n_name}' created!")
-                    st.rerun()
+                    })
+                    if commit_event(event):
+                        st.success(f"✅ Profile '{n_name}' created!")
+                        st.rerun()
                 elif not n_name:
                     st.error("Please enter a profile name")
                 else:
                     st.warning(f"Profile '{n_name}' already exists")
     
     # Profile-specific sidebar content
-    if view_mode == "📊 Portfolio Manager" and st.session_state.db["profiles"]:
+    if view_mode == "📊 Portfolio Manager" and db["profiles"]:
         st.divider()
         st.markdown("### 🎯 Active Profile")
         
-        profile_names = list(st.session_state.db["profiles"].keys())
+        profile_names = list(db["profiles"].keys())
         
         if st.session_state.active_profile and st.session_state.active_profile in profile_names:
             default_index = profile_names.index(st.session_state.active_profile)
@@ -419,399 +963,31 @@ with st.sidebar:
             st.session_state.active_profile = selected
             st.rerun()
         
-        prof = st.session_state.db["profiles"][st.session_state.active_profile]
-        p_flag = "🇺🇸" if prof.get("currency") == "USD" else "🇨🇦"
+        prof = db["profiles"][st.session_state.active_profile]
+        # What the sections' widgets act on: fragment reruns keep this run's
+        # arguments, so they see the version rendered now; without fragments
+        # a click reruns everything and the previous run's version applies
+        if HAS_FRAGMENTS:
+            shown_version = db_versions[st.session_state.active_profile]
+        else:
+            shown_version = seen_versions.get(st.session_state.active_profile, db_versions[st.session_state.active_profile])
+        st.session_state.seen_versions[st.session_state.active_profile] = db_versions[st.session_state.active_profile]
         
         st.divider()
         
-        # Drift Strategy
-        st.markdown("### ⚙️ Drift Strategy")
-        st.caption("Set tolerance threshold for rebalance alerts")
-        with st.expander("ℹ️ What is drift tolerance?", expanded=False):
-            st.markdown("""
-            **Drift tolerance** controls when you get rebalancing alerts.
-            
-            - If an asset's current % differs from target % by more than this amount, you'll see a 🚨 alert
-            - **Example:** 5% tolerance means AAPL at 30% (target 25%) triggers an alert
-            - **Lower tolerance** = more frequent rebalancing, tighter control
-            - **Higher tolerance** = less frequent rebalancing, more flexibility
-            """)
-        
-        new_tolerance = st.number_input(
-            "Drift Tolerance (%)",
-            value=float(prof.get('drift_tolerance', 5.0)),
-            min_value=0.5,
-            max_value=20.0,
-            step=0.5,
-            help="Alert when any asset drifts this much from target",
-            key="drift_tolerance_input"
-        )
-        if st.button("💾 Update Tolerance", use_container_width=True, key="update_tolerance"):
-            prof['drift_tolerance'] = new_tolerance
-            save_db(st.session_state.db)
-            log_profile(prof, f"Updated drift tolerance to {new_tolerance}%")
-            st.success("✅ Updated!")
-            st.rerun()
+        drift_strategy_section(prof, shown_version)
         
         st.divider()
         
-        # Benchmark Selection
-        st.markdown("### 📊 Benchmark Comparison")
-        st.caption("Compare your portfolio against market benchmarks")
-        with st.expander("ℹ️ Why use a benchmark?", expanded=False):
-            st.markdown("""
-            **Benchmarks** help you evaluate your portfolio's performance.
-            
-            - The chart shows what would happen if you invested 100% in the benchmark
-            - **Example:** If you choose SPY, you'll see S&P 500 performance vs your allocation
-            - **Outperforming** the benchmark means your strategy is adding value
-            - **Underperforming** suggests passive investing might be better
-            """)
-        
-        benchmark_options = {
-            "None": None,
-            "S&P 500 (SPY)": "SPY",
-            "NASDAQ-100 (QQQ)": "QQQ",
-            "Total Market (VTI)": "VTI",
-            "Russell 2000 (IWM)": "IWM",
-            "Dow Jones (DIA)": "DIA"
-        }
-        
-        current_benchmark = prof.get('benchmark')
-        benchmark_index = 0
-        for idx, (key, value) in enumerate(benchmark_options.items()):
-            if value == current_benchmark:
-                benchmark_index = idx
-                break
-        
-        selected_benchmark = st.selectbox(
-            "Select Benchmark",
-            options=list(benchmark_options.keys()),
-            index=benchmark_index,
-            key="benchmark_select"
-        )
-        
-        if st.button("💾 Save Benchmark", use_container_width=True, key="save_benchmark"):
-            prof['benchmark'] = benchmark_options[selected_benchmark]
-            save_db(st.session_state.db)
-            st.success("✅ Benchmark saved!")
-            st.rerun()
-        
-        if prof.get('benchmark'):
-            st.caption(f"📊 Active: {prof['benchmark']} - Shows 100% investment comparison")
-        else:
-            st.caption("No benchmark selected")
+        benchmark_section(prof, shown_version)
         
         st.divider()
         
-        # ASSET ALLOCATION: New deployment recording section
-        st.markdown("### 💰 Capital Deployment")
-        st.caption("Record partial capital deployment events")
-        
-        allocated_pct = prof.get("allocated_pct", 0.0)
-        remaining_pct = max(0, 100.0 - allocated_pct)
-        
-        # Progress bar
-        progress_color = "#10b981" if allocated_pct >= 100 else "#f97316"
-        st.markdown(f"""
-            <div style="margin: 12px 0;">
-                <div style="background: #e5e7eb; border-radius: 8px; height: 8px; overflow: hidden;">
-                    <div style="background: {progress_color}; height: 100%; width: {min(allocated_pct, 100)}%; transition: all 0.3s;"></div>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        if allocated_pct >= 100.0:
-            st.success(f"✅ Fully Allocated: {allocated_pct:.1f}%")
-            st.caption("Drift monitoring is active")
-        else:
-            st.warning(f"⚠️ Deployed: {allocated_pct:.1f}% | Remaining: {remaining_pct:.1f}%")
-            st.caption("Drift monitoring activates at 100%")
-        
-        with st.expander("➕ Record Deployment Event", expanded=False):
-            st.markdown("""
-            **Record new capital deployment** to track your investment journey.
-            
-            - Each deployment buys assets at historical prices from the selected date
-            - Purchase history enables accurate average cost calculation
-            - Drift detection activates only after 100% deployment
-            """)
-            
-            # Show current status
-            st.markdown(f"**Current Status:** {allocated_pct:.1f}% deployed, {remaining_pct:.1f}% remaining")
-            
-            if remaining_pct > 0:
-                deploy_pct = st.number_input(
-                    "Deployment % (of total principal)",
-                    min_value=0.1,
-                    max_value=remaining_pct,
-                    value=min(20.0, remaining_pct),
-                    step=0.1,
-                    help=f"Maximum available: {remaining_pct:.1f}%"
-                )
-                
-                deploy_date = st.date_input(
-                    "Deployment Date",
-                    value=date.today(),
-                    max_value=date.today()
-                )
-                
-                if prof.get("assets"):
-                    if deploy_date == date.today():
-                        st.caption("**Assets will be purchased at today's closing prices**")
-                    else:
-                        st.caption(f"**Assets will be purchased at {deploy_date} historical prices**")
-                    
-                    if st.button("📥 Record Deployment", type="primary", use_container_width=True):
-                        # Fetch historical prices for the deployment date
-                        tickers = list(prof["assets"].keys())
-                        try:
-                            with st.spinner(f"Fetching prices for {deploy_date}..."):
-                                prices = {}
-                                deploy_datetime = pd.to_datetime(deploy_date)
-                                today = pd.to_datetime(date.today())
-                                
-                                for ticker in tickers:
-                                    t_obj = yf.Ticker(ticker)
-                                    
-                                    # If deployment date is today, use current price
-                                    if deploy_datetime.date() == today.date():
-                                        hist = t_obj.history(period="1d")
-                                    else:
-                                        # Fetch historical data for the deployment date
-                                        # Add buffer to ensure we capture the date (handles weekends/holidays)
-                                        start_date = deploy_datetime - timedelta(days=7)
-                                        end_date = deploy_datetime + timedelta(days=1)
-                                        hist = t_obj.history(start=start_date, end=end_date)
-                                    
-                                    if not hist.empty:
-                                        # Convert index to dates for comparison
-                                        hist.index = pd.to_datetime(hist.index).date
-                                        
-                                        # Try to find exact date
-                                        if deploy_datetime.date() in hist.index:
-                                            prices[ticker] = float(hist.loc[deploy_datetime.date()]['Close'])
-                                        else:
-                                            # If exact date not available (weekend/holiday), use closest prior trading day
-                                            available_dates = [d for d in hist.index if d <= deploy_datetime.date()]
-                                            if available_dates:
-                                                closest_date = max(available_dates)
-                                                prices[ticker] = float(hist.loc[closest_date]['Close'])
-                                                if closest_date != deploy_datetime.date():
-                                                    st.caption(f"ℹ️ {ticker}: Using {closest_date} price (closest trading day)")
-                                            else:
-                                                st.error(f"No price data available for {ticker} on or before {deploy_date}")
-                                                prices = None
-                                                break
-                                    else:
-                                        st.error(f"Could not fetch data for {ticker}")
-                                        prices = None
-                                        break
-                                
-                                if prices is None or len(prices) != len(tickers):
-                                    st.error("Could not fetch prices for all assets")
-                                else:
-                                    # Record purchases for each asset
-                                    deploy_amount = (deploy_pct / 100) * prof["principal"]
-                                    
-                                    for ticker, asset_data in prof["assets"].items():
-                                        target_pct = asset_data["target"]
-                                        # Allocate proportionally based on target weights
-                                        asset_deploy_pct = (target_pct / 100) * deploy_pct
-                                        asset_amount = (asset_deploy_pct / 100) * prof["principal"]
-                                        price = prices[ticker]
-                                        quantity = asset_amount / price
-                                        
-                                        # Add to purchase history
-                                        purchase = {
-                                            "date": str(deploy_date),
-                                            "amount": asset_amount,
-                                            "price": price,
-                                            "quantity": quantity,
-                                            "allocated_pct": asset_deploy_pct
-                                        }
-                                        asset_data.setdefault("purchases", []).append(purchase)
-                                        
-                                        # Update total units
-                                        asset_data["units"] = asset_data.get("units", 0) + quantity
-                                    
-                                    # Update allocated percentage
-                                    prof["allocated_pct"] = min(100.0, prof.get("allocated_pct", 0) + deploy_pct)
-                                    
-                                    log_profile(prof, f"Deployed {deploy_pct:.1f}% of capital (${deploy_amount:,.0f})")
-                                    save_db(st.session_state.db)
-                                    st.success(f"✅ Deployment recorded: {deploy_pct:.1f}%")
-                                    st.info(f"📊 Total portfolio deployment: {prof['allocated_pct']:.1f}%")
-                                    st.rerun()
-                        
-                        except Exception as e:
-                            st.error(f"Error recording deployment: {str(e)}")
-                else:
-                    st.info("Add assets first before recording deployments")
-            else:
-                st.info("Portfolio fully allocated (100%)")
+        deployment_section(prof, shown_version)
         
         st.divider()
         
-        # Asset Allocation
-        st.markdown("### 🎯 Asset Allocation")
-        st.caption("Add assets to your portfolio and set target percentages")
-        with st.expander("ℹ️ How asset allocation works", expanded=False):
-            st.markdown("""
-            **Asset allocation** is your investment strategy blueprint.
-            
-            - **Target %**: Your desired allocation (e.g., 40% AAPL, 30% GOOGL, 30% MSFT)
-            - **Total must equal 100%** to be fully allocated
-            - **Buying Guide**: Shows exactly how many shares to buy
-            - **Rebalancing**: When prices change, your % drifts—rebalance to restore targets
-            
-            💡 **Pro tip:** Diversify across sectors to reduce risk
-            """)
-        
-        with st.expander("💡 Need help finding tickers?", expanded=False):
-            st.caption("**Popular Examples:**")
-            st.caption("• Stocks: AAPL, MSFT, GOOGL, AMZN, TSLA")
-            st.caption("• ETFs: SPY, QQQ, VTI, VOO, IWM")
-            st.caption("• Bonds: AGG, BND, TLT")
-            st.caption("")
-            st.caption("Find more at: finance.yahoo.com")
-        
-        # Calculate current allocation
-        current_alloc = sum(a.get('target', 0) for a in prof.get("assets", {}).values())
-        
-        # Allocation progress bar with color coding
-        progress_color = "🟢" if current_alloc >= 100 else "🟠"
-        bar_color = "#10b981" if current_alloc >= 100 else "#f97316"
-        
-        st.markdown(f"""
-            <div style="margin: 12px 0;">
-                <div style="background: #e5e7eb; border-radius: 8px; height: 8px; overflow: hidden;">
-                    <div style="background: {bar_color}; height: 100%; width: {min(current_alloc, 100)}%; transition: all 0.3s;"></div>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        st.markdown(f"**{progress_color} Allocated: {current_alloc:.1f}% / 100%**")
-        
-        # Asset ticker input
-        a_sym = st.text_input(
-            "Ticker Symbol",
-            placeholder="e.g., AAPL, MSFT",
-            help="Enter stock ticker and press Enter",
-            key="ticker_input"
-        ).upper().strip()
-        
-        is_existing = a_sym in prof.get("assets", {})
-        
-        # Calculate available allocation space
-        if is_existing:
-            other_allocs = current_alloc - prof["assets"][a_sym].get("target", 0)
-        else:
-            other_allocs = current_alloc
-        
-        max_available = 100.0 - other_allocs
-        block_new = (not is_existing) and (max_available <= 0) and (a_sym != "")
-        
-        # Show allocation block warning
-        if block_new:
-            st.markdown("""
-                <div class="allocation-blocked">
-                    🚫 PORTFOLIO AT 100%<br>
-                    Remove or reduce existing assets first!
-                </div>
-            """, unsafe_allow_html=True)
-        
-        valid_ticker = False
-        last_price = 1.0
-        ticker_name = ""
-        
-        # Validate ticker
-        if a_sym and not block_new:
-            try:
-                with st.spinner(f"🔍 Validating {a_sym}..."):
-                    t_check = yf.Ticker(a_sym)
-                    hist = t_check.history(period="1d")
-                    if not hist.empty:
-                        last_price = float(hist['Close'].iloc[-1])
-                        try:
-                            ticker_info = t_check.info
-                            ticker_name = ticker_info.get('longName', a_sym)
-                        except:
-                            ticker_name = a_sym
-                        st.success(f"✓ {ticker_name}")
-                        st.caption(f"**Current Price:** {p_flag} ${last_price:,.2f}")
-                        valid_ticker = True
-                    else:
-                        st.error(f"❌ No price data available for '{a_sym}'")
-            except:
-                if a_sym:
-                    st.error(f"❌ Cannot validate '{a_sym}'. Please verify it's a valid stock symbol.")
-                    st.caption("💡 Try: AAPL, MSFT, GOOGL, TSLA, SPY, QQQ")
-        
-        # Asset form
-        if valid_ticker:
-            st.markdown("---")
-            
-            default_target = prof.get("assets", {}).get(a_sym, {}).get("target", 0.0)
-            default_units = prof.get("assets", {}).get(a_sym, {}).get("units", 0.0)
-            
-            a_w = st.number_input(
-                f"Target Allocation %",
-                min_value=0.0,
-                max_value=max_available,
-                value=min(float(default_target), max_available),
-                step=0.5,
-                help=f"Maximum available: {max_available:.1f}%",
-                key="target_weight"
-            )
-            
-            # Buying Guide
-            if a_w > 0:
-                target_value = (a_w / 100) * prof['principal']
-                suggested_units = target_value / last_price
-                
-                st.markdown(f"""
-                    <div class="buying-guide">
-                        💡 <strong>Buy Guide:</strong> To reach {a_w}% → Buy <span class="buying-guide-highlight">{suggested_units:.4f} units</span> (${target_value:,.0f} @ ${last_price:,.2f}/unit)
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            a_u = st.number_input(
-                "Units Currently Owned",
-                min_value=0.0,
-                value=float(default_units),
-                step=0.0001,
-                format="%.4f",
-                help="How many shares do you own?",
-                key="units_owned"
-            )
-            
-            st.markdown("---")
-            
-            col_b1, col_b2 = st.columns(2)
-            
-            with col_b1:
-                save_disabled = (a_w <= 0) or (a_w > max_available)
-                if st.button("💾 Save Asset", use_container_width=True, type="primary", key="save_asset", disabled=save_disabled):
-                    # ASSET ALLOCATION: Ensure purchases list exists
-                    prof.setdefault("assets", {})[a_sym] = {
-                        "units": a_u,
-                        "target": a_w,
-                        "purchases": prof.get("assets", {}).get(a_sym, {}).get("purchases", [])
-                    }
-                    action = "Updated" if is_existing else "Added"
-                    log_profile(prof, f"{action} {a_sym}: {a_w}% target, {a_u:.4f} units")
-                    save_db(st.session_state.db)
-                    st.success(f"✅ {action} {a_sym}!")
-                    st.rerun()
-            
-            with col_b2:
-                if is_existing:
-                    if st.button("🗑️ Remove", use_container_width=True, key="remove_asset"):
-                        del prof["assets"][a_sym]
-                        log_profile(prof, f"Removed {a_sym} from portfolio")
-                        save_db(st.session_state.db)
-                        st.success(f"✅ Removed {a_sym}!")
-                        st.rerun()
+        asset_editor_section(prof, shown_version)
         
         # Show existing assets
         if prof.get("assets"):
@@ -820,16 +996,11 @@ with st.sidebar:
             for ticker, data in prof["assets"].items():
                 st.caption(f"**{ticker}**: {data['target']}% ({data['units']:.4f} units)")
         
-        # Activity Log
+        # Activity Log (history recorded before the log existed is imported once)
         st.divider()
         st.markdown("### 📜 Activity Log")
-        rebalance_logs = prof.get("rebalance_logs", [])
-        if rebalance_logs:
-            with st.expander("📋 Recent Activity", expanded=False):
-                for log_entry in rebalance_logs[:10]:
-                    st.caption(f"**{log_entry['date']}**: {log_entry['event']}")
-        else:
-            st.caption("No activity yet")
+        get_activity_log().import_profile(st.session_state.active_profile, prof)
+        activity_section(st.session_state.active_profile)
 
 # ===== MAIN CONTENT =====
 if view_mode == "🏠 Global Dashboard":
@@ -841,7 +1012,8 @@ if view_mode == "🏠 Global Dashboard":
         "Monitor all your investment strategies from a single view. Track performance, detect drift, and identify rebalancing opportunities across your entire wealth ecosystem."
     )
     
-    profiles = st.session_state.db["profiles"]
+    # Summaries only: no profile document is loaded to render the dashboard
+    profiles = profile_index(db)
     
     if not profiles:
         st.info("👈 **Create your first profile** using the sidebar to get started")
@@ -863,14 +1035,21 @@ if view_mode == "🏠 Global Dashboard":
     prices = {}
     if all_tickers:
         with st.spinner("📊 Loading market data..."):
-            try:
-                for ticker in all_tickers:
-                    t_obj = yf.Ticker(ticker)
-                    hist = t_obj.history(period="1d")
-                    if not hist.empty:
-                        prices[ticker] = float(hist['Close'].iloc[-1])
-            except:
-                pass
+            snapshot = get_quote_service().snapshot(all_tickers)
+            prices = snapshot.prices
+        
+        # Report per-ticker failures instead of silently dropping them
+        if snapshot.failures:
+            with st.expander(f"⚠️ Could not price {len(snapshot.failures)} ticker(s)", expanded=False):
+                for ticker, reason in sorted(snapshot.failures.items()):
+                    st.caption(f"**{ticker}**: {reason}")
+    
+    # Reused until a profile or a quote changes
+    summary = get_result_cache().get(
+        "dashboard",
+        dashboard_key(profiles, db_versions, snapshot.snapshot_id() if all_tickers else None),
+        lambda: dashboard_summary(profiles, prices)
+    )
     
     # Profile grid
     st.markdown("### 📊 Active Profiles")
@@ -890,21 +1069,12 @@ if view_mode == "🏠 Global Dashboard":
                 p_flag = "🇺🇸" if p_data.get("currency") == "USD" else "🇨🇦"
                 
                 # Calculate metrics
-                if p_assets and prices:
-                    curr_val = sum(p_assets[t]["units"] * prices.get(t, 0) for t in p_assets)
-                    principal = float(p_data.get("principal", 1))
-                    roi = ((curr_val / principal) - 1) * 100 if principal > 0 else 0
-                    
-                    # ASSET ALLOCATION: Modified drift check
-                    needs_rebal, drift_list = calculate_drift_status(p_data, prices)
-                    
-                    allocated_pct = p_data.get("allocated_pct", 0.0)  # ASSET ALLOCATION
-                else:
-                    curr_val = 0
-                    roi = 0
-                    needs_rebal = False
-                    drift_list = []
-                    allocated_pct = p_data.get("allocated_pct", 0.0)  # ASSET ALLOCATION
+                tile = summary["tiles"][p_name]
+                curr_val = tile["value"]
+                roi = tile["roi"]
+                needs_rebal = tile["needs_rebalance"]
+                drift_list = tile["drift"]
+                allocated_pct = tile["allocated_pct"]  # ASSET ALLOCATION
                 
                 # Determine tile styling
                 if needs_rebal:
@@ -978,13 +1148,9 @@ if view_mode == "🏠 Global Dashboard":
     col_g1, col_g2, col_g3, col_g4 = st.columns(4)
     
     total_profiles = len(profiles)
-    total_value = sum(
-        sum(p.get("assets", {}).get(t, {}).get("units", 0) * prices.get(t, 0) 
-            for t in p.get("assets", {}))
-        for p in profiles.values()
-    )
-    profiles_with_drift = sum(1 for p in profiles.values() if calculate_drift_status(p, prices)[0])
-    total_assets = sum(len(p.get("assets", {})) for p in profiles.values())
+    total_value = summary["total_value"]
+    profiles_with_drift = summary["alerts"]
+    total_assets = summary["total_assets"]
     
     with col_g1:
         st.metric("Active Profiles", total_profiles)
@@ -994,13 +1160,17 @@ if view_mode == "🏠 Global Dashboard":
         st.metric("Rebalance Alerts", profiles_with_drift)
     with col_g4:
         st.metric("Total Assets", total_assets)
+    
+    st.divider()
+    
+    audit_log_section(list(profiles))
 
 else:  # Portfolio Manager
-    if not st.session_state.active_profile or st.session_state.active_profile not in st.session_state.db["profiles"]:
+    if not st.session_state.active_profile or st.session_state.active_profile not in db["profiles"]:
         st.warning("⚠️ No profile selected. Please select a profile from the sidebar.")
         st.stop()
     
-    prof = st.session_state.db["profiles"][st.session_state.active_profile]
+    prof = db["profiles"][st.session_state.active_profile]
     p_flag = "🇺🇸" if prof.get("currency") == "USD" else "🇨🇦"
     
     # ASSET ALLOCATION: Get allocation status
@@ -1063,16 +1233,24 @@ else:  # Portfolio Manager
     # Fetch data and analyze
     with st.spinner("📊 Analyzing portfolio..."):
         try:
-            raw = yf.download(tickers, start=prof["start_date"], auto_adjust=True, progress=False)
+            # Memo key from the stored price snapshot: an unchanged rerun reuses the
+            # cached history and results; the store is only refreshed when it is behind
+            price_store = get_price_store()
+            if price_store.stale(tickers, prof["start_date"]):
+                price_store.update(tickers, prof["start_date"])
+            results = get_result_cache()
+            result_key = profile_key(
+                st.session_state.active_profile,
+                db_versions.get(st.session_state.active_profile, 0),
+                (tuple(tickers), price_store.snapshot_id(tickers)),
+                prof
+            )
+            data = results.get("price_history", result_key, lambda: price_store.history(tickers, start=prof["start_date"]))
             
-            if raw.empty:
+            if data.empty:
                 st.error("❌ Could not fetch historical data. Please check your tickers and date range.")
                 st.stop()
             
-            data = raw['Close']
-            if len(tickers) == 1:
-                data = pd.DataFrame(data, columns=tickers)
-            
             v_t = [t for t in tickers if t in data.columns]
             
             if not v_t:
@@ -1083,40 +1261,17 @@ else:  # Portfolio Manager
                 missing = set(tickers) - set(v_t)
                 st.warning(f"⚠️ Could not load data for: {', '.join(missing)}")
             
-            # Calculate portfolio metrics
-            daily_val = data[v_t].apply(
-                lambda r: sum(r[t] * asset_dict[t]["units"] for t in v_t if t in r.index),
-                axis=1
-            )
-            
-            curr_v = float(daily_val.iloc[-1])
-            start_val = float(prof['principal'])
-            
-            years = max((data.index[-1] - data.index[0]).days / 365.25, 0.01)
-            target_val = start_val * (1 + (float(prof['yearly_goal_pct'])/100))**years
-            perc_diff = ((curr_v / target_val) - 1) * 100
-            roi_pct = ((curr_v / start_val) - 1) * 100
-            
-            # Calculate CAGR
-            prof_start_date = datetime.strptime(prof.get('start_date', str(date.today())), '%Y-%m-%d')
-            prof_years = max((date.today() - prof_start_date.date()).days / 365.25, 0.01)
-            profile_cagr = ((curr_v / start_val) ** (1 / prof_years) - 1) * 100 if start_val > 0 else 0
-            
-            # ASSET ALLOCATION: Modified drift detection
-            recently_rebalanced = check_recently_rebalanced(prof.get("last_rebalanced"))
-            needs_rebalance = False
-            drift_assets = []
-            
-            # Only check drift if fully allocated
-            if is_fully_allocated and not recently_rebalanced:
-                for t in v_t:
-                    actual_pct = float((asset_dict[t]["units"] * data[t].iloc[-1] / curr_v * 100))
-                    target_pct = float(asset_dict[t]["target"])
-                    drift = float(abs(actual_pct - target_pct))
-                    
-                    if drift >= prof.get("drift_tolerance", 5.0):
-                        needs_rebalance = True
-                        drift_assets.append((t, drift, actual_pct, target_pct))
+            # Calculate portfolio metrics and drift (memoized on profile version + stored prices)
+            analysis = results.get("analysis", result_key, lambda: analyze_portfolio(prof, data, v_t))
+            daily_val = analysis["daily_val"]
+            curr_v = analysis["curr_v"]
+            start_val = analysis["start_val"]
+            perc_diff = analysis["perc_diff"]
+            roi_pct = analysis["roi_pct"]
+            profile_cagr = analysis["profile_cagr"]
+            recently_rebalanced = analysis["recently_rebalanced"]
+            needs_rebalance = analysis["needs_rebalance"]
+            drift_assets = analysis["drift_assets"]
             
             # Drift alert banner
             if needs_rebalance:
@@ -1228,40 +1383,7 @@ else:  # Portfolio Manager
             st.markdown("### 📊 Asset Allocation Table")
             st.caption("Comprehensive view of target weights, actual allocations, and deployment status")
             
-            allocation_rows = []
-            for t in v_t:
-                current_price = float(data[t].iloc[-1])
-                asset_data = asset_dict[t]
-                
-                # Target and actual percentages
-                tar_pct = float(asset_data['target'])
-                cur_units = float(asset_data["units"])
-                act_val = cur_units * current_price
-                act_pct = (act_val / curr_v * 100) if curr_v > 0 else 0
-                
-                # Allocated percentage (from purchases)
-                allocated_pct_asset = sum(
-                    p.get("allocated_pct", 0) 
-                    for p in asset_data.get("purchases", [])
-                )
-                
-                # Average cost (only if fully allocated)
-                avg_cost = calculate_average_cost(asset_data, allocated_pct)
-                avg_cost_display = f"${avg_cost:.2f}" if avg_cost is not None else "Pending"
-                
-                # Drift
-                drift = act_pct - tar_pct
-                drift_display = f"{drift:+.2f}%" if is_fully_allocated else "-"
-                
-                allocation_rows.append({
-                    "Ticker": t,
-                    "Target %": f"{tar_pct:.2f}%",
-                    "Actual %": f"{act_pct:.2f}%",
-                    "Allocated %": f"{allocated_pct_asset:.2f}%",
-                    "Avg Cost": avg_cost_display,
-                    "Current Price": f"${current_price:.2f}",
-                    "Drift %": drift_display
-                })
+            allocation_rows = results.get("allocation_rows", result_key, lambda: build_allocation_rows(prof, data, v_t, curr_v))
             
             df_allocation = pd.DataFrame(allocation_rows)
             st.dataframe(df_allocation, use_container_width=True, hide_index=True)
@@ -1269,17 +1391,41 @@ else:  # Portfolio Manager
             if not is_fully_allocated:
                 st.info(f"ℹ️ **Average Cost** and **Drift %** will be calculated after 100% capital deployment. Current: {allocated_pct:.1f}%")
             
+            with st.expander("🧾 Tax Lots", expanded=False):
+                lot_ticker = st.selectbox("Asset", options=v_t, key="tax_lot_ticker")
+                open_lots = asset_dict[lot_ticker].get("lots", [])
+                st.caption(f"{len(open_lots)} open lot(s) · relieved {prof.get('lot_method', 'FIFO')} on sale")
+                if open_lots:
+                    lot_price = float(data[lot_ticker].iloc[-1])
+                    df_lots = pd.DataFrame([{
+                        "Lot": lot["id"],
+                        "Date": lot["date"],
+                        "Units": f"{lot['quantity']:,.4f}",
+                        "Cost/Unit": f"${lot['cost'] / lot['quantity']:,.2f}" if lot["cost"] is not None else "Unknown",
+                        "Cost Basis": f"${lot['cost']:,.2f}" if lot["cost"] is not None else "Unknown",
+                        "Unrealized P&L": f"${lot['quantity'] * lot_price - lot['cost']:+,.2f}" if lot["cost"] is not None else "—",
+                        "Source": lot.get("source", "")
+                    } for lot in open_lots])
+                    st.dataframe(df_lots, use_container_width=True, hide_index=True)
+            
             st.divider()
             
             # Performance Chart
             st.markdown("### 📈 Performance Chart")
             st.caption("Historical portfolio value vs. initial investment")
             
+            # Deferred: Plotly is only loaded once a chart is actually drawn
+            import plotly.graph_objects as go
+            
             fig = go.Figure()
             
-            fig.add_trace(go.Scatter(
-                x=daily_val.index,
-                y=daily_val.values,
+            # Long ranges: LTTB-downsampled to the point budget and drawn with WebGL
+            Trace = go.Scattergl if use_webgl(daily_val) else go.Scatter
+            chart_val = downsample(daily_val)
+            
+            fig.add_trace(Trace(
+                x=chart_val.index,
+                y=chart_val.values,
                 mode='lines',
                 name='Portfolio Value',
                 line=dict(color='#3b82f6', width=3),
@@ -1287,37 +1433,35 @@ else:  # Portfolio Manager
                 fillcolor='rgba(59, 130, 246, 0.1)'
             ))
             
+            ref_x, ref_y = reference_line(daily_val.index, start_val)
             fig.add_trace(go.Scatter(
-                x=daily_val.index,
-                y=[start_val] * len(daily_val),
+                x=ref_x,
+                y=ref_y,
                 mode='lines',
                 name='Initial Investment',
                 line=dict(color='#64748b', width=2, dash='dash')
             ))
             
-            # Add benchmark if selected
-            if prof.get('benchmark'):
+            # Benchmarks: cached return series shared across profiles, grown from the principal
+            bench_specs = profile_benchmarks(prof)
+            bench_returns = pd.DataFrame()
+            if bench_specs:
                 try:
-                    benchmark_ticker = prof['benchmark']
-                    bench_data = yf.download(benchmark_ticker, start=prof["start_date"], auto_adjust=True, progress=False)
-                    
-                    if not bench_data.empty:
-                        bench_close = bench_data['Close']
-                        if isinstance(bench_close, pd.DataFrame):
-                            bench_close = bench_close.iloc[:, 0]
-                        
-                        bench_start = bench_close.iloc[0]
-                        bench_normalized = (bench_close / bench_start) * start_val
-                        
-                        fig.add_trace(go.Scatter(
-                            x=bench_normalized.index,
-                            y=bench_normalized.values,
-                            mode='lines',
-                            name=f'{benchmark_ticker} (100%)',
-                            line=dict(color='#f59e0b', width=2, dash='dot')
-                        ))
+                    bench_returns = get_benchmark_engine().returns(bench_specs, prof["start_date"])
                 except:
-                    pass
+                    bench_returns = pd.DataFrame()
+            
+            bench_colors = ['#f59e0b', '#10b981', '#8b5cf6', '#ef4444', '#06b6d4', '#ec4899']
+            bench_growth = growth(bench_returns, start_val)
+            for i, spec in enumerate(bench_growth.columns):
+                bench_normalized = downsample(bench_growth[spec])
+                fig.add_trace(Trace(
+                    x=bench_normalized.index,
+                    y=bench_normalized.values,
+                    mode='lines',
+                    name=f'{spec} (100%)',
+                    line=dict(color=bench_colors[i % len(bench_colors)], width=2, dash='dot')
+                ))
             
             fig.update_layout(
                 title=None,
@@ -1343,14 +1487,56 @@ else:  # Portfolio Manager
             
             st.plotly_chart(fig, use_container_width=True)
             
-            if prof.get('benchmark'):
+            if not bench_returns.empty:
+                bench_names = ", ".join(bench_returns.columns)
                 st.markdown(f"""
                     <div class="benchmark-note">
-                        <strong>📊 Benchmark Note:</strong> The {prof['benchmark']} line shows what would happen if you invested 100% of your principal 
-                        (${start_val:,.0f}) in {prof['benchmark']} on {prof['start_date']} and held it. This comparison helps evaluate 
+                        <strong>📊 Benchmark Note:</strong> Each benchmark line ({bench_names}) shows what would happen if you invested 100% of your principal 
+                        (${start_val:,.0f}) in it on {prof['start_date']} and held it. This comparison helps evaluate 
                         whether your asset allocation strategy is outperforming passive investment.
                     </div>
                 """, unsafe_allow_html=True)
+                
+                # Relative risk vs. every benchmark (annualized, daily returns)
+                metrics = relative_metrics(analysis["daily_ret"], bench_returns)
+                df_metrics = pd.DataFrame({
+                    "Benchmark": metrics.index,
+                    "Tracking Error": [f"{v:.2%}" for v in metrics["tracking_error"]],
+                    "Beta": [f"{v:.2f}" for v in metrics["beta"]],
+                    "Alpha": [f"{v:+.2%}" for v in metrics["alpha"]],
+                    "Info Ratio": [f"{v:.2f}" for v in metrics["information_ratio"]],
+                    "Up Capture": [f"{v:.0%}" for v in metrics["up_capture"]],
+                    "Down Capture": [f"{v:.0%}" for v in metrics["down_capture"]],
+                })
+                st.dataframe(df_metrics, use_container_width=True, hide_index=True)
+            
+            # Return analytics: time- vs money-weighted return, risk, rolling windows
+            if len(analysis["daily_ret"]) > 1:
+                st.markdown("### 📐 Return Analytics")
+                st.caption("TWR measures the holdings, independent of when you deposited; XIRR is your personal return on the actual purchase dates")
+                stats = get_return_analytics().analyze(
+                    st.session_state.active_profile,
+                    db_versions.get(st.session_state.active_profile, 0),
+                    analysis["daily_ret"],
+                    prof,
+                    curr_v
+                )
+                pct = lambda v: "—" if v is None or pd.isna(v) else f"{v:.2%}"
+                ratio = lambda v: "—" if v is None or pd.isna(v) else f"{v:.2f}"
+                col_a1, col_a2, col_a3, col_a4, col_a5, col_a6 = st.columns(6)
+                col_a1.metric("TWR (ann.)", pct(stats["twr_annualized"]), help=f"Time-weighted return; {pct(stats['twr'])} cumulative")
+                col_a2.metric("XIRR", pct(stats["xirr"]), help="Money-weighted annual return over your purchases")
+                col_a3.metric("Volatility", pct(stats["volatility"]), help="Annualized standard deviation of daily returns")
+                col_a4.metric("Sharpe", ratio(stats["sharpe"]), help="Annualized excess return per unit of volatility")
+                col_a5.metric("Sortino", ratio(stats["sortino"]), help="Annualized excess return per unit of downside volatility")
+                col_a6.metric("Max Drawdown", pct(stats["max_drawdown"]), help="Largest peak-to-trough fall of the time-weighted index")
+                df_rolling = pd.DataFrame({
+                    "Window": list(stats["rolling"]),
+                    "Latest": [pct(w["latest"]) for w in stats["rolling"].values()],
+                    "Best": [pct(w["best"]) for w in stats["rolling"].values()],
+                    "Worst": [pct(w["worst"]) for w in stats["rolling"].values()],
+                })
+                st.dataframe(df_rolling, use_container_width=True, hide_index=True)
             
             st.divider()
             
@@ -1364,94 +1550,18 @@ else:  # Portfolio Manager
                 - **Drift**: 🔴 Red = exceeds tolerance, 🟡 Yellow = warning, 🟢 Green = good
                 - **Buy/Sell**: Action needed to rebalance
                 - **Buy/Sell Amt**: Dollar value of the trade
-                - **Buy/Sell Shares**: Exact number of shares to trade
+                - **Buy/Sell Shares**: Whole shares (or lots) to trade; never spends more than the sales raise
                 
                 💡 Execute rebalancing when you see 🔴 red drift indicators
                 """)
             
-            rows = []
-            total_turnover = 0
-            total_current_val = 0
-            
-            for t in v_t:
-                current_price = float(data[t].iloc[-1])
-                try:
-                    prev_price = float(data[t].iloc[-2])
-                    daily_change_pct = ((current_price / prev_price) - 1) * 100
-                except:
-                    daily_change_pct = 0.0
-                
-                ticker_name = t
-                try:
-                    ticker_obj = yf.Ticker(t)
-                    info = ticker_obj.info
-                    if info and 'longName' in info:
-                        ticker_name = info.get('longName', t)
-                except:
-                    pass
-                
-                cur_u = float(asset_dict[t]["units"])
-                tar_w = float(asset_dict[t]['target'])
-                
-                act_val = cur_u * current_price
-                act_w = (act_val / curr_v * 100)
-                drift = act_w - tar_w
-                
-                tar_val = (tar_w / 100) * curr_v
-                tar_u = tar_val / current_price
-                
-                val_diff = tar_val - act_val
-                unit_diff = tar_u - cur_u
-                
-                total_turnover += abs(val_diff)
-                total_current_val += act_val
-                
-                if abs(drift) < 0.1:
-                    action = "—"
-                else:
-                    action = "BUY" if drift < 0 else "SELL"
-                
-                # ASSET ALLOCATION: Only show drift colors if fully allocated
-                if is_fully_allocated:
-                    if abs(drift) >= prof.get("drift_tolerance", 5.0):
-                        drift_display = f"🔴 {drift:+.2f}%"
-                    elif abs(drift) > 0.5:
-                        drift_display = f"🟡 {drift:+.2f}%"
-                    else:
-                        drift_display = f"🟢 {drift:+.2f}%"
-                else:
-                    drift_display = f"{drift:+.2f}%"
-                
-                daily_change_display = f"{daily_change_pct:+.2f}%"
-                
-                rows.append({
-                    "Asset Class": ticker_name,
-                    "Fund": t,
-                    "Units": f"{cur_u:.0f}",
-                    "Unit Value": f"${current_price:.2f}",
-                    "%Daily Change": daily_change_display,
-                    "Amount": f"${act_val:,.0f}",
-                    "Allocation": f"{act_w:.2f}%",
-                    "Target": f"{tar_w:.2f}%",
-                    "Drift": drift_display,
-                    "Buy/Sell Amt": f"${abs(val_diff):,.0f}",
-                    "Buy/Sell Shares": f"{unit_diff:+.0f}"
-                })
-            
-            # Total row
-            rows.append({
-                "Asset Class": "**TOTAL**",
-                "Fund": "",
-                "Units": "",
-                "Unit Value": "",
-                "%Daily Change": "",
-                "Amount": f"**${total_current_val:,.0f}**",
-                "Allocation": "**100.00%**",
-                "Target": "**100.00%**",
-                "Drift": "—",
-                "Buy/Sell Amt": f"**${total_turnover:,.0f}**",
-                "Buy/Sell Shares": "—"
-            })
+            ticker_names = get_ticker_metadata().names(v_t)
+            plan = results.get("rebalance_plan", result_key, lambda: rebalance_plan(prof, data, v_t))
+            rows, total_turnover = results.get(
+                "rebalance_rows",
+                result_key + (tuple(ticker_names.items()),),
+                lambda: rebalance_rows(prof, data, v_t, curr_v, ticker_names, plan)
+            )
             
             df_rebalance = pd.DataFrame(rows)
             st.dataframe(df_rebalance, use_container_width=True, hide_index=True)
@@ -1461,6 +1571,69 @@ else:  # Portfolio Manager
                 st.metric("CAGR", f"{profile_cagr:.2f}%", help="Compound Annual Growth Rate")
             with col_metric2:
                 st.metric("Total Trade Volume", f"${total_turnover:,.0f}", help="Total dollar amount needed to rebalance")
+            st.caption(f"Cash left after trades: ${plan.cash_after:,.2f} · Remaining tracking error: {plan.tracking_error:.3f}%")
+            
+            # Policy backtest: how other drift tolerances / calendars would have done on this history
+            with st.expander("🧪 Rebalancing Policy Backtest", expanded=False):
+                st.caption("Replays your target allocation over the price history under band, calendar and hybrid rebalancing")
+                col_bt1, col_bt2, col_bt3 = st.columns(3)
+                with col_bt1:
+                    tol_range = st.slider("Tolerance Range (%)", min_value=0.5, max_value=20.0, value=(0.5, 20.0), step=0.5, key="backtest_range")
+                with col_bt2:
+                    bt_frequencies = st.multiselect("Calendars", options=FREQUENCIES, default=["quarterly", "annual"], key="backtest_calendars")
+                with col_bt3:
+                    cost_bps = st.number_input("Trading Cost (bps)", min_value=0.0, max_value=200.0, value=10.0, step=5.0, key="backtest_cost")
+                
+                if st.toggle("Run backtest", key="backtest_run"):
+                    current_tol = float(prof.get('drift_tolerance', 5.0))
+                    steps = int(round((tol_range[1] - tol_range[0]) / 0.1))
+                    tolerances = sorted({round(tol_range[0] + 0.1 * i, 1) for i in range(steps + 1)} | {current_tol})
+                    bt_prices = prepare_prices(data, v_t)
+                    if len(bt_prices) < 2:
+                        st.info("ℹ️ Not enough shared price history to backtest")
+                    else:
+                        bt = results.get(
+                            "backtest",
+                            result_key + (tol_range, tuple(bt_frequencies), cost_bps),
+                            # In-process: forking a worker pool from the threaded server is unsafe,
+                            # and the default grid finishes in about a second
+                            lambda: backtest(
+                                bt_prices,
+                                [asset_dict[t]["target"] for t in v_t],
+                                policy_grid(tolerances, bt_frequencies) + [Policy()],
+                                start_value=float(prof.get("principal") or 10000.0),
+                                cost_rate=cost_bps / 10000
+                            )
+                        )
+                        st.caption(f"{len(bt):,} policies over {bt_prices.index[0]:%Y-%m-%d} → {bt_prices.index[-1]:%Y-%m-%d}")
+                        
+                        curves = bt[bt["kind"].isin(["band", "hybrid"])].assign(
+                            family=lambda df: df["frequency"].fillna("daily").map(lambda f: f"{f} checks")
+                        )
+                        col_chart1, col_chart2 = st.columns(2)
+                        with col_chart1:
+                            st.markdown("**Final value by tolerance**")
+                            st.line_chart(curves.pivot_table(index="tolerance", columns="family", values="final_value"))
+                        with col_chart2:
+                            st.markdown("**Turnover by tolerance**")
+                            st.line_chart(curves.pivot_table(index="tolerance", columns="family", values="turnover"))
+                        
+                        shown = pd.concat([
+                            bt[(bt["kind"] == "band") & (bt["tolerance"] == current_tol)],
+                            bt[bt["kind"].isin(["calendar", "buy_and_hold"])],
+                            bt.nlargest(5, "final_value"),
+                        ]).drop_duplicates("policy")
+                        df_bt = pd.DataFrame({
+                            "Policy": [f"{p} (current)" if k == "band" and tol == current_tol else p
+                                       for p, k, tol in zip(shown["policy"], shown["kind"], shown["tolerance"])],
+                            "Rebalances": shown["rebalances"],
+                            "Trades": shown["trades"],
+                            "Turnover": [f"${v:,.0f}" for v in shown["turnover"]],
+                            "Costs": [f"${v:,.0f}" for v in shown["costs"]],
+                            "Tracking Error": [f"{v:.2%}" for v in shown["tracking_error"]],
+                            "Final Value": [f"${v:,.0f}" for v in shown["final_value"]],
+                        })
+                        st.dataframe(df_bt, use_container_width=True, hide_index=True)
             
             st.divider()
             
@@ -1493,30 +1666,32 @@ else:  # Portfolio Manager
                 if st.button("⚡ Execute Rebalancing", type="primary", use_container_width=True, disabled=rebalance_disabled):
                     detail_log = f"{datetime.now().strftime('%Y-%m-%d %H:%M')} - "
                     changes = []
+                    units_before = {t: float(asset_dict[t]["units"]) for t in v_t}
+                    units_after = plan.units()
                     
                     for t in v_t:
-                        old_units = float(asset_dict[t]["units"])
-                        new_units = float((asset_dict[t]["target"] / 100 * curr_v) / data[t].iloc[-1])
-                        asset_dict[t]["units"] = new_units
-                        
-                        change_val = new_units - old_units
+                        change_val = units_after[t] - units_before[t]
                         if abs(change_val) > 0.0001:
                             action_color = "🟢" if change_val > 0 else "🔴"
                             action_text = "BUY" if change_val > 0 else "SELL"
-                            changes.append(f"{action_color} {t} {action_text} {abs(change_val):.4f}")
+                            changes.append(f"{action_color} {t} {action_text} {abs(change_val):g}")
                     
                     detail_log += ", ".join(changes) if changes else "No changes needed"
+                    detail_log += f" (cash left ${plan.cash_after:,.2f})"
                     
-                    prof.setdefault("rebalance_stats", []).insert(0, detail_log)
-                    prof["rebalance_stats"] = prof["rebalance_stats"][:50]
-                    prof["last_rebalanced"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    log_profile(prof, "Portfolio rebalanced to target allocations - Status: Balanced")
-                    save_db(st.session_state.db)
-                    
-                    st.success("✅ Portfolio rebalanced successfully! Status: **Balanced** ✅")
-                    st.balloons()
-                    st.rerun()
+                    # Sets units, records the history line and structured event, stamps last_rebalanced
+                    event = events.rebalance(
+                        st.session_state.active_profile,
+                        units_after,
+                        detail_log,
+                        unit_changes(units_before, units_after),
+                        log="Portfolio rebalanced to target allocations - Status: Balanced",
+                        prices={t: float(data[t].iloc[-1]) for t in v_t}
+                    )
+                    if commit_event(event):
+                        st.success("✅ Portfolio rebalanced successfully! Status: **Balanced** ✅")
+                        st.balloons()
+                        st.rerun()
                 
                 if not needs_rebalance and is_fully_allocated:
                     st.info("✓ Portfolio is optimally balanced")
@@ -1555,16 +1730,7 @@ else:  # Portfolio Manager
             st.error(f"❌ Error analyzing portfolio: {str(e)}")
             st.info("💡 Please check your internet connection and verify all ticker symbols are valid.")
     
-    # Rebalance History at Bottom (organized by time period)
+    # Rebalance History at Bottom (paged from the activity log)
     if tickers and st.session_state.active_profile:
-        prof = st.session_state.db["profiles"][st.session_state.active_profile]
-        rebalance_events = prof.get('rebalance_stats', [])
-        
-        if rebalance_events:
-            st.divider()
-            st.markdown("### 📜 Rebalancing History")
-            st.caption("Complete log of all portfolio adjustments")
-            
-            with st.expander("📋 View Full History", expanded=False):
-                for idx, event in enumerate(rebalance_events, 1):
-                    st.caption(f"**{idx}.** {event}")
+        if get_activity_log().page(st.session_state.active_profile, REBALANCE, limit=1)[0]:
+            rebalance_history_section(st.session_state.active_profile)
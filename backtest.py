@@ -0,0 +1,230 @@
+"""
+Rebalancing-policy backtester.
+
+Replays a profile's target weights over historical prices under different
+rebalancing policies and reports what each would have cost and how closely
+it would have tracked the targets:
+
+- band: rebalance whenever any asset drifts `tolerance` percentage points
+  from target (the app's drift_tolerance rule)
+- calendar: rebalance on the first trading day of every month, quarter,
+  half-year or year
+- hybrid: check on calendar days, rebalance only if the band is exceeded
+
+A policy is (tolerance, frequency): band = (t, None), calendar = (0, f),
+hybrid = (t, f), buy-and-hold = (inf, None). All policies of a run are
+simulated together as rows of a (policies x assets) holdings matrix, so each
+trading day is a handful of array operations whatever the number of
+policies; `sweep` splits large grids across a process pool.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Worker processes used by sweep() (default: one per CPU)
+BACKTEST_WORKERS = int(os.environ.get("ALPHASTREAM_BACKTEST_WORKERS", "0")) or os.cpu_count() or 1
+
+# Fewest policies worth sending to a worker process
+MIN_CHUNK = 32
+
+FREQUENCIES = ["monthly", "quarterly", "semiannual", "annual"]
+
+_MONTHS = {"monthly": 1, "quarterly": 3, "semiannual": 6, "annual": 12}
+
+
+@dataclass(frozen=True)
+class Policy:
+    """Rebalance when drift >= tolerance (percentage points), checked daily or on `frequency` days."""
+    tolerance: float = math.inf
+    frequency: str = None
+
+    @property
+    def kind(self):
+        if self.frequency is None:
+            return "buy_and_hold" if math.isinf(self.tolerance) else "band"
+        return "calendar" if self.tolerance <= 0 else "hybrid"
+
+    @property
+    def label(self):
+        if self.kind == "buy_and_hold":
+            return "Buy & hold"
+        if self.kind == "band":
+            return f"Band {self.tolerance:g}%"
+        if self.kind == "calendar":
+            return self.frequency.capitalize()
+        return f"{self.frequency.capitalize()} + {self.tolerance:g}%"
+
+
+def policy_grid(tolerances=(), frequencies=(), hybrid=True):
+    """Band policies for each tolerance, calendar policies for each frequency and, optionally, every hybrid."""
+    policies = [Policy(float(t)) for t in tolerances]
+    policies += [Policy(0.0, f) for f in frequencies]
+    if hybrid:
+        policies += [Policy(float(t), f) for f in frequencies for t in tolerances]
+    return policies
+
+
+def schedule(index, frequency):
+    """Boolean array: True on the first trading day of each new period (never on day 0)."""
+    if frequency is None:
+        return np.ones(len(index), dtype=bool)
+    months = _MONTHS[frequency]
+    index = pd.DatetimeIndex(index)
+    period = (index.year * 12 + index.month - 1) // months
+    flags = np.zeros(len(index), dtype=bool)
+    flags[1:] = period[1:] != period[:-1]
+    return flags
+
+
+def prepare_prices(prices, tickers):
+    """Closes of `tickers` from the first day all of them trade, gaps forward-filled."""
+    prices = prices[list(tickers)].ffill().dropna()
+    return prices[(prices > 0).all(axis=1)]
+
+
+def _simulate(growth, targets, tolerances, frequencies, flags, start_value, cost_rate):
+    """
+    Simulate policies side by side.
+
+    Each policy's holdings are kept as coefficients on the cumulative price
+    growth since day 0 (value = coef * growth[t]), so a day costs one
+    matrix-vector product for all totals, and drift is only computed for
+    the policies that check it that day.
+
+    Args:
+        growth: (days x assets) prices relative to day 0
+        targets: (assets,) target weights summing to 1
+        tolerances: (policies,) drift thresholds in percentage points
+        frequencies: (policies,) calendar frequency of each policy (None: daily)
+        flags: {frequency: schedule()} for every frequency used
+        start_value: Value invested at target weights on day 0
+        cost_rate: Transaction cost as a fraction of the traded value
+
+    Returns:
+        dict of per-policy arrays
+    """
+    k = len(tolerances)
+    coef = np.tile(targets * start_value, (k, 1))
+    rebalances = np.zeros(k, dtype=np.int64)
+    trades = np.zeros(k, dtype=np.int64)
+    turnover = np.zeros(k)
+    costs = np.zeros(k)
+    diff_sum = np.zeros(k)
+    diff_sq = np.zeros(k)
+
+    # Policies checking drift on each kind of day; buy-and-hold never does
+    checking = np.isfinite(tolerances)
+    rows_for = {f: np.flatnonzero(checking & np.array([g == f for g in frequencies], dtype=bool))
+                for f in flags}
+    daily = rows_for.pop(None, np.zeros(0, dtype=np.int64))
+    calendar = [(flags[f], rows) for f, rows in rows_for.items() if len(rows)]
+
+    # Daily return of the target mix held at exact weights (rebalanced every day)
+    target_returns = (growth[1:] / growth[:-1]) @ targets - 1
+
+    previous = np.full(k, float(start_value))
+    for t in range(1, len(growth)):
+        g = growth[t]
+        total = coef @ g
+        diff = total / previous - 1 - target_returns[t - 1]
+        diff_sum += diff
+        diff_sq += diff * diff
+        previous = total
+
+        due = [rows for flag, rows in calendar if flag[t]]
+        rows = np.concatenate([daily] + due) if due else daily
+        if not len(rows):
+            continue
+        values = coef[rows] * g
+        drift = np.abs(values / total[rows, None] - targets).max(axis=1) * 100
+        hit = drift >= tolerances[rows]
+        if not hit.any():
+            continue
+        rows, values = rows[hit], values[hit]
+        traded = np.abs(total[rows, None] * targets - values)
+        fee = cost_rate * traded.sum(axis=1)
+        after = total[rows] - fee
+        coef[rows] = after[:, None] * targets / g
+        rebalances[rows] += 1
+        trades[rows] += (traded > 1e-9 * total[rows, None]).sum(axis=1)
+        turnover[rows] += traded.sum(axis=1)
+        costs[rows] += fee
+        previous[rows] = after
+
+    days = max(len(growth) - 1, 1)
+    mean = diff_sum / days
+    var = np.maximum(diff_sq / days - mean ** 2, 0.0) * days / max(days - 1, 1)
+    return {
+        "rebalances": rebalances,
+        "trades": trades,
+        "turnover": turnover,
+        "costs": costs,
+        "tracking_error": np.sqrt(var * 252),
+        "final_value": previous,
+    }
+
+
+def backtest(prices, targets, policies, start_value=10000.0, cost_rate=0.0):
+    """
+    Backtest rebalancing policies over a price history (single process).
+
+    Args:
+        prices: Close prices (days x tickers), see prepare_prices()
+        targets: Target % per ticker, in column order (normalized to 100)
+        policies: Policy list
+        start_value: Amount invested at target weights on the first day
+        cost_rate: Transaction cost as a fraction of the traded value
+
+    Returns:
+        DataFrame: one row per policy, in the given order
+    """
+    policies = list(policies)
+    targets = np.asarray(targets, dtype="float64")
+    targets = targets / targets.sum()
+    closes = prices.to_numpy(dtype="float64")
+    growth = closes / closes[0]
+
+    frequencies = [p.frequency for p in policies]
+    flags = {f: schedule(prices.index, f) for f in set(frequencies)}
+    tolerances = np.array([p.tolerance for p in policies], dtype="float64")
+
+    stats = _simulate(growth, targets, tolerances, frequencies, flags, float(start_value), float(cost_rate))
+    frame = pd.DataFrame({
+        "policy": [p.label for p in policies],
+        "kind": [p.kind for p in policies],
+        "tolerance": tolerances,
+        "frequency": [p.frequency for p in policies],
+    })
+    for column, values in stats.items():
+        frame[column] = values
+    return frame
+
+
+def _backtest_chunk(args):
+    return backtest(*args)
+
+
+def sweep(prices, targets, policies, start_value=10000.0, cost_rate=0.0, workers=BACKTEST_WORKERS):
+    """
+    backtest() over a large policy grid, split across worker processes.
+
+    Grids smaller than two chunks of MIN_CHUNK policies run in-process, since
+    starting workers would cost more than it saves. Meant for scripts and
+    perf runs: the Streamlit server is multi-threaded, where forking workers
+    is unsafe, so the app calls backtest() directly.
+    """
+    policies = list(policies)
+    workers = min(workers, len(policies) // MIN_CHUNK)
+    if workers <= 1:
+        return backtest(prices, targets, policies, start_value, cost_rate)
+
+    size = math.ceil(len(policies) / workers)
+    chunks = [(prices, targets, policies[i:i + size], start_value, cost_rate)
+              for i in range(0, len(policies), size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(_backtest_chunk, chunks))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,173 @@
+"""
+Multi-benchmark comparison engine.
+
+A profile can be compared against several benchmarks at once. Each benchmark
+is a single ticker ("SPY") or a constant-mix blend ("VTI:60,BND:40",
+rebalanced daily). Benchmark return series are cached per ticker and shared
+by every profile; relative-risk metrics are computed for all benchmarks in
+one vectorized pass over the aligned return matrix.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+# Presets offered in the sidebar (label -> spec)
+BENCHMARK_OPTIONS = {
+    "S&P 500 (SPY)": "SPY",
+    "NASDAQ-100 (QQQ)": "QQQ",
+    "Total Market (VTI)": "VTI",
+    "Russell 2000 (IWM)": "IWM",
+    "Dow Jones (DIA)": "DIA",
+    "60/40 Stocks/Bonds (VTI:60,BND:40)": "VTI:60,BND:40",
+}
+
+
+def parse_benchmark(spec):
+    """
+    Weights of a benchmark spec.
+
+    Args:
+        spec: "SPY" or a blend such as "VTI:60,BND:40" (weights are normalized)
+
+    Returns:
+        dict: {ticker: weight}, weights summing to 1
+
+    Raises:
+        ValueError: The spec is empty or malformed
+    """
+    weights = {}
+    for part in str(spec).replace(";", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        ticker, _, weight = part.partition(":")
+        ticker = ticker.strip().upper()
+        try:
+            weights[ticker] = weights.get(ticker, 0.0) + (float(weight) if weight.strip() else 1.0)
+        except ValueError:
+            raise ValueError(f"Invalid weight in benchmark '{spec}'")
+    total = sum(weights.values())
+    if not weights or not ticker or total <= 0:
+        raise ValueError(f"Invalid benchmark '{spec}'")
+    return {t: w / total for t, w in weights.items()}
+
+
+def profile_benchmarks(prof):
+    """Benchmark specs of a profile; the legacy single `benchmark` comes first."""
+    specs = list(prof.get("benchmarks") or [])
+    if prof.get("benchmark") and prof["benchmark"] not in specs:
+        specs.insert(0, prof["benchmark"])
+    return specs
+
+
+class BenchmarkEngine:
+    """Cached benchmark returns shared across profiles."""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._returns = {}  # ticker -> (snapshot_id, start, daily returns)
+
+    def ticker_returns(self, tickers, start):
+        """
+        Daily simple returns of each ticker from `start`.
+
+        Returns:
+            DataFrame (index: dates, columns: tickers with data)
+        """
+        start = pd.Timestamp(start).normalize()
+        # Benchmark-only tickers are not refreshed by any profile: bring them up
+        # to date here (one batched download, nothing when the store is current)
+        if self.store.stale(tickers, start):
+            self.store.update(tickers, start)
+        columns = {}
+        for t in tickers:
+            snap = self.store.snapshot_id([t])
+            with self._lock:
+                cached = self._returns.get(t)
+            if cached is None or cached[0] != snap or cached[1] > start:
+                closes = self.store.history([t], start=start)
+                if t not in closes.columns:
+                    continue
+                series = closes[t].dropna().pct_change().iloc[1:]
+                cached = (snap, start, series)
+                with self._lock:
+                    self._returns[t] = cached
+            columns[t] = cached[2][cached[2].index >= start]
+        return pd.DataFrame(columns)
+
+    def returns(self, specs, start):
+        """
+        Daily returns of each benchmark spec (blends rebalanced daily).
+
+        Returns:
+            DataFrame with one column per spec that could be priced
+        """
+        parsed = {spec: parse_benchmark(spec) for spec in specs}
+        tickers = sorted({t for w in parsed.values() for t in w})
+        by_ticker = self.ticker_returns(tickers, start)
+        columns = {}
+        for spec, weights in parsed.items():
+            if not all(t in by_ticker.columns for t in weights):
+                continue
+            legs = by_ticker[list(weights)].dropna()
+            columns[spec] = pd.Series(legs.to_numpy() @ np.array(list(weights.values())), index=legs.index)
+        return pd.DataFrame(columns)
+
+
+def growth(returns, start_value):
+    """Value of `start_value` invested at the start of each return column."""
+    return (1 + returns.fillna(0)).cumprod() * start_value
+
+
+def relative_metrics(portfolio_returns, benchmark_returns, periods=TRADING_DAYS):
+    """
+    Relative-risk metrics of a portfolio against every benchmark column at once.
+
+    Returns are aligned on the dates all series share. Alpha is Jensen's alpha
+    with a zero risk-free rate; up/down capture compare mean returns on the
+    benchmark's up and down days.
+
+    Returns:
+        DataFrame indexed by benchmark with tracking_error, beta, alpha,
+        information_ratio, up_capture, down_capture (annualized where
+        applicable, as fractions) and days
+    """
+    joined = pd.concat([portfolio_returns.rename("__portfolio__"), benchmark_returns], axis=1).dropna()
+    columns = list(benchmark_returns.columns)
+    if len(joined) < 2 or not columns:
+        return pd.DataFrame(index=columns, columns=[
+            "tracking_error", "beta", "alpha", "information_ratio", "up_capture", "down_capture", "days"])
+
+    p = joined["__portfolio__"].to_numpy()[:, None]
+    B = joined[columns].to_numpy()
+    n = len(p)
+
+    active = p - B
+    tracking_error = active.std(axis=0, ddof=1) * np.sqrt(periods)
+
+    p_dev = p - p.mean()
+    B_dev = B - B.mean(axis=0)
+    var_b = (B_dev ** 2).sum(axis=0) / (n - 1)
+    cov_pb = (p_dev * B_dev).sum(axis=0) / (n - 1)
+
+    up, down = B > 0, B < 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = cov_pb / var_b
+        alpha = (p.mean() - beta * B.mean(axis=0)) * periods
+        information_ratio = active.mean(axis=0) * periods / tracking_error
+        up_capture = ((p * up).sum(axis=0) / up.sum(axis=0)) / ((B * up).sum(axis=0) / up.sum(axis=0))
+        down_capture = ((p * down).sum(axis=0) / down.sum(axis=0)) / ((B * down).sum(axis=0) / down.sum(axis=0))
+
+    return pd.DataFrame({
+        "tracking_error": tracking_error,
+        "beta": beta,
+        "alpha": alpha,
+        "information_ratio": information_ratio,
+        "up_capture": up_capture,
+        "down_capture": down_capture,
+        "days": n,
+    }, index=columns)
@@ -0,0 +1,70 @@
+"""
+Chart data pipeline: level-of-detail downsampling for time-series charts.
+
+Long series are reduced to a point budget with Largest-Triangle-Three-Buckets
+(LTTB), which keeps the visual shape (peaks, troughs, crashes) far better
+than taking every n-th point. Long ranges are drawn with WebGL traces, and
+constant reference lines only need their two end points.
+"""
+import os
+
+import numpy as np
+
+CHART_MAX_POINTS = int(os.environ.get("ALPHASTREAM_CHART_POINTS", "1500"))
+
+# Series longer than this (before downsampling) are drawn with WebGL traces
+WEBGL_MIN_POINTS = 2000
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the points kept by LTTB, always including the first and last.
+
+    Args:
+        x, y: Equal-length float arrays, x ascending
+        n_out: Point budget
+
+    Returns:
+        np.ndarray of sorted integer positions
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        # Twice the triangle area formed with the previous pick and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(series, max_points=CHART_MAX_POINTS):
+    """Reduce a date-indexed Series to at most `max_points` points with LTTB."""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.values.astype("datetime64[ns]").astype("int64").astype("float64")
+    y = series.values.astype("float64")
+    return series.iloc[lttb_indices(x, y, max_points)]
+
+
+def reference_line(index, value):
+    """Two-point (x, y) arrays for a horizontal line across `index`."""
+    return [index[0], index[-1]], [value, value]
+
+
+def use_webgl(*series):
+    """True when any series covers a range long enough to warrant WebGL traces."""
+    return any(len(s) > WEBGL_MIN_POINTS for s in series)
+
@@ -0,0 +1,96 @@
+"""
+Vectorized drift engine.
+
+Builds a profiles x tickers holdings matrix and target-weight matrix once
+and computes values, actual weights, drift and tolerance breaches for every
+profile in one NumPy pass. Applies the same rules as
+`portfolio.calculate_drift_status`: drift is suppressed until a profile is
+100% deployed, a never-rebalanced profile always needs rebalancing, and a
+profile rebalanced in the last 24 hours is left alone.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class DriftScan:
+    """Drift of many profiles; row i of every matrix is profile `names[i]`."""
+    names: list
+    tickers: list
+    units: np.ndarray          # profiles x tickers
+    targets: np.ndarray        # target %, profiles x tickers
+    held: np.ndarray           # bool, ticker is one of the profile's assets
+    values: np.ndarray         # current value per profile
+    weights: np.ndarray        # actual %, profiles x tickers
+    drift: np.ndarray          # |actual - target| in percentage points
+    breaches: np.ndarray       # bool, drift >= tolerance on a checked profile
+    needs_rebalance: np.ndarray
+    details: dict = field(default_factory=dict)  # {name: [(ticker, drift, actual_pct, target_pct)]}
+
+
+def drift_scan(profiles, prices):
+    """
+    Drift status of every profile at once.
+
+    Args:
+        profiles: {name: profile} (full profiles or index summaries)
+        prices: {ticker: latest price}; missing tickers are valued at 0
+
+    Returns:
+        DriftScan whose `details` matches calculate_drift_status for each profile
+    """
+    # Deferred to avoid a circular import (portfolio builds on this module)
+    from portfolio import check_recently_rebalanced
+
+    names = list(profiles)
+    col = {}
+    rows, cols, units, targets = [], [], [], []
+    for i, name in enumerate(names):
+        assets = profiles[name].get("assets", {})
+        rows.extend([i] * len(assets))
+        cols.extend([col.setdefault(t, len(col)) for t in assets])
+        units.extend([a["units"] for a in assets.values()])
+        targets.extend([a["target"] for a in assets.values()])
+    tickers = list(col)
+    rows, cols = np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+    shape = (len(names), len(tickers))
+    U = np.zeros(shape)
+    W = np.zeros(shape)
+    held = np.zeros(shape, dtype=bool)
+    U[rows, cols] = np.array(units, dtype="float64")
+    W[rows, cols] = np.array(targets, dtype="float64")
+    held[rows, cols] = True
+
+    price_vec = np.array([prices.get(t, 0) for t in tickers], dtype="float64")
+    position_values = U * price_vec
+    values = position_values.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(values[:, None] != 0, position_values / values[:, None] * 100, 0.0)
+    drift = np.abs(weights - W)
+
+    tolerance = np.array([profiles[n].get("drift_tolerance", 5.0) for n in names], dtype="float64")
+    allocated = np.array([profiles[n].get("allocated_pct", 0.0) for n in names], dtype="float64")
+    last = [profiles[n].get("last_rebalanced") for n in names]
+    has_rebalanced = np.array([lr is not None for lr in last], dtype=bool)
+
+    # ASSET ALLOCATION: drift is only checked once fully deployed
+    active = held.any(axis=1) & (values != 0) & (allocated >= 100.0)
+    checked = active & has_rebalanced
+    for i in np.flatnonzero(checked):
+        # 24-hour grace period after a rebalance
+        if check_recently_rebalanced(last[i]):
+            checked[i] = False
+    breaches = held & checked[:, None] & (drift >= tolerance[:, None])
+    needs = (active & ~has_rebalanced) | breaches.any(axis=1)
+
+    details = {name: [] for name in names}
+    for i in np.flatnonzero(breaches.any(axis=1)):
+        name = names[i]
+        hit, d, w, target = breaches[i].tolist(), drift[i].tolist(), weights[i].tolist(), W[i].tolist()
+        # Reported in the profile's asset order, like calculate_drift_status
+        details[name] = [(t, d[col[t]], w[col[t]], target[col[t]]) for t in profiles[name]["assets"] if hit[col[t]]]
+
+    return DriftScan(names, tickers, U, W, held, values, weights, drift, breaches, needs, details)
@@ -0,0 +1,139 @@
+"""
+Database mutations as events.
+
+Every change the app makes to a profile is described by an event dict and
+applied with `apply_event`. The same function mutates the in-memory database
+of a session and replays the journal on startup, so both always agree.
+
+Event shape:
+    {"type": ..., "profile": name, "ts": "YYYY-mm-dd HH:MM:SS", "log": message or None, ...payload}
+"""
+import copy
+from datetime import datetime
+
+import lots
+from storage import normalize_profile
+
+PROFILE_CREATED = "profile_created"
+PROFILE_REPLACED = "profile_replaced"
+SETTINGS_CHANGED = "settings_changed"
+ASSET_UPSERTED = "asset_upserted"
+ASSET_REMOVED = "asset_removed"
+DEPLOYMENT = "deployment"
+REBALANCE = "rebalance"
+
+
+def _event(kind, profile, log=None, when=None, **payload):
+    event = {
+        "type": kind,
+        "profile": profile,
+        "ts": (when or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+        "log": log,
+    }
+    event.update(payload)
+    return event
+
+
+def profile_created(name, profile):
+    return _event(PROFILE_CREATED, name, log="Profile created", data=copy.deepcopy(profile))
+
+
+def profile_replaced(name, profile):
+    """Full-state fallback for changes not described by a finer-grained event."""
+    return _event(PROFILE_REPLACED, name, data=copy.deepcopy(profile))
+
+
+def settings_changed(name, log=None, **changes):
+    return _event(SETTINGS_CHANGED, name, log=log, changes=changes)
+
+
+def asset_upserted(name, ticker, units, target, log=None, price=None):
+    """
+    Args:
+        price: Current price; a change in units is booked as a lot trade at this
+            price (as a lot of unknown cost when None)
+    """
+    return _event(ASSET_UPSERTED, name, log=log, ticker=ticker, units=units, target=target, price=price)
+
+
+def asset_removed(name, ticker, log=None):
+    return _event(ASSET_REMOVED, name, log=log, ticker=ticker)
+
+
+def deployment(name, purchases, deploy_pct, log=None):
+    """
+    Args:
+        purchases: {ticker: purchase dict} recorded by "Record Deployment"
+        deploy_pct: Percent of principal deployed
+    """
+    return _event(DEPLOYMENT, name, log=log, purchases=copy.deepcopy(purchases), deploy_pct=deploy_pct)
+
+
+def rebalance(name, new_units, stat, changes, log=None, when=None, prices=None, lot_ids=None):
+    """
+    Args:
+        new_units: {ticker: units after rebalancing}
+        stat: Human-readable summary line for "Rebalancing History"
+        changes: {ticker: signed unit change}, stored in rebalance_events
+        prices: {ticker: trade price}; buys open lots and sells realize P&L at it
+        lot_ids: {ticker: [lot ids]} to relieve for sells, overriding the
+            profile's lot method with specific identification
+    """
+    return _event(REBALANCE, name, log=log, when=when, units=dict(new_units), stat=stat, changes=dict(changes),
+                  prices=dict(prices or {}), lot_ids=dict(lot_ids or {}))
+
+
+def _relief_method(prof):
+    """Lot relief method of a profile; specific identification needs explicit lot ids."""
+    method = prof.get("lot_method", lots.FIFO)
+    return lots.FIFO if method == lots.SPECIFIC else method
+
+
+def apply_event(db, event):
+    """Apply one event to a database document in place."""
+    kind = event["type"]
+    name = event["profile"]
+    profiles = db.setdefault("profiles", {})
+
+    if kind in (PROFILE_CREATED, PROFILE_REPLACED):
+        profiles[name] = normalize_profile(copy.deepcopy(event["data"]))
+    else:
+        prof = profiles[name]
+        if kind == SETTINGS_CHANGED:
+            prof.update(event["changes"])
+        elif kind == ASSET_UPSERTED:
+            # ASSET ALLOCATION: Ensure purchases list exists
+            previous = prof.get("assets", {}).get(event["ticker"], {})
+            # Other asset fields (e.g. a per-asset lot_size) are kept as they were
+            asset_data = prof.setdefault("assets", {})[event["ticker"]] = dict(
+                previous,
+                units=event["units"],
+                target=event["target"],
+                purchases=previous.get("purchases", []),
+                lots=previous.get("lots", []),
+                position=previous.get("position") or lots.empty_position(),
+            )
+            lots.trade_to(asset_data, event["units"], event.get("price"), event["ts"][:10],
+                          method=_relief_method(prof), source="adjustment")
+        elif kind == ASSET_REMOVED:
+            prof.get("assets", {}).pop(event["ticker"], None)
+        elif kind == DEPLOYMENT:
+            for ticker, purchase in event["purchases"].items():
+                asset_data = prof["assets"][ticker]
+                asset_data.setdefault("purchases", []).append(dict(purchase))
+                lots.buy(asset_data, purchase["quantity"], purchase.get("price") or 0.0, purchase.get("date", event["ts"][:10]),
+                         cost=purchase.get("amount"), allocated_pct=purchase.get("allocated_pct", 0), source="deployment")
+                asset_data["units"] = asset_data.get("units", 0) + purchase["quantity"]
+            prof["allocated_pct"] = min(100.0, prof.get("allocated_pct", 0) + event["deploy_pct"])
+        elif kind == REBALANCE:
+            for ticker, units in event["units"].items():
+                if ticker in prof.get("assets", {}):
+                    lot_ids = event.get("lot_ids", {}).get(ticker)
+                    lots.trade_to(prof["assets"][ticker], units, event.get("prices", {}).get(ticker), event["ts"][:10],
+                                  method=lots.SPECIFIC if lot_ids else _relief_method(prof), lot_ids=lot_ids)
+                    prof["assets"][ticker]["units"] = units
+            prof["last_rebalanced"] = event["ts"]
+            prof.setdefault("rebalance_events", []).append({"date": event["ts"], "changes": event["changes"]})
+        else:
+            raise ValueError(f"Unknown event type '{kind}'")
+    return db
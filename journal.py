@@ -0,0 +1,176 @@
+"""
+Append-only event journal storage backend.
+
+Mutations are appended to `journal.jsonl` as events (see events.py) instead of
+rewriting the database, so a write costs O(event) rather than O(database).
+A background compaction periodically folds the journal into `snapshot.json`;
+startup loads the snapshot and replays only the events after it. Folded
+journal segments are moved to `archive/`, which keeps the complete audit
+trail of every change.
+
+Layout under the journal directory:
+    snapshot.json                 {"seq": last folded event, "db": {...}}
+    journal.jsonl                 events after the snapshot, one per line
+    archive/events-<a>-<b>.jsonl  folded segments
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+
+from events import apply_event, profile_replaced
+from storage import normalize_profile
+
+JOURNAL_DIR = "alphastream_journal"
+JOURNAL_COMPACT_EVERY = int(os.environ.get("ALPHASTREAM_JOURNAL_COMPACT_EVERY", "500"))
+
+
+class JournalBackend:
+    """Event-sourced storage: snapshot + replayed journal tail."""
+
+    def __init__(self, root=JOURNAL_DIR, compact_every=JOURNAL_COMPACT_EVERY):
+        self.root = root
+        self.compact_every = compact_every
+        self.snapshot_path = os.path.join(root, "snapshot.json")
+        self.journal_path = os.path.join(root, "journal.jsonl")
+        self.archive_dir = os.path.join(root, "archive")
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self._state = None        # replica of the database, kept current by applying events
+        self._seq = 0             # last journaled event
+        self._snapshot_seq = 0    # last event folded into the snapshot
+
+    def _read_events(self, after):
+        """Events with seq > after; a torn final line left by a crash is cut off."""
+        events, good_offset, torn = [], 0, False
+        if not os.path.exists(self.journal_path):
+            return events
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        torn = True
+                        break
+                    if event["seq"] > after:
+                        events.append(event)
+                good_offset += len(line)
+        if torn:
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good_offset)
+        return events
+
+    def load(self):
+        with self._lock:
+            state, seq = {"profiles": {}, "global_logs": []}, 0
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r") as f:
+                    snap = json.load(f)
+                state, seq = snap["db"], snap["seq"]
+                state.setdefault("profiles", {})
+                state.setdefault("global_logs", [])
+                for p in state["profiles"].values():
+                    normalize_profile(p)
+
+            self._snapshot_seq = seq
+            for event in self._read_events(after=seq):
+                apply_event(state, event)
+                seq = event["seq"]
+
+            self._state, self._seq = state, seq
+            return copy.deepcopy(state)
+
+    def save(self, data, profiles=None, events=None):
+        """
+        Append events to the journal.
+
+        Args:
+            data: The session's database (only used when `events` is missing)
+            profiles: Profiles changed without a describing event; recorded as
+                full-profile replacement events
+            events: Events already applied to `data`
+        """
+        if events is None:
+            names = list(data.get("profiles", {})) if profiles is None else profiles
+            events = [profile_replaced(n, data["profiles"][n]) for n in names if n in data.get("profiles", {})]
+
+        if self._state is None:
+            self.load()
+        with self._lock:
+            with open(self.journal_path, "a") as f:
+                for event in events:
+                    self._seq += 1
+                    event = dict(event, seq=self._seq)
+                    apply_event(self._state, copy.deepcopy(event))
+                    f.write(json.dumps(event) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            pending = self._seq - self._snapshot_seq
+
+        if self.compact_every and pending >= self.compact_every:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Fold the journal into a new snapshot and archive the folded events."""
+        if not self._compacting.acquire(blocking=False):
+            return  # Another compaction is already running
+        try:
+            with self._lock:
+                if self._state is None or self._seq == self._snapshot_seq:
+                    return
+                state, seq = copy.deepcopy(self._state), self._seq
+
+            # The expensive serialization happens outside the lock so writers keep appending
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"seq": seq, "db": state}, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self._lock:
+                os.replace(tmp, self.snapshot_path)
+                folded, tail = [], []
+                if os.path.exists(self.journal_path):
+                    with open(self.journal_path, "r") as f:
+                        for line in f:
+                            if line.strip():
+                                (folded if json.loads(line)["seq"] <= seq else tail).append(line)
+                if folded:
+                    first = json.loads(folded[0])["seq"]
+                    archive = os.path.join(self.archive_dir, f"events-{first:012d}-{seq:012d}.jsonl")
+                    with open(archive, "w") as f:
+                        f.writelines(folded)
+                fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+                with os.fdopen(fd, "w") as f:
+                    f.writelines(tail)
+                os.replace(tmp, self.journal_path)
+                self._snapshot_seq = seq
+        finally:
+            self._compacting.release()
+
+    def history(self, profile=None):
+        """All events ever recorded (archive + live journal), oldest first."""
+        paths = sorted(
+            os.path.join(self.archive_dir, name)
+            for name in os.listdir(self.archive_dir) if name.endswith(".jsonl")
+        )
+        paths.append(self.journal_path)
+        last_seq = 0
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    # Skip events both archived and still in the journal after an interrupted compaction
+                    if event["seq"] <= last_seq:
+                        continue
+                    last_seq = event["seq"]
+                    if profile is None or event["profile"] == profile:
+                        yield event
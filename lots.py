@@ -0,0 +1,196 @@
+"""
+Tax-lot ledger.
+
+Every buy (deployment purchase, rebalance buy, manual increase) opens a lot
+on the asset; sells relieve open lots FIFO, LIFO, HIFO (highest cost first)
+or by specific lot ID. Alongside the lots each asset keeps a running
+`position` aggregate -- quantity, remaining cost basis, allocated % and
+realized P&L -- updated on every write, so average cost and P&L are
+constant-time reads however many lots an asset has.
+
+Units added without a known price (legacy holdings, manual unit edits) open
+lots whose cost is None. Their quantity is tracked as `unknown` and left out
+of average cost and P&L, rather than counted at a made-up cost.
+
+Asset layout:
+    asset["lots"]     = [{"id", "date", "quantity", "price", "cost", "source"}]  (open lots, oldest first)
+    asset["position"] = {"quantity", "cost", "unknown", "allocated_pct", "realized", "next_id"}
+"""
+FIFO = "FIFO"
+LIFO = "LIFO"
+HIFO = "HIFO"
+SPECIFIC = "SPECIFIC"
+METHODS = [FIFO, LIFO, HIFO, SPECIFIC]
+
+# Quantities below this are treated as zero (float noise from fractional units)
+EPSILON = 1e-9
+
+
+def empty_position():
+    return {"quantity": 0.0, "cost": 0.0, "unknown": 0.0, "allocated_pct": 0.0, "realized": 0.0, "next_id": 1}
+
+
+def buy(asset, quantity, price, when, cost=None, allocated_pct=0.0, source="buy"):
+    """
+    Open a lot and update the running aggregates.
+
+    Args:
+        asset: Asset dict (lots/position are created if missing)
+        quantity: Units bought (> 0)
+        price: Price per unit, or None if not known
+        when: Trade date (ISO string)
+        cost: Total cost basis; defaults to quantity * price (None without a price)
+        allocated_pct: Share of the principal this purchase deployed
+        source: Origin of the lot (deployment, rebalance, adjustment, ...)
+
+    Returns:
+        dict: The new lot, or None for a zero quantity (only allocated_pct is booked)
+    """
+    pos = asset.setdefault("position", empty_position())
+    pos["allocated_pct"] += float(allocated_pct)
+    if quantity <= EPSILON:
+        return None
+    if cost is None and price is not None:
+        cost = quantity * price
+    lot = {
+        "id": pos["next_id"],
+        "date": str(when),
+        "quantity": float(quantity),
+        "price": float(price) if price is not None else None,
+        "cost": float(cost) if cost is not None else None,
+        "source": source,
+    }
+    asset.setdefault("lots", []).append(lot)
+    pos["next_id"] += 1
+    pos["quantity"] += lot["quantity"]
+    if lot["cost"] is None:
+        pos["unknown"] = pos.get("unknown", 0.0) + lot["quantity"]
+    else:
+        pos["cost"] += lot["cost"]
+    return lot
+
+
+def _relief_order(lots, method, lot_ids):
+    """Indices of `lots` in the order a sale consumes them."""
+    if method == FIFO:
+        return range(len(lots))
+    if method == LIFO:
+        return range(len(lots) - 1, -1, -1)
+    if method == HIFO:
+        # Lots of unknown cost go last
+        return sorted(range(len(lots)), reverse=True,
+                      key=lambda i: lots[i]["cost"] / lots[i]["quantity"] if lots[i]["cost"] is not None else float("-inf"))
+    if method == SPECIFIC:
+        position_of = {lot["id"]: i for i, lot in enumerate(lots)}
+        missing = [i for i in lot_ids or [] if i not in position_of]
+        if missing:
+            raise ValueError(f"Unknown lot id(s): {missing}")
+        return [position_of[i] for i in lot_ids]
+    raise ValueError(f"Unknown lot relief method '{method}'")
+
+
+def sell(asset, quantity, price, method=FIFO, lot_ids=None):
+    """
+    Relieve `quantity` units from the open lots and realize P&L at `price`.
+
+    Args:
+        asset: Asset dict
+        quantity: Units sold (> 0)
+        price: Sale price per unit; None relieves at cost (no realized P&L)
+        method: FIFO, LIFO, HIFO or SPECIFIC
+        lot_ids: Lot IDs in relief order, for SPECIFIC
+
+    Returns:
+        list of (lot id, quantity, cost relieved) per consumed lot; the cost
+        is None for lots of unknown cost, which realize no P&L
+
+    Raises:
+        ValueError: More units than the open lots hold, or an unknown lot/method
+    """
+    pos = asset.setdefault("position", empty_position())
+    lots = asset.setdefault("lots", [])
+    if quantity > pos["quantity"] + EPSILON:
+        raise ValueError(f"Cannot sell {quantity:g} units; only {pos['quantity']:g} held in lots")
+
+    relieved = []
+    left = float(quantity)
+    for i in _relief_order(lots, method, lot_ids):
+        if left <= EPSILON:
+            break
+        lot = lots[i]
+        take = min(lot["quantity"], left)
+        cost = lot["cost"] * take / lot["quantity"] if lot["cost"] is not None else None
+        lot["quantity"] -= take
+        if cost is not None:
+            lot["cost"] -= cost
+        left -= take
+        relieved.append((lot["id"], take, cost))
+    if left > EPSILON:
+        raise ValueError(f"Selected lots hold {quantity - left:g} of the {quantity:g} units sold")
+
+    sold_cost = sum(c for _, _, c in relieved if c is not None)
+    sold_known = sum(q for _, q, c in relieved if c is not None)
+    asset["lots"] = [lot for lot in lots if lot["quantity"] > EPSILON]
+    pos["quantity"] = max(0.0, pos["quantity"] - quantity)
+    pos["unknown"] = max(0.0, pos.get("unknown", 0.0) - (quantity - sold_known))
+    pos["cost"] = max(0.0, pos["cost"] - sold_cost) if known_quantity(asset) > EPSILON else 0.0
+    if price is not None:
+        pos["realized"] += sold_known * float(price) - sold_cost
+    return relieved
+
+
+def trade_to(asset, units, price, when, method=FIFO, lot_ids=None, source="rebalance"):
+    """Buy or sell lots so the ledger holds `units`; returns the signed change."""
+    change = float(units) - position(asset)["quantity"]
+    if change > EPSILON:
+        buy(asset, change, price, when, source=source)
+    elif change < -EPSILON:
+        sell(asset, -change, price, method, lot_ids)
+    return change
+
+
+def position(asset):
+    """Running aggregates of an asset (empty when it has no ledger)."""
+    return asset.get("position") or empty_position()
+
+
+def known_quantity(asset):
+    """Units held in lots of known cost."""
+    pos = position(asset)
+    return pos["quantity"] - pos.get("unknown", 0.0)
+
+
+def average_cost(asset):
+    """Average cost per unit of the open lots of known cost, or None without any."""
+    quantity = known_quantity(asset)
+    return position(asset)["cost"] / quantity if quantity > EPSILON else None
+
+
+def unrealized_pnl(asset, price):
+    """Unrealized P&L of the lots of known cost."""
+    return known_quantity(asset) * price - position(asset)["cost"]
+
+
+def realized_pnl(asset):
+    return position(asset)["realized"]
+
+
+def build_ledger(asset, default_date=None):
+    """
+    Ledger for an asset recorded before lots existed.
+
+    Every purchase becomes a lot; if later rebalances changed `units`, the
+    difference is reconciled with an adjustment lot of unknown cost (bought)
+    or a FIFO relief at cost (sold), since those trades' prices were not recorded.
+    """
+    asset["lots"] = []
+    asset["position"] = empty_position()
+    for p in asset.get("purchases", []):
+        quantity = float(p.get("quantity", 0))
+        price = p.get("price") or (p["amount"] / quantity if p.get("amount") is not None and quantity > EPSILON else None)
+        buy(asset, quantity, price, p.get("date", default_date),
+            cost=p.get("amount"), allocated_pct=p.get("allocated_pct", 0), source="deployment")
+    units = float(asset.get("units", 0) or 0)
+    if abs(units - asset["position"]["quantity"]) > EPSILON:
+        trade_to(asset, units, None, default_date, source="adjustment")
+    return asset
@@ -0,0 +1,75 @@
+"""
+Memoized portfolio results.
+
+Valuation, drift and the Portfolio Manager tables only depend on a profile's
+content and the prices they were computed from, so a rerun that changed
+neither (expanding an info box, switching tabs) can reuse the last result.
+Results are cached under a key made of the result kind, the profile version
+and a price-snapshot ID, in a bounded LRU shared by all sessions.
+
+Cached results are shared: callers must treat them as read-only.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from portfolio import check_recently_rebalanced
+
+RESULT_CACHE_SIZE = int(os.environ.get("ALPHASTREAM_RESULT_CACHE", "256"))
+
+
+def profile_key(name, version, price_snapshot, prof):
+    """
+    Cache key for results computed from one profile.
+
+    Besides the profile and price versions it includes today's date (CAGR
+    depends on it) and whether the 24h post-rebalance grace period is active,
+    so results also change when time alone changes them.
+    """
+    return (name, version, price_snapshot, date.today().isoformat(),
+            check_recently_rebalanced(prof.get("last_rebalanced")))
+
+
+def dashboard_key(profiles, versions, price_snapshot):
+    """Cache key for cross-profile results such as the dashboard summary."""
+    h = hashlib.blake2b(digest_size=8)
+    for name in profiles:
+        grace = check_recently_rebalanced(profiles[name].get("last_rebalanced"))
+        h.update(f"{name}\0{versions.get(name, 0)}\0{grace:d}\0".encode())
+    return (h.hexdigest(), price_snapshot)
+
+
+class ResultCache:
+    """Thread-safe bounded LRU of computed results."""
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, key, compute):
+        """Return the cached result for (kind, key), computing and storing it on a miss."""
+        full_key = (kind,) + tuple(key)
+        with self._lock:
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return self._entries[full_key]
+            self.misses += 1
+
+        # Computed outside the lock; two sessions missing together both compute
+        result = compute()
+        with self._lock:
+            self._entries[full_key] = result
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1 @@
+"""Performance benchmarks for AlphaStream Wealth Master."""
@@ -0,0 +1,158 @@
+"""
+Synthetic data generator for the benchmark suite.
+
+Builds `alphastream_wealth.json`-shaped databases of arbitrary size plus
+geometric-Brownian-motion price fixtures readable by the ReplayProvider.
+
+Usage:
+    python -m perf.generate --profiles 1000 --assets 50 --purchases 20 --years 20 \\
+        --db alphastream_wealth.json --fixtures fixtures
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from providers import ReplayProvider
+
+
+def synthetic_universe(size):
+    """Deterministic fake ticker symbols: S0000, S0001, ..."""
+    return [f"S{i:04d}" for i in range(size)]
+
+
+def synthetic_prices(tickers, years, end=None, seed=0):
+    """
+    Daily closes following a geometric Brownian motion.
+
+    Returns:
+        pd.DataFrame indexed by business days with one column per ticker
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or datetime.now().date()).normalize()
+    index = pd.bdate_range(end - pd.DateOffset(years=years), end)
+    n_days, n_assets = len(index), len(tickers)
+
+    mu = rng.uniform(0.02, 0.12, n_assets) / 252
+    sigma = rng.uniform(0.10, 0.45, n_assets) / np.sqrt(252)
+    log_returns = rng.standard_normal((n_days, n_assets)) * sigma + (mu - sigma ** 2 / 2)
+    log_returns[0] = 0.0
+    start = rng.uniform(10, 500, n_assets)
+    closes = start * np.exp(np.cumsum(log_returns, axis=0))
+    return pd.DataFrame(closes, index=index, columns=tickers)
+
+
+def write_price_fixtures(root, prices):
+    """Write one CSV fixture per ticker for the ReplayProvider."""
+    provider = ReplayProvider(root)
+    for t in prices.columns:
+        provider.write_fixture(t, prices[t])
+    return provider
+
+
+def synthetic_profile(rng, tickers, prices, purchases_per_asset, principal, values=None):
+    """One fully-populated profile holding `tickers`, priced from `prices`."""
+    index = prices.index
+    start = index[0]
+    values = prices.to_numpy() if values is None else values
+    targets = rng.dirichlet(np.ones(len(tickers))) * 100
+    # Round so targets sum to exactly 100, like the sidebar enforces
+    targets = np.round(targets, 2)
+    targets[-1] = round(100 - targets[:-1].sum(), 2)
+
+    buy_rows = np.sort(rng.integers(0, len(index), size=purchases_per_asset))
+    deploy_pcts = rng.dirichlet(np.ones(purchases_per_asset)) * 100
+    fully_allocated = rng.random() < 0.8
+
+    buy_prices = values[np.ix_(buy_rows, prices.columns.get_indexer(tickers))]
+    buy_dates = [str(index[row].date()) for row in buy_rows]
+
+    assets = {}
+    for j, (t, target) in enumerate(zip(tickers, targets)):
+        purchases = []
+        units = 0.0
+        for k, pct in enumerate(deploy_pcts):
+            price = float(buy_prices[k, j])
+            asset_pct = target / 100 * pct
+            amount = asset_pct / 100 * principal
+            quantity = amount / price
+            units += quantity
+            purchases.append({
+                "date": buy_dates[k],
+                "amount": amount,
+                "price": price,
+                "quantity": quantity,
+                "allocated_pct": asset_pct,
+            })
+        assets[t] = {"units": units, "target": float(target), "purchases": purchases}
+
+    now = datetime.now()
+    last_rebalanced = None
+    if rng.random() < 0.7:
+        last_rebalanced = (now - timedelta(days=int(rng.integers(2, 400)))).strftime("%Y-%m-%d %H:%M:%S")
+
+    return {
+        "currency": "USD" if rng.random() < 0.7 else "CAD",
+        "principal": principal,
+        "yearly_goal_pct": float(rng.choice([6.0, 8.0, 10.0, 12.0])),
+        "start_date": str(start.date()),
+        "assets": assets,
+        "rebalance_logs": [
+            {"date": (now - timedelta(days=i)).strftime("%Y-%m-%d %H:%M"), "event": f"Synthetic event {i}"}
+            for i in range(50)
+        ],
+        "drift_tolerance": float(rng.choice([2.5, 5.0, 7.5, 10.0])),
+        "rebalance_stats": [
+            f"{(now - timedelta(days=30 * i)).strftime('%Y-%m-%d %H:%M')} - 🟢 {tickers[0]} BUY 1.0000"
+            for i in range(10)
+        ],
+        "last_rebalanced": last_rebalanced,
+        "benchmark": None,
+        "rebalance_events": [],
+        "allocated_pct": 100.0 if fully_allocated else float(round(rng.uniform(10, 90), 1)),
+    }
+
+
+def synthetic_db(n_profiles, n_assets, purchases_per_asset, prices, seed=0):
+    """
+    A database of `n_profiles` profiles with `n_assets` assets each, drawn from
+    the columns of `prices`.
+    """
+    rng = np.random.default_rng(seed)
+    universe = list(prices.columns)
+    values = prices.to_numpy()
+    profiles = {}
+    for i in range(n_profiles):
+        tickers = [str(t) for t in rng.choice(universe, size=n_assets, replace=False)]
+        principal = float(rng.choice([10_000, 50_000, 100_000, 250_000, 1_000_000]))
+        profiles[f"Profile {i:05d}"] = synthetic_profile(
+            rng, tickers, prices, purchases_per_asset, principal, values
+        )
+    return {"profiles": profiles, "global_logs": []}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic AlphaStream database and price fixtures")
+    parser.add_argument("--profiles", type=int, default=100)
+    parser.add_argument("--assets", type=int, default=20)
+    parser.add_argument("--purchases", type=int, default=10, help="Purchases per asset")
+    parser.add_argument("--years", type=int, default=15)
+    parser.add_argument("--universe", type=int, default=None, help="Distinct tickers (default: 2x assets, min 100)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default="alphastream_wealth.json")
+    parser.add_argument("--fixtures", default="fixtures")
+    args = parser.parse_args(argv)
+
+    universe = synthetic_universe(args.universe or max(2 * args.assets, 100))
+    prices = synthetic_prices(universe, args.years, seed=args.seed)
+    write_price_fixtures(args.fixtures, prices)
+    db = synthetic_db(args.profiles, args.assets, args.purchases, prices, seed=args.seed)
+    with open(args.db, "w") as f:
+        json.dump(db, f, indent=2)
+    print(f"Wrote {args.profiles} profiles to {args.db} and {len(universe)} price fixtures to {args.fixtures}/")
+
+
+if __name__ == "__main__":
+    main()
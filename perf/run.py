@@ -0,0 +1,423 @@
+"""
+Benchmark runner.
+
+Generates a synthetic database per scale, serves prices from replay fixtures
+(no network) and times each hot path. Results are written as JSON so runs
+from different releases can be compared.
+
+Usage:
+    python -m perf.run                       # scales xs and s
+    python -m perf.run --scales xs s m l wide --repeats 5 --output perf_results.json
+    python -m perf.run --scenarios dashboard drift_status
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import events
+from activity import TRADE_TYPES, ActivityLog
+from analytics import AnalyticsCache
+from backtest import FREQUENCIES, policy_grid, prepare_prices, sweep
+from benchmarks import BenchmarkEngine, relative_metrics
+from chart_data import downsample
+from drift import drift_scan
+from journal import JournalBackend
+from perf.generate import synthetic_db, synthetic_prices, synthetic_universe, write_price_fixtures
+from memo import ResultCache, profile_key
+from portfolio import allocation_rows, analyze_portfolio, calculate_drift_status, dashboard_summary, rebalance_plan, rebalance_rows
+from price_store import PriceStore
+from rebalance import solve_rebalance
+from shared_store import SharedStore
+from split_store import SplitBackend
+from storage import JsonBackend, SqliteBackend
+
+SCALES = {
+    "xs": {"profiles": 10, "assets": 5, "purchases": 4, "years": 5},
+    "s": {"profiles": 100, "assets": 20, "purchases": 10, "years": 10},
+    "m": {"profiles": 1000, "assets": 50, "purchases": 10, "years": 20},
+    "l": {"profiles": 10000, "assets": 20, "purchases": 5, "years": 25},
+    "wide": {"profiles": 10, "assets": 500, "purchases": 100, "years": 30},
+}
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a benchmark: fn(ctx) -> zero-argument callable to time."""
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """Synthetic data and scratch space shared by the scenarios of one scale."""
+
+    def __init__(self, scale, params, workdir, seed=0, manager_sample=5):
+        self.scale = scale
+        self.params = params
+        self.workdir = workdir
+        self.manager_sample = manager_sample
+
+        universe = synthetic_universe(max(2 * params["assets"], 100))
+        self.prices_history = synthetic_prices(universe, params["years"], seed=seed)
+        self.fixtures = os.path.join(workdir, "fixtures")
+        self.provider = write_price_fixtures(self.fixtures, self.prices_history)
+        self.db = synthetic_db(params["profiles"], params["assets"], params["purchases"],
+                               self.prices_history, seed=seed)
+        self.db_path = os.path.join(workdir, "alphastream_wealth.json")
+        JsonBackend(self.db_path).save(self.db)
+        self.sqlite = SqliteBackend(os.path.join(workdir, "alphastream_wealth.db"))
+        self.sqlite.save(self.db)
+        self.split_dir = os.path.join(workdir, "alphastream_profiles")
+        SplitBackend(self.split_dir).save(self.db)
+        self.latest = {t: float(v) for t, v in self.prices_history.iloc[-1].items()}
+
+        names = sorted(self.db["profiles"])
+        self.sample = names[:manager_sample]
+        self.warm_store = PriceStore(os.path.join(workdir, "store_warm"), provider=self.provider)
+        for name in self.sample:
+            prof = self.db["profiles"][name]
+            self.warm_store.history(list(prof["assets"]), prof["start_date"])
+        self.warm_store.offline = True
+
+    def scratch(self, name):
+        path = os.path.join(self.workdir, name)
+        shutil.rmtree(path, ignore_errors=True)
+        return path
+
+
+@scenario("load_db")
+def bench_load_db(ctx):
+    return lambda: JsonBackend(ctx.db_path).load()
+
+
+@scenario("save_db")
+def bench_save_db(ctx):
+    backend = JsonBackend(os.path.join(ctx.workdir, "save_target.json"))
+    return lambda: backend.save(ctx.db)
+
+
+def _toggle_tolerance(ctx):
+    """Mutate one profile the way the sidebar tolerance button does."""
+    name = ctx.sample[0]
+    prof = ctx.db["profiles"][name]
+    prof["drift_tolerance"] = 5.0 if prof["drift_tolerance"] != 5.0 else 7.5
+    return name
+
+
+@scenario("sqlite_load")
+def bench_sqlite_load(ctx):
+    return lambda: ctx.sqlite.load()
+
+
+@scenario("sqlite_save_profile")
+def bench_sqlite_save_profile(ctx):
+    return lambda: ctx.sqlite.save(ctx.db, profiles=[_toggle_tolerance(ctx)])
+
+
+@scenario("split_load")
+def bench_split_load(ctx):
+    return lambda: SplitBackend(ctx.split_dir).load()
+
+
+@scenario("split_open_profile")
+def bench_split_open_profile(ctx):
+    """Cold start plus opening one profile in the Portfolio Manager."""
+    return lambda: SplitBackend(ctx.split_dir).load()["profiles"][ctx.sample[0]]
+
+
+@scenario("journal_append")
+def bench_journal_append(ctx):
+    journal = JournalBackend(ctx.scratch("journal"), compact_every=0)
+    journal.save(ctx.db)
+
+    def run():
+        name = _toggle_tolerance(ctx)
+        event = events.settings_changed(name, drift_tolerance=ctx.db["profiles"][name]["drift_tolerance"])
+        journal.save(ctx.db, profiles=[name], events=[event])
+    return run
+
+
+@scenario("shared_commit")
+def bench_shared_commit(ctx):
+    backend = SqliteBackend(os.path.join(ctx.workdir, "shared.db"))
+    backend.save(ctx.db)
+    store = SharedStore(backend)
+    name = ctx.sample[0]
+
+    def run():
+        prof = store.db["profiles"][name]
+        tolerance = 5.0 if prof["drift_tolerance"] != 5.0 else 7.5
+        store.commit([events.settings_changed(name, drift_tolerance=tolerance)], store.version(name))
+    return run
+
+
+@scenario("drift_status")
+def bench_drift_status(ctx):
+    profiles = list(ctx.db["profiles"].values())
+    return lambda: [calculate_drift_status(p, ctx.latest) for p in profiles]
+
+
+@scenario("drift_scan")
+def bench_drift_scan(ctx):
+    return lambda: drift_scan(ctx.db["profiles"], ctx.latest)
+
+
+@scenario("dashboard")
+def bench_dashboard(ctx):
+    return lambda: dashboard_summary(ctx.db["profiles"], ctx.latest)
+
+
+def _analyze_sample(ctx, store):
+    for name in ctx.sample:
+        prof = ctx.db["profiles"][name]
+        tickers = list(prof["assets"])
+        data = store.history(tickers, start=prof["start_date"])
+        analyze_portfolio(prof, data, [t for t in tickers if t in data.columns])
+
+
+@scenario("deployment_prices")
+def bench_deployment_prices(ctx):
+    """As-of closes for every asset of one profile, as "Record Deployment" needs them."""
+    tickers = list(ctx.db["profiles"][ctx.sample[0]]["assets"])
+    when = ctx.prices_history.index[len(ctx.prices_history) // 2]
+
+    def run():
+        store = PriceStore(ctx.scratch("store_deploy"), provider=ctx.provider)
+        store.as_of(tickers, when)
+    return run
+
+
+@scenario("chart_downsample")
+def bench_chart_downsample(ctx):
+    """Performance-chart series of one profile reduced to the point budget."""
+    series = ctx.prices_history.iloc[:, 0]
+    return lambda: downsample(series)
+
+
+@scenario("benchmark_metrics")
+def bench_benchmark_metrics(ctx):
+    """Relative-risk metrics of the sample profiles against three shared benchmarks."""
+    engine = BenchmarkEngine(ctx.warm_store)
+    specs = list(ctx.prices_history.columns[:2]) + [",".join(f"{t}:50" for t in ctx.prices_history.columns[2:4])]
+
+    def run():
+        for name in ctx.sample:
+            prof = ctx.db["profiles"][name]
+            tickers = list(prof["assets"])
+            data = ctx.warm_store.history(tickers, start=prof["start_date"])
+            v_t = [t for t in tickers if t in data.columns]
+            daily_ret = analyze_portfolio(prof, data, v_t)["daily_ret"]
+            relative_metrics(daily_ret, engine.returns(specs, prof["start_date"]))
+    return run
+
+
+@scenario("return_analytics")
+def bench_return_analytics(ctx):
+    """Return analytics of the sample profiles as one new price day arrives (cached state extended)."""
+    cache = AnalyticsCache()
+    inputs = []
+    for name in ctx.sample:
+        prof = ctx.db["profiles"][name]
+        tickers = list(prof["assets"])
+        data = ctx.warm_store.history(tickers, start=prof["start_date"])
+        v_t = [t for t in tickers if t in data.columns]
+        analysis = analyze_portfolio(prof, data, v_t)
+        inputs.append((name, prof, analysis["daily_ret"], analysis["curr_v"]))
+        cache.analyze(name, 1, analysis["daily_ret"].iloc[:-1], prof, analysis["curr_v"])
+
+    def run():
+        for name, prof, daily_ret, curr_v in inputs:
+            cache.analyze(name, 1, daily_ret, prof, curr_v)
+    return run
+
+
+@scenario("backtest_sweep")
+def bench_backtest_sweep(ctx):
+    """400 drift tolerances, alone and with each calendar (2,004 policies), over up to 50 assets."""
+    tickers = list(ctx.prices_history.columns[:50])
+    prices = prepare_prices(ctx.prices_history, tickers)
+    targets = np.full(len(tickers), 100 / len(tickers))
+    policies = policy_grid(np.linspace(0.5, 20, 400), FREQUENCIES)
+    return lambda: sweep(prices, targets, policies, cost_rate=0.001)
+
+
+@scenario("rebalance_solve")
+def bench_rebalance_solve(ctx):
+    """Whole-share rebalance of a 500-asset portfolio with band and minimum trade."""
+    rng = np.random.default_rng(0)
+    prices = ctx.prices_history.iloc[-1].to_numpy()
+    idx = rng.integers(0, len(prices), 500)
+    units = rng.integers(0, 500, 500).astype(float)
+    targets = rng.dirichlet(np.ones(500)) * 100
+    return lambda: solve_rebalance(list(range(500)), units, prices[idx], targets, band=0.05, min_trade=100)
+
+
+@scenario("activity_page")
+def bench_activity_page(ctx):
+    """Newest page, five older pages and a keyword search over 100k log entries of one profile."""
+    root = ctx.scratch("activity")
+    os.makedirs(root)
+    log = ActivityLog(os.path.join(root, "activity.db"))
+    committed = [{"ts": f"2020-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}", "profile": "P", "type": "settings_changed",
+                  "changes": {}, "log": f"Updated entry {i}"}
+                 for i in range(100_000)]
+    log.record(committed)
+
+    def run():
+        entries, cursor = log.page("P")
+        for _ in range(5):
+            entries, cursor = log.page("P", before=cursor)
+        log.page("P", query="99999")
+    return run
+
+
+@scenario("audit_query")
+def bench_audit_query(ctx):
+    """One ticker's trades across all profiles over one quarter, out of 500k audit rows."""
+    root = ctx.scratch("audit")
+    os.makedirs(root)
+    log = ActivityLog(os.path.join(root, "activity.db"))
+    rng = np.random.default_rng(0)
+    days = np.datetime64("2000-01-01") + rng.integers(0, 25 * 365, 500_000)
+    tickers = list(ctx.prices_history.columns)
+    with log._conn as c:
+        log._insert_audit(c, [
+            (f"{d} 10:00:00", f"Profile {p:05d}", "rebalance", tickers[t], 1.0, 10.0, 10.0, None)
+            for d, p, t in zip(days.astype(str), rng.integers(0, 1000, len(days)), rng.integers(0, len(tickers), len(days)))
+        ])
+    return lambda: log.audit(since="2024-07-01", until="2024-09-30", ticker=tickers[0], types=TRADE_TYPES, limit=None)
+
+
+@scenario("manager_cold")
+def bench_manager_cold(ctx):
+    def run():
+        store = PriceStore(ctx.scratch("store_cold"), provider=ctx.provider)
+        _analyze_sample(ctx, store)
+    return run
+
+
+@scenario("manager_warm")
+def bench_manager_warm(ctx):
+    return lambda: _analyze_sample(ctx, ctx.warm_store)
+
+
+@scenario("manager_rerun")
+def bench_manager_rerun(ctx):
+    """Unchanged Portfolio Manager rerun: stored prices plus memoized results."""
+    results = ResultCache()
+
+    def run():
+        for name in ctx.sample:
+            prof = ctx.db["profiles"][name]
+            tickers = list(prof["assets"])
+            if ctx.warm_store.stale(tickers, prof["start_date"]):
+                ctx.warm_store.update(tickers, prof["start_date"])
+            key = profile_key(name, 1, (tuple(tickers), ctx.warm_store.snapshot_id(tickers)), prof)
+            data = results.get("price_history", key, lambda: ctx.warm_store.history(tickers, start=prof["start_date"]))
+            v_t = [t for t in tickers if t in data.columns]
+            analysis = results.get("analysis", key, lambda: analyze_portfolio(prof, data, v_t))
+            results.get("allocation_rows", key, lambda: allocation_rows(prof, data, v_t, analysis["curr_v"]))
+            plan = results.get("rebalance_plan", key, lambda: rebalance_plan(prof, data, v_t))
+            results.get("rebalance_rows", key,
+                        lambda: rebalance_rows(prof, data, v_t, analysis["curr_v"], {t: t for t in v_t}, plan))
+    run()  # Warm the cache; the timed runs are all hits
+    return run
+
+
+def time_call(fn, repeats):
+    """Run fn `repeats` times and return wall-clock timings in seconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, scenarios, repeats, seed=0, manager_sample=5):
+    results = []
+    for scale in scales:
+        params = SCALES[scale]
+        workdir = tempfile.mkdtemp(prefix=f"alphastream_perf_{scale}_")
+        try:
+            setup_start = time.perf_counter()
+            ctx = Context(scale, params, workdir, seed=seed, manager_sample=manager_sample)
+            print(f"[{scale}] generated {params} in {time.perf_counter() - setup_start:.1f}s", file=sys.stderr)
+            db_size = os.path.getsize(ctx.db_path)
+
+            for name in scenarios:
+                fn = SCENARIOS[name](ctx)
+                timings = time_call(fn, repeats)
+                result = {
+                    "scale": scale,
+                    "scenario": name,
+                    "params": params,
+                    "db_bytes": db_size,
+                    "repeats": repeats,
+                    "min_s": min(timings),
+                    "median_s": statistics.median(timings),
+                    "mean_s": statistics.fmean(timings),
+                    "max_s": max(timings),
+                }
+                results.append(result)
+                print(f"[{scale}] {name:<16} median {result['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+            ctx.sqlite.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AlphaStream benchmark suite")
+    parser.add_argument("--scales", nargs="+", default=["xs", "s"], choices=list(SCALES))
+    parser.add_argument("--scenarios", nargs="+", default=None, help=f"Subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--manager-sample", type=int, default=5, help="Profiles analyzed per manager scenario")
+    parser.add_argument("--output", default="perf_results.json")
+    args = parser.parse_args(argv)
+
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    results = run(args.scales, scenarios, args.repeats, args.seed, args.manager_sample)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
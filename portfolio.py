@@ -0,0 +1,342 @@
+"""
+Portfolio calculations shared by the Streamlit app, the benchmarks and
+headless tools: drift detection, average cost, dashboard aggregation and the
+Portfolio Manager analysis.
+"""
+from datetime import datetime, date
+
+import lots
+from drift import drift_scan
+from rebalance import LOT_SIZE, solve_rebalance
+from valuation import holdings_over_time, portfolio_returns, portfolio_value_series
+
+
+def check_recently_rebalanced(last_rebalanced_str):
+    """Check if portfolio was rebalanced in last 24 hours"""
+    if not last_rebalanced_str:
+        return False
+    try:
+        last_rebal_time = datetime.strptime(last_rebalanced_str, "%Y-%m-%d %H:%M:%S")
+        hours_since = (datetime.now() - last_rebal_time).total_seconds() / 3600
+        return hours_since < 24
+    except:
+        return False
+
+
+# ASSET ALLOCATION: New function to calculate average cost per asset
+def calculate_average_cost(asset_data, allocated_pct):
+    """
+    Calculate weighted average cost for an asset.
+    Returns None if portfolio not fully allocated (allocated_pct < 100).
+
+    Args:
+        asset_data: Asset dict with a tax-lot ledger (see lots.py)
+        allocated_pct: Total portfolio allocation percentage
+
+    Returns:
+        float or None: Average cost per unit, or None if not fully allocated
+    """
+    # CRITICAL: Only calculate after full allocation
+    if allocated_pct < 100.0:
+        return None
+
+    # Running aggregate of the tax-lot ledger: constant time however many lots
+    return lots.average_cost(asset_data)
+
+
+# ASSET ALLOCATION: Modified drift detection - suppresses drift until 100% allocated
+def calculate_drift_status(p_data, prices):
+    """
+    Calculate if portfolio needs rebalancing.
+    MODIFIED: Drift detection suppressed until allocated_pct >= 100%
+    """
+    p_assets = p_data.get("assets", {})
+    if not p_assets:
+        return False, []
+
+    curr_v = float(sum(p_assets[t]["units"] * prices.get(t, 0) for t in p_assets))
+    if curr_v == 0:
+        return False, []
+
+    # ASSET ALLOCATION: Check allocation completion status
+    allocated_pct = p_data.get("allocated_pct", 0.0)
+    if allocated_pct < 100.0:
+        # Allocation in progress - suppress drift detection
+        return False, []
+
+    has_rebalanced = p_data.get("last_rebalanced") is not None
+    recently_rebalanced = check_recently_rebalanced(p_data.get("last_rebalanced"))
+
+    # Never rebalanced = needs rebalance
+    if not has_rebalanced:
+        return True, []
+
+    # Recently rebalanced = don't check drift yet
+    if recently_rebalanced:
+        return False, []
+
+    # Check actual drift
+    drift_details = []
+    for t in p_assets:
+        actual_pct = float((p_assets[t]["units"] * prices.get(t, 0) / curr_v * 100))
+        target_pct = float(p_assets[t]["target"])
+        drift = abs(actual_pct - target_pct)
+        if drift >= p_data.get("drift_tolerance", 5.0):
+            drift_details.append((t, drift, actual_pct, target_pct))
+
+    return len(drift_details) > 0, drift_details
+
+
+def dashboard_summary(profiles, prices):
+    """
+    Aggregate metrics for the Global Dashboard.
+
+    All profiles are scored in one vectorized pass (see drift.py).
+
+    Returns:
+        dict with per-profile `tiles` plus total_value, alerts and total_assets
+    """
+    scan = drift_scan(profiles, prices)
+    tiles = {}
+    for i, (name, p) in enumerate(profiles.items()):
+        allocated_pct = p.get("allocated_pct", 0.0)  # ASSET ALLOCATION
+        if not (p.get("assets") and prices):
+            tiles[name] = {"value": 0, "roi": 0, "needs_rebalance": False, "drift": [], "allocated_pct": allocated_pct}
+            continue
+        curr_val = float(scan.values[i])
+        principal = float(p.get("principal", 1))
+        tiles[name] = {
+            "value": curr_val,
+            "roi": ((curr_val / principal) - 1) * 100 if principal > 0 else 0,
+            "needs_rebalance": bool(scan.needs_rebalance[i]),
+            "drift": scan.details[name],
+            "allocated_pct": allocated_pct,
+        }
+    return {
+        "tiles": tiles,
+        "total_value": float(scan.values.sum()),
+        "alerts": int(scan.needs_rebalance.sum()),
+        "total_assets": int(scan.held.sum()),
+    }
+
+
+def analyze_portfolio(prof, data, v_t):
+    """
+    Portfolio Manager analysis of one profile.
+
+    Args:
+        prof: Profile dict
+        data: DataFrame of closes (index: dates, columns: tickers)
+        v_t: Tickers with price data, in display order
+
+    Returns:
+        dict with daily_val, daily_ret (flow-free daily returns), curr_v,
+        start_val, roi_pct, perc_diff, profile_cagr, recently_rebalanced,
+        needs_rebalance and drift_assets
+    """
+    asset_dict = prof.get("assets", {})
+    is_fully_allocated = prof.get("allocated_pct", 0.0) >= 100.0
+
+    # Calculate portfolio metrics (holdings follow purchase and rebalance dates)
+    holdings = holdings_over_time(data.index, asset_dict, v_t, prof.get("rebalance_events", []))
+    daily_val = portfolio_value_series(data[v_t], holdings)
+    daily_ret = portfolio_returns(data[v_t], holdings)
+
+    curr_v = float(daily_val.iloc[-1])
+    start_val = float(prof['principal'])
+
+    years = max((data.index[-1] - data.index[0]).days / 365.25, 0.01)
+    target_val = start_val * (1 + (float(prof['yearly_goal_pct'])/100))**years
+    perc_diff = ((curr_v / target_val) - 1) * 100
+    roi_pct = ((curr_v / start_val) - 1) * 100
+
+    # Calculate CAGR
+    prof_start_date = datetime.strptime(prof.get('start_date', str(date.today())), '%Y-%m-%d')
+    prof_years = max((date.today() - prof_start_date.date()).days / 365.25, 0.01)
+    profile_cagr = ((curr_v / start_val) ** (1 / prof_years) - 1) * 100 if start_val > 0 else 0
+
+    # ASSET ALLOCATION: Modified drift detection
+    recently_rebalanced = check_recently_rebalanced(prof.get("last_rebalanced"))
+    needs_rebalance = False
+    drift_assets = []
+
+    # Only check drift if fully allocated
+    if is_fully_allocated and not recently_rebalanced:
+        for t in v_t:
+            actual_pct = float((asset_dict[t]["units"] * data[t].iloc[-1] / curr_v * 100))
+            target_pct = float(asset_dict[t]["target"])
+            drift = float(abs(actual_pct - target_pct))
+
+            if drift >= prof.get("drift_tolerance", 5.0):
+                needs_rebalance = True
+                drift_assets.append((t, drift, actual_pct, target_pct))
+
+    return {
+        "daily_val": daily_val,
+        "daily_ret": daily_ret,
+        "curr_v": curr_v,
+        "start_val": start_val,
+        "roi_pct": roi_pct,
+        "perc_diff": perc_diff,
+        "profile_cagr": profile_cagr,
+        "recently_rebalanced": recently_rebalanced,
+        "needs_rebalance": needs_rebalance,
+        "drift_assets": drift_assets,
+    }
+
+
+# ASSET ALLOCATION: Rows of the Portfolio Manager "Asset Allocation Table"
+def allocation_rows(prof, data, v_t, curr_v):
+    """
+    Args:
+        prof: Profile dict
+        data: DataFrame of closes (index: dates, columns: tickers)
+        v_t: Tickers with price data, in display order
+        curr_v: Current portfolio value
+
+    Returns:
+        list of display-ready row dicts
+    """
+    asset_dict = prof.get("assets", {})
+    allocated_pct = prof.get("allocated_pct", 0.0)
+    is_fully_allocated = allocated_pct >= 100.0
+
+    rows = []
+    for t in v_t:
+        current_price = float(data[t].iloc[-1])
+        asset_data = asset_dict[t]
+
+        # Target and actual percentages
+        tar_pct = float(asset_data['target'])
+        cur_units = float(asset_data["units"])
+        act_val = cur_units * current_price
+        act_pct = (act_val / curr_v * 100) if curr_v > 0 else 0
+
+        # Allocated percentage and P&L (running ledger aggregates)
+        position = lots.position(asset_data)
+        allocated_pct_asset = position["allocated_pct"]
+
+        # Average cost (only if fully allocated)
+        avg_cost = calculate_average_cost(asset_data, allocated_pct)
+        avg_cost_display = f"${avg_cost:.2f}" if avg_cost is not None else "Pending"
+
+        # Drift
+        drift = act_pct - tar_pct
+        drift_display = f"{drift:+.2f}%" if is_fully_allocated else "-"
+
+        rows.append({
+            "Ticker": t,
+            "Target %": f"{tar_pct:.2f}%",
+            "Actual %": f"{act_pct:.2f}%",
+            "Allocated %": f"{allocated_pct_asset:.2f}%",
+            "Avg Cost": avg_cost_display,
+            "Current Price": f"${current_price:.2f}",
+            "Unrealized P&L": f"${lots.unrealized_pnl(asset_data, current_price):+,.0f}",
+            "Realized P&L": f"${position['realized']:+,.0f}",
+            "Drift %": drift_display
+        })
+    return rows
+
+
+def rebalance_plan(prof, data, v_t):
+    """
+    Whole-lot rebalance trades for a profile at the latest prices.
+
+    Uses the profile's `min_trade` (dollars) and `no_trade_band` (percentage
+    points) settings; an asset's `lot_size` overrides the profile's.
+
+    Returns:
+        rebalance.RebalancePlan aligned with `v_t`
+    """
+    asset_dict = prof.get("assets", {})
+    lot = float(prof.get("lot_size") or LOT_SIZE)
+    return solve_rebalance(
+        v_t,
+        [float(asset_dict[t]["units"]) for t in v_t],
+        [float(data[t].iloc[-1]) for t in v_t],
+        [float(asset_dict[t]["target"]) for t in v_t],
+        lot_size=[float(asset_dict[t].get("lot_size") or lot) for t in v_t],
+        band=float(prof.get("no_trade_band", 0.0)),
+        min_trade=float(prof.get("min_trade", 0.0)),
+    )
+
+
+def rebalance_rows(prof, data, v_t, curr_v, ticker_names, plan):
+    """
+    Rows of the Portfolio Manager "Rebalance Analysis" table, total row included.
+
+    Args:
+        prof: Profile dict
+        data: DataFrame of closes (index: dates, columns: tickers)
+        v_t: Tickers with price data, in display order
+        curr_v: Current portfolio value
+        ticker_names: {ticker: display name}
+        plan: rebalance_plan() result; its whole-lot trades fill the Buy/Sell columns
+
+    Returns:
+        tuple: (list of row dicts, total trade volume in dollars)
+    """
+    asset_dict = prof.get("assets", {})
+    is_fully_allocated = prof.get("allocated_pct", 0.0) >= 100.0
+
+    rows = []
+    total_turnover = plan.turnover
+    total_current_val = 0
+
+    for i, t in enumerate(v_t):
+        current_price = float(data[t].iloc[-1])
+        try:
+            prev_price = float(data[t].iloc[-2])
+            daily_change_pct = ((current_price / prev_price) - 1) * 100
+        except:
+            daily_change_pct = 0.0
+
+        cur_u = float(asset_dict[t]["units"])
+        tar_w = float(asset_dict[t]['target'])
+
+        act_val = cur_u * current_price
+        act_w = (act_val / curr_v * 100)
+        drift = act_w - tar_w
+
+        total_current_val += act_val
+
+        # ASSET ALLOCATION: Only show drift colors if fully allocated
+        if is_fully_allocated:
+            if abs(drift) >= prof.get("drift_tolerance", 5.0):
+                drift_display = f"🔴 {drift:+.2f}%"
+            elif abs(drift) > 0.5:
+                drift_display = f"🟡 {drift:+.2f}%"
+            else:
+                drift_display = f"🟢 {drift:+.2f}%"
+        else:
+            drift_display = f"{drift:+.2f}%"
+
+        rows.append({
+            "Asset Class": ticker_names[t],
+            "Fund": t,
+            "Units": f"{cur_u:.0f}",
+            "Unit Value": f"${current_price:.2f}",
+            "%Daily Change": f"{daily_change_pct:+.2f}%",
+            "Amount": f"${act_val:,.0f}",
+            "Allocation": f"{act_w:.2f}%",
+            "Target": f"{tar_w:.2f}%",
+            "Drift": drift_display,
+            "Buy/Sell Amt": f"${abs(plan.trade_values[i]):,.0f}",
+            "Buy/Sell Shares": f"{plan.trades[i]:+,.4f}".rstrip("0").rstrip(".")
+        })
+
+    # Total row
+    rows.append({
+        "Asset Class": "**TOTAL**",
+        "Fund": "",
+        "Units": "",
+        "Unit Value": "",
+        "%Daily Change": "",
+        "Amount": f"**${total_current_val:,.0f}**",
+        "Allocation": "**100.00%**",
+        "Target": "**100.00%**",
+        "Drift": "—",
+        "Buy/Sell Amt": f"**${total_turnover:,.0f}**",
+        "Buy/Sell Shares": "—"
+    })
+    return rows, total_turnover
@@ -0,0 +1,342 @@
+"""
+Local price-history store.
+
+Each ticker's adjusted closes live in their own ``.npz`` file as two dense,
+aligned columns: a ``datetime64[D]`` date index and a ``float64`` close array.
+On each request only the missing tail since the last stored date is pulled
+from the price provider, so a rerun of the Portfolio Manager becomes a local read.
+Each file also records ``since``, the earliest date the provider was asked for,
+so a ticker listed after a profile's inception is not re-downloaded in full on
+every request. Files are only rewritten when their contents change.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from providers import provider_from_env
+
+PRICE_STORE_DIR = os.environ.get("ALPHASTREAM_PRICE_DIR", "price_store")
+
+# Set ALPHASTREAM_OFFLINE=1 to serve whatever is on disk without touching the network
+OFFLINE = os.environ.get("ALPHASTREAM_OFFLINE", "0") == "1"
+
+# Relative difference on the overlapping day above which the stored series is
+# considered stale (e.g. a dividend re-based the adjusted closes) and refetched
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# Seconds before a ticker still missing its latest trading day (holiday, before
+# the open, provider outage) is asked for it again
+REFRESH_INTERVAL = float(os.environ.get("ALPHASTREAM_PRICE_REFRESH", "900"))
+
+# In-memory caches: decoded series (validated against the file's mtime/size)
+# and assembled history frames (keyed by the snapshot ID of their tickers)
+READ_CACHE_SIZE = 512
+FRAME_CACHE_SIZE = 16
+
+_EMPTY_DATES = np.array([], dtype="datetime64[D]")
+_EMPTY_CLOSES = np.array([], dtype="float64")
+_NO_DATE = np.datetime64("NaT", "D")
+
+
+def latest_trading_day(today=None):
+    """Most recent weekday on or before `today` (exchange holidays are not known)."""
+    return np.busday_offset(np.datetime64(today or date.today(), "D"), 0, roll="backward")
+
+
+class PriceStore:
+    """Per-ticker columnar close history with incremental tail updates."""
+
+    def __init__(self, root=PRICE_STORE_DIR, provider=None, offline=OFFLINE):
+        self.root = root
+        self.provider = provider or provider_from_env()
+        self.offline = offline
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._reads = OrderedDict()   # ticker -> ((mtime_ns, size), dates, closes, since)
+        self._frames = OrderedDict()  # (tickers, start, end, snapshot_id) -> DataFrame
+        self._checked = {}            # ticker -> monotonic time of its last fetch
+        self._failed = {}             # ticker -> monotonic time the provider last failed for it
+
+    def _path(self, ticker):
+        safe = ticker.replace("/", "_").replace("\\", "_")
+        return os.path.join(self.root, f"{safe}.npz")
+
+    @staticmethod
+    def _remember(cache, key, value, limit):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def _load(self, ticker):
+        """(dates, closes, since) for a ticker; since is NaT if nothing was ever fetched."""
+        path = self._path(ticker)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return _EMPTY_DATES, _EMPTY_CLOSES, _NO_DATE
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._reads.get(ticker)
+            if cached is not None and cached[0] == stamp:
+                self._reads.move_to_end(ticker)
+                return cached[1:]
+        try:
+            with np.load(path) as f:
+                dates, closes = f["dates"].astype("datetime64[D]"), f["close"].astype("float64")
+                # Files written before `since` existed: the history reaches back to its first date
+                since = f["since"].astype("datetime64[D]")[()] if "since" in f.files else (
+                    dates[0] if len(dates) else _NO_DATE)
+        except (OSError, ValueError, KeyError):
+            return _EMPTY_DATES, _EMPTY_CLOSES, _NO_DATE
+        with self._lock:
+            self._remember(self._reads, ticker, (stamp, dates, closes, since), READ_CACHE_SIZE)
+        return dates, closes, since
+
+    def read(self, ticker):
+        """Return (dates, closes) arrays for a ticker; empty arrays if not stored."""
+        dates, closes, _ = self._load(ticker)
+        return dates, closes
+
+    def write(self, ticker, dates, closes, since=None):
+        """
+        Atomically replace the stored series for a ticker.
+
+        `since` is the earliest date the provider was asked for; the provider
+        has nothing between it and the first stored date.
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if since is None:
+            since = dates[0] if len(dates) else _NO_DATE
+        elif len(dates):
+            since = min(np.datetime64(since, "D"), dates[0])
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".npz.tmp")
+        os.close(fd)
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, dates=dates, close=np.asarray(closes, dtype="float64"),
+                         since=np.asarray(since, dtype="datetime64[D]"))
+            os.replace(tmp, self._path(ticker))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def merge(self, ticker, new, since=None):
+        """
+        Merge freshly downloaded closes into the stored series.
+
+        Args:
+            ticker: Symbol being updated
+            new: pd.Series of closes indexed by date
+            since: First date the download asked for, when it was a full
+                history request (recorded so it is not repeated)
+
+        Returns:
+            bool: False if the overlap no longer matches (history was re-adjusted)
+        """
+        new = new.dropna()
+        stored_dates, stored_closes, stored_since = self._load(ticker)
+        if since is not None:
+            since = np.datetime64(since, "D")
+            if not np.isnat(stored_since):
+                since = min(since, stored_since)
+        else:
+            since = stored_since
+        if new.empty:
+            if since is not None and not np.isnat(since) and since != stored_since:
+                self.write(ticker, stored_dates, stored_closes, since)
+            return True
+        new_dates = new.index.values.astype("datetime64[D]")
+        new_closes = new.values.astype("float64")
+
+        dates, closes = stored_dates, stored_closes
+        if len(dates):
+            if len(dates) > 1:
+                # The last stored day may have been an intraday quote; compare the one before it
+                prev = np.searchsorted(new_dates, dates[-2])
+                if prev < len(new_dates) and new_dates[prev] == dates[-2]:
+                    ref = closes[-2]
+                    if ref and abs(new_closes[prev] / ref - 1) > ADJUSTMENT_TOLERANCE:
+                        return False
+            keep = dates < new_dates[0]
+            dates = np.concatenate([dates[keep], new_dates])
+            closes = np.concatenate([closes[keep], new_closes])
+        else:
+            dates, closes = new_dates, new_closes
+
+        since = dates[0] if np.isnat(since) else min(since, dates[0])
+        unchanged = (since == stored_since and np.array_equal(dates, stored_dates)
+                     and np.array_equal(closes, stored_closes))
+        if not unchanged:
+            self.write(ticker, dates, closes, since)
+        return True
+
+    def _fetch(self, tickers, start):
+        """Provider history, or None if the provider failed (stored data is served instead)."""
+        try:
+            return self.provider.history(tickers, start)
+        except Exception:
+            return None
+
+    def _plan(self, tickers, start):
+        """
+        Downloads needed to bring `tickers` up to date from `start`, as
+        {(first date, full history?): [tickers]}. Reads only local files.
+        """
+        if self.offline or not tickers:
+            return {}
+        start = pd.Timestamp(start).normalize()
+        start_d = np.datetime64(start.date(), "D")
+        latest = latest_trading_day()
+        now = time.monotonic()
+
+        groups = {}
+        for t in tickers:
+            dates, _, since = self._load(t)
+            if now - self._failed.get(t, -REFRESH_INTERVAL) < REFRESH_INTERVAL:
+                # Provider failed recently: serve what is stored
+                continue
+            if np.isnat(since) or since > start_d:
+                # Never asked this far back
+                fetch_from, full = start_d, True
+            elif len(dates) and dates[-1] >= latest:
+                continue
+            elif now - self._checked.get(t, -REFRESH_INTERVAL) < REFRESH_INTERVAL:
+                # Asked recently and the latest day was not there yet
+                continue
+            elif len(dates):
+                # Re-fetch the last two stored days to detect re-adjusted history
+                fetch_from, full = dates[-2] if len(dates) > 1 else dates[-1], False
+            else:
+                fetch_from, full = start_d, True
+            groups.setdefault((str(fetch_from), full), []).append(t)
+        return groups
+
+    def stale(self, tickers, start):
+        """Tickers update() would download for; empty when the store is current."""
+        return [t for group in self._plan(tickers, start).values() for t in group]
+
+    def update(self, tickers, start):
+        """
+        Bring the stored history of each ticker up to date from `start` onwards.
+
+        Tickers are grouped by the first date they are missing so each group is a
+        single batched download of only the missing tail.
+        """
+        groups = self._plan(tickers, start)
+        if not groups:
+            return
+        start_d = np.datetime64(pd.Timestamp(start).date(), "D")
+        now = time.monotonic()
+
+        stale = []
+        for (fetch_from, full), group in groups.items():
+            frame = self._fetch(group, fetch_from)
+            for t in group:
+                self._checked[t] = now
+                if frame is None:
+                    self._failed[t] = now
+                else:
+                    self._failed.pop(t, None)
+            if frame is None:
+                continue
+            for t in group:
+                if t in frame.columns:
+                    if not self.merge(t, frame[t], since=fetch_from if full else None):
+                        stale.append(t)
+                elif full:
+                    self.merge(t, pd.Series(dtype="float64"), since=fetch_from)
+
+        if stale:
+            frame = self._fetch(stale, str(start_d))
+            for t in stale:
+                if frame is not None and t in frame.columns:
+                    self.write(t, _EMPTY_DATES, _EMPTY_CLOSES)
+                    self.merge(t, frame[t], since=start_d)
+
+    def history(self, tickers, start, end=None):
+        """
+        Return a DataFrame of closes (index: dates, columns: tickers) from `start`.
+
+        The store is refreshed first unless running offline. Tickers with no
+        stored data are omitted from the columns. The frame is cached until one
+        of its series is rewritten, so callers must not modify it.
+        """
+        self.update(tickers, start)
+        start_d = np.datetime64(pd.Timestamp(start).date(), "D")
+        end_d = np.datetime64(pd.Timestamp(end).date(), "D") if end is not None else None
+
+        key = (tuple(tickers), start_d, end_d, self.snapshot_id(tickers))
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key]
+        frame = self._assemble(tickers, start_d, end_d)
+        with self._lock:
+            self._remember(self._frames, key, frame, FRAME_CACHE_SIZE)
+        return frame
+
+    def _assemble(self, tickers, start_d, end_d):
+        """One column per ticker with stored closes between start_d and end_d (inclusive)."""
+        columns = {}
+        for t in tickers:
+            dates, closes = self.read(t)
+            lo = np.searchsorted(dates, start_d, side="left")
+            hi = np.searchsorted(dates, end_d, side="right") if end_d is not None else len(dates)
+            if hi > lo:
+                columns[t] = pd.Series(closes[lo:hi], index=pd.DatetimeIndex(dates[lo:hi]))
+
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame(columns).sort_index()
+
+    def as_of(self, tickers, when, lookback_days=7):
+        """
+        Close of each ticker on `when`, or on the closest prior trading day.
+
+        All tickers are refreshed in one batched update, then each is resolved
+        with a binary search of its sorted date index.
+
+        Returns:
+            dict: {ticker: (trading date, close)}; tickers without a close in the
+            `lookback_days` before `when` are omitted
+        """
+        when_d = np.datetime64(pd.Timestamp(when).date(), "D")
+        lookback = np.timedelta64(lookback_days, "D")
+        self.update(tickers, str(when_d - lookback))
+
+        found = {}
+        for t in tickers:
+            dates, closes = self.read(t)
+            i = np.searchsorted(dates, when_d, side="right") - 1
+            if i >= 0 and when_d - dates[i] <= lookback:
+                found[t] = (pd.Timestamp(dates[i]).date(), float(closes[i]))
+        return found
+
+    def snapshot_id(self, tickers):
+        """
+        ID of the stored history of `tickers`; it changes whenever any of
+        their series is rewritten (files are replaced atomically on write).
+        """
+        h = hashlib.blake2b(digest_size=8)
+        for t in sorted(tickers):
+            try:
+                stat = os.stat(self._path(t))
+                h.update(f"{t}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+            except FileNotFoundError:
+                h.update(f"{t}:-;".encode())
+        return h.hexdigest()
+
+    def last_date(self, ticker):
+        """Return the last stored trading date for a ticker, or None."""
+        dates, _ = self.read(ticker)
+        if not len(dates):
+            return None
+        return pd.Timestamp(dates[-1]).date()
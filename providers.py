@@ -0,0 +1,198 @@
+"""
+Market-data providers.
+
+Every price or metadata lookup in the app goes through a PriceProvider, so the
+data source can be swapped without touching UI code:
+
+- YFinanceProvider: live Yahoo Finance data (the default)
+- ReplayProvider: deterministic, file-backed fixtures for offline profiling
+  and load testing
+
+Select the provider with ALPHASTREAM_PROVIDER=yfinance|replay; the replay
+provider reads fixtures from ALPHASTREAM_REPLAY_DIR.
+"""
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+PROVIDER = os.environ.get("ALPHASTREAM_PROVIDER", "yfinance")
+REPLAY_DIR = os.environ.get("ALPHASTREAM_REPLAY_DIR", "fixtures")
+# Optional fixed "today" for replays, e.g. 2024-06-28
+REPLAY_AS_OF = os.environ.get("ALPHASTREAM_REPLAY_AS_OF")
+
+
+def closes_frame(raw, tickers):
+    """Extract a Close-price DataFrame (one column per ticker) from a yf.download result."""
+    if raw is None or raw.empty:
+        return pd.DataFrame(columns=tickers, dtype="float64")
+    data = raw["Close"]
+    if isinstance(data, pd.Series):
+        data = data.to_frame(name=tickers[0])
+    data.index = pd.to_datetime(data.index).tz_localize(None).normalize()
+    return data
+
+
+def last_closes(frame):
+    """Last non-NaN close of each column, as {ticker: price}."""
+    result = {}
+    for t in frame.columns:
+        col = frame[t].dropna()
+        if not col.empty:
+            result[t] = float(col.iloc[-1])
+    return result
+
+
+class PriceProvider:
+    """Interface implemented by every market-data source."""
+
+    name = "base"
+
+    def history(self, tickers, start, end=None):
+        """
+        Daily adjusted closes.
+
+        Args:
+            tickers: List of symbols
+            start: First date (inclusive)
+            end: Last date (inclusive), or None for up to today
+
+        Returns:
+            pd.DataFrame indexed by normalized dates with one column per ticker
+            that has data; tickers without data are omitted
+        """
+        raise NotImplementedError
+
+    def latest(self, tickers):
+        """Most recent close of each ticker as {ticker: price}; unknown tickers are omitted."""
+        start = date.today() - timedelta(days=7)
+        return last_closes(self.history(tickers, start))
+
+    def info(self, ticker):
+        """Descriptive metadata: name, exchange, currency, asset_type."""
+        raise NotImplementedError
+
+
+class YFinanceProvider(PriceProvider):
+    """Live data from Yahoo Finance."""
+
+    name = "yfinance"
+
+    def history(self, tickers, start, end=None):
+        import yfinance as yf
+        tickers = list(tickers)
+        if not tickers:
+            return pd.DataFrame()
+        # yf.download treats `end` as exclusive
+        end = pd.Timestamp(end) + timedelta(days=1) if end is not None else None
+        raw = yf.download(tickers, start=start, end=end, auto_adjust=True, progress=False, threads=True)
+        data = closes_frame(raw, tickers)
+        return data[[t for t in tickers if t in data.columns and data[t].notna().any()]]
+
+    def info(self, ticker):
+        import yfinance as yf
+        info = yf.Ticker(ticker).info or {}
+        return {
+            "name": info.get("longName") or info.get("shortName") or ticker,
+            "exchange": info.get("exchange"),
+            "currency": info.get("currency"),
+            "asset_type": info.get("quoteType"),
+        }
+
+
+class ReplayProvider(PriceProvider):
+    """
+    File-backed provider replaying local fixtures.
+
+    Fixture layout under `root`:
+        <TICKER>.csv or <TICKER>.parquet  - columns Date and Close (case-insensitive)
+        info.json                          - optional {ticker: {name, exchange, currency, asset_type}}
+
+    Data after `as_of` is hidden, so a replay always sees the same "today".
+    """
+
+    name = "replay"
+
+    def __init__(self, root=REPLAY_DIR, as_of=REPLAY_AS_OF):
+        self.root = root
+        self.as_of = pd.Timestamp(as_of).normalize() if as_of else None
+        self._series = {}
+        self._info = None
+
+    def _load(self, ticker):
+        if ticker in self._series:
+            return self._series[ticker]
+        series = None
+        for ext in ("parquet", "csv"):
+            path = os.path.join(self.root, f"{ticker}.{ext}")
+            if os.path.exists(path):
+                frame = pd.read_parquet(path) if ext == "parquet" else pd.read_csv(path)
+                frame.columns = [str(c).lower() for c in frame.columns]
+                if "date" in frame.columns:
+                    frame = frame.set_index("date")
+                series = frame["close"].astype("float64")
+                series.index = pd.to_datetime(series.index).tz_localize(None).normalize()
+                series = series[~series.index.duplicated(keep="last")].sort_index()
+                if self.as_of is not None:
+                    series = series[series.index <= self.as_of]
+                break
+        self._series[ticker] = series
+        return series
+
+    def history(self, tickers, start, end=None):
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize() if end is not None else None
+        columns = {}
+        for t in tickers:
+            series = self._load(t)
+            if series is None:
+                continue
+            series = series[series.index >= start]
+            if end is not None:
+                series = series[series.index <= end]
+            if not series.empty:
+                columns[t] = series
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame(columns).sort_index()
+
+    def latest(self, tickers):
+        result = {}
+        for t in tickers:
+            series = self._load(t)
+            if series is not None and not series.dropna().empty:
+                result[t] = float(series.dropna().iloc[-1])
+        return result
+
+    def info(self, ticker):
+        if self._info is None:
+            path = os.path.join(self.root, "info.json")
+            self._info = {}
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    self._info = json.load(f)
+        entry = self._info.get(ticker)
+        if entry is None and self._load(ticker) is None:
+            raise KeyError(f"No fixture for {ticker}")
+        entry = dict(entry or {})
+        entry.setdefault("name", ticker)
+        return entry
+
+    def write_fixture(self, ticker, closes):
+        """Save a pd.Series of closes as a CSV fixture (used to record replays)."""
+        os.makedirs(self.root, exist_ok=True)
+        frame = pd.DataFrame({"Date": pd.to_datetime(closes.index).strftime("%Y-%m-%d"),
+                              "Close": np.asarray(closes.values, dtype="float64")})
+        frame.to_csv(os.path.join(self.root, f"{ticker}.csv"), index=False)
+        self._series.pop(ticker, None)
+
+
+def provider_from_env():
+    """Build the provider selected by ALPHASTREAM_PROVIDER."""
+    if PROVIDER == "replay":
+        return ReplayProvider()
+    if PROVIDER == "yfinance":
+        return YFinanceProvider()
+    raise ValueError(f"Unknown price provider '{PROVIDER}'")
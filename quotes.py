@@ -0,0 +1,91 @@
+"""
+Batched, TTL-cached latest-quote snapshots.
+
+The Global Dashboard needs the latest close of every ticker held across all
+profiles. Instead of one round-trip per symbol, missing or expired symbols are
+fetched in a single batched download and cached with a configurable TTL. One
+service instance is shared by every session in the process.
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from providers import provider_from_env
+
+QUOTE_TTL_SECONDS = float(os.environ.get("ALPHASTREAM_QUOTE_TTL", "300"))
+
+
+@dataclass
+class QuoteSnapshot:
+    """Latest prices for a set of tickers plus the tickers that could not be priced."""
+    prices: dict = field(default_factory=dict)
+    failures: dict = field(default_factory=dict)
+    fetched_at: float = 0.0
+
+    def snapshot_id(self):
+        """ID that changes whenever any price in the snapshot changes."""
+        payload = repr(sorted(self.prices.items())).encode()
+        return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+class QuoteService:
+    """Thread-safe quote cache shared across sessions."""
+
+    def __init__(self, provider=None, ttl=QUOTE_TTL_SECONDS):
+        self.provider = provider or provider_from_env()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._quotes = {}    # ticker -> (price, fetched_at)
+        self._failures = {}  # ticker -> (reason, fetched_at)
+
+    def _fetch(self, tickers):
+        """Fetch the latest close for all tickers in one batched provider call."""
+        prices = self.provider.latest(tickers)
+        failures = {t: "No recent price" for t in tickers if t not in prices}
+        return prices, failures
+
+    def _last_attempt(self, ticker):
+        return max(self._quotes.get(ticker, (None, 0.0))[1],
+                   self._failures.get(ticker, (None, 0.0))[1])
+
+    def snapshot(self, tickers):
+        """
+        Return a QuoteSnapshot for the given tickers.
+
+        Only tickers that are missing from the cache or older than the TTL are
+        fetched. A failed batch marks every ticker in it as failed instead of
+        raising, so callers can still render whatever is cached.
+        """
+        tickers = sorted(set(tickers))
+        now = time.time()
+
+        with self._lock:
+            stale = [t for t in tickers if now - self._last_attempt(t) >= self.ttl]
+            if stale:
+                try:
+                    prices, failures = self._fetch(stale)
+                except Exception as e:
+                    prices, failures = {}, {t: f"Download failed: {e}" for t in stale}
+                for t, price in prices.items():
+                    self._quotes[t] = (price, now)
+                    self._failures.pop(t, None)
+                for t, reason in failures.items():
+                    self._failures[t] = (reason, now)
+
+            snap = QuoteSnapshot(fetched_at=now)
+            for t in tickers:
+                if t in self._quotes:
+                    price, ts = self._quotes[t]
+                    snap.prices[t] = price
+                    snap.fetched_at = min(snap.fetched_at, ts)
+                if t in self._failures:
+                    snap.failures[t] = self._failures[t][0]
+            return snap
+
+    def invalidate(self):
+        """Drop all cached quotes."""
+        with self._lock:
+            self._quotes.clear()
+            self._failures.clear()
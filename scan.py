@@ -0,0 +1,135 @@
+"""
+Headless drift scan for scheduled jobs.
+
+Loads the database, fetches the latest price of every held ticker in one
+batched request and evaluates drift for all profiles with the same rules as
+the dashboard (see drift.py). Never imports Streamlit or Plotly.
+
+Usage:
+    python -m scan                                  # JSON report on stdout
+    python -m scan --format csv --output drift.csv
+    python -m scan --storage sqlite --db alphastream_wealth.db --alerts-only
+
+Exit status: 0 when no profile needs rebalancing, 1 when at least one does
+(with --fail-on-unpriced also when a ticker could not be priced), 2 on
+usage errors.
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+
+from drift import drift_scan
+from providers import provider_from_env
+from quotes import QuoteService
+from storage import STORAGE_BACKEND, STORAGE_PATH, open_backend, profile_index
+
+EXIT_OK = 0
+EXIT_ALERTS = 1
+
+CSV_FIELDS = ["profile", "status", "value", "allocated_pct", "drift_tolerance", "last_rebalanced", "drift"]
+
+
+def profile_status(p, needs_rebalance, has_value):
+    """Short status label: alert, deploying, not_rebalanced, ok or empty."""
+    if not p.get("assets") or not has_value:
+        return "empty"
+    if p.get("allocated_pct", 0.0) < 100.0:
+        return "deploying"
+    if needs_rebalance:
+        return "alert" if p.get("last_rebalanced") else "not_rebalanced"
+    return "ok"
+
+
+def run_scan(db, provider=None):
+    """
+    Drift report for every profile in `db`.
+
+    Returns:
+        dict with generated_at, profiles (one record per profile), alerts
+        (profiles needing a rebalance) and unpriced ({ticker: reason})
+    """
+    profiles = profile_index(db)
+    tickers = {t for p in profiles.values() for t in p.get("assets", {})}
+    snapshot = QuoteService(provider=provider).snapshot(tickers)
+    scan = drift_scan(profiles, snapshot.prices)
+
+    records = []
+    for i, name in enumerate(scan.names):
+        p = profiles[name]
+        needs = bool(scan.needs_rebalance[i])
+        records.append({
+            "profile": name,
+            "status": profile_status(p, needs, scan.values[i] != 0),
+            "needs_rebalance": needs,
+            "value": round(float(scan.values[i]), 2),
+            "allocated_pct": p.get("allocated_pct", 0.0),
+            "drift_tolerance": p.get("drift_tolerance", 5.0),
+            "last_rebalanced": p.get("last_rebalanced"),
+            "drift": [
+                {"ticker": t, "drift": round(d, 4), "actual_pct": round(a, 4), "target_pct": tp}
+                for t, d, a, tp in scan.details[name]
+            ],
+        })
+
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "profiles": records,
+        "alerts": sum(r["needs_rebalance"] for r in records),
+        "unpriced": dict(sorted(snapshot.failures.items())),
+    }
+
+
+def write_json(report, out):
+    json.dump(report, out, indent=2)
+    out.write("\n")
+
+
+def write_csv(report, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for record in report["profiles"]:
+        row = dict(record)
+        # e.g. "VTI:+6.10;BND:-6.10" (signed actual minus target, percentage points)
+        row["drift"] = ";".join(
+            f"{d['ticker']}:{d['actual_pct'] - d['target_pct']:+.2f}" for d in record["drift"]
+        )
+        writer.writerow(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan every AlphaStream profile for rebalancing alerts")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--storage", default=STORAGE_BACKEND, help="Storage backend (default: ALPHASTREAM_STORAGE)")
+    parser.add_argument("--db", default=STORAGE_PATH, help="Database path (default: ALPHASTREAM_DB_PATH)")
+    parser.add_argument("--alerts-only", action="store_true", help="Only report profiles needing a rebalance")
+    parser.add_argument("--fail-on-unpriced", action="store_true",
+                        help="Also exit with status 1 when a ticker could not be priced")
+    args = parser.parse_args(argv)
+
+    try:
+        backend = open_backend(args.storage, args.db)
+    except ValueError as e:
+        parser.error(str(e))
+    report = run_scan(backend.load(), provider=provider_from_env())
+    if args.alerts_only:
+        report["profiles"] = [r for r in report["profiles"] if r["needs_rebalance"]]
+
+    writer = write_csv if args.format == "csv" else write_json
+    if args.output == "-":
+        writer(report, sys.stdout)
+    else:
+        with open(args.output, "w", newline="") as f:
+            writer(report, f)
+
+    print(f"Scanned {len(report['profiles'])} profile(s): {report['alerts']} alert(s), "
+          f"{len(report['unpriced'])} unpriced ticker(s)", file=sys.stderr)
+    if report["alerts"] or (args.fail_on_unpriced and report["unpriced"]):
+        return EXIT_ALERTS
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Process-wide database shared by every Streamlit session.
+
+The database is parsed once per process instead of once per session, and
+sessions read it without taking private copies. Writes go through
+`SharedStore.commit`, which applies events copy-on-write (readers keep a
+consistent snapshot) and uses per-profile version counters as a
+compare-and-swap, so a write based on a stale view of a profile raises
+ConflictError instead of silently overwriting another session's change.
+Log messages of committed events are appended to the activity log (see
+activity.py) rather than to the profile documents.
+"""
+import copy
+import threading
+
+from events import apply_event
+from storage import default_backend
+
+
+class ConflictError(Exception):
+    """The profile changed since the caller last saw it."""
+
+    def __init__(self, profile, expected, actual):
+        super().__init__(f"Profile '{profile}' is at version {actual}, expected {expected}")
+        self.profile = profile
+        self.expected = expected
+        self.actual = actual
+
+
+class SharedStore:
+    """Shared, versioned database with compare-and-swap commits."""
+
+    def __init__(self, backend=None, activity=None):
+        self.backend = backend or default_backend()
+        self.activity = activity
+        self._lock = threading.Lock()
+        db = self.backend.load()
+        # Replaced (never mutated) on every commit, so readers always see a consistent pair
+        self._snapshot = (db, {name: 1 for name in db["profiles"]})
+
+    @property
+    def db(self):
+        return self._snapshot[0]
+
+    def snapshot(self):
+        """The current (db, {profile: version}) pair; treat both as read-only."""
+        return self._snapshot
+
+    def version(self, name):
+        """Current version of a profile; 0 if it does not exist."""
+        return self._snapshot[1].get(name, 0)
+
+    def commit(self, events, expected_version):
+        """
+        Apply events for one profile if it is still at `expected_version`.
+
+        Args:
+            events: Events (see events.py) that all target the same profile
+            expected_version: Version the caller based its change on (0 to create)
+
+        Returns:
+            int: The profile's new version
+
+        Raises:
+            ConflictError: Another session committed to the profile first
+        """
+        name = events[0]["profile"]
+        with self._lock:
+            actual = self.version(name)
+            if actual != expected_version:
+                raise ConflictError(name, expected_version, actual)
+
+            current, versions = self._snapshot
+            profiles = current["profiles"].copy()
+            scratch = {"profiles": {name: copy.deepcopy(profiles[name])} if name in profiles else {}}
+            for event in events:
+                apply_event(scratch, event)
+            profiles[name] = scratch["profiles"][name]
+            db = dict(current, profiles=profiles)
+
+            self.backend.save(db, profiles=[name], events=events)
+            if self.activity is not None:
+                self.activity.record(events)
+            self._snapshot = (db, dict(versions, **{name: actual + 1}))
+            return actual + 1
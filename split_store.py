@@ -0,0 +1,168 @@
+"""
+Split storage backend: a small index plus one document per profile.
+
+Startup only reads `index.json`, which holds each profile's summary (the
+fields the Global Dashboard needs: settings plus asset units and targets,
+without purchases, logs or rebalance history). Full profile documents are
+read on first access and kept in an LRU cache, so only opening a profile in
+the Portfolio Manager pays for its detail.
+
+Layout under the split directory:
+    index.json               {"profiles": {name: summary}, "global_logs": [...]}
+    profiles/<name>.json     one full profile per file (name URL-quoted)
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from urllib.parse import quote
+
+from storage import normalize_profile
+
+SPLIT_DIR = "alphastream_profiles"
+PROFILE_CACHE_SIZE = int(os.environ.get("ALPHASTREAM_PROFILE_CACHE", "32"))
+
+# Profile fields left out of the index; everything else is small
+_DETAIL_FIELDS = ("rebalance_logs", "rebalance_stats", "rebalance_events")
+
+
+def profile_summary_entry(p):
+    """Index entry for a profile: its settings plus units and target per asset."""
+    entry = {k: v for k, v in p.items() if k not in _DETAIL_FIELDS and k != "assets"}
+    entry["assets"] = {
+        t: {"units": a.get("units", 0), "target": a.get("target", 0)}
+        for t, a in p.get("assets", {}).items()
+    }
+    entry.setdefault("drift_tolerance", 5.0)
+    entry.setdefault("last_rebalanced", None)
+    entry.setdefault("allocated_pct", 0.0)
+    return entry
+
+
+def _atomic_write_json(path, obj):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".json.tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class LazyProfiles(MutableMapping):
+    """
+    `db["profiles"]` for the split backend.
+
+    Keys and summaries come from the index; `profiles[name]` loads the full
+    document through the backend's cache. Profiles assigned in memory are held
+    until the backend has written them.
+    """
+
+    def __init__(self, backend, index, pending=None):
+        self._backend = backend
+        self._index = index
+        self._pending = pending if pending is not None else {}
+
+    def __getitem__(self, name):
+        if name in self._pending:
+            return self._pending[name]
+        if name not in self._index:
+            raise KeyError(name)
+        return self._backend.profile(name)
+
+    def __setitem__(self, name, profile):
+        self._pending[name] = profile
+        self._index[name] = profile_summary_entry(profile)
+
+    def __delitem__(self, name):
+        del self._index[name]
+        self._pending.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def copy(self):
+        return LazyProfiles(self._backend, dict(self._index), dict(self._pending))
+
+    def summaries(self):
+        """{name: summary} without loading any profile document."""
+        return self._index
+
+    def _written(self, name):
+        """Drop the in-memory copy once the backend has persisted it."""
+        self._pending.pop(name, None)
+
+
+class SplitBackend:
+    """Index file plus per-profile documents, loaded on demand."""
+
+    def __init__(self, root=SPLIT_DIR, cache_size=PROFILE_CACHE_SIZE):
+        self.root = root
+        self.cache_size = cache_size
+        self.index_path = os.path.join(root, "index.json")
+        self.profiles_dir = os.path.join(root, "profiles")
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    def _path(self, name):
+        return os.path.join(self.profiles_dir, quote(name, safe="") + ".json")
+
+    def profile(self, name):
+        """Full profile document, from the LRU cache or disk."""
+        with self._lock:
+            if name in self._cache:
+                self._cache.move_to_end(name)
+                return self._cache[name]
+        with open(self._path(name), "r") as f:
+            prof = normalize_profile(json.load(f))
+        with self._lock:
+            self._remember(name, prof)
+        return prof
+
+    def _remember(self, name, prof):
+        self._cache[name] = prof
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def load(self):
+        index = {"profiles": {}, "global_logs": []}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                index.update(json.load(f))
+        return {"profiles": LazyProfiles(self, index["profiles"]), "global_logs": index["global_logs"]}
+
+    def save(self, data, profiles=None, events=None):
+        """
+        Write changed profile documents, then the index.
+
+        Args:
+            data: Database whose "profiles" is a LazyProfiles or a plain dict
+            profiles: Names of changed profiles (None writes every profile)
+            events: Unused; accepted for interface compatibility
+        """
+        all_profiles = data.get("profiles", {})
+        names = list(all_profiles) if profiles is None else [n for n in profiles if n in all_profiles]
+        for name in names:
+            prof = all_profiles[name]
+            _atomic_write_json(self._path(name), prof)
+            with self._lock:
+                self._remember(name, prof)
+            if isinstance(all_profiles, LazyProfiles):
+                all_profiles._written(name)
+
+        if isinstance(all_profiles, LazyProfiles):
+            summaries = all_profiles.summaries()
+        else:
+            summaries = {name: profile_summary_entry(p) for name, p in all_profiles.items()}
+        _atomic_write_json(self.index_path, {"profiles": summaries, "global_logs": data.get("global_logs", [])})
@@ -0,0 +1,119 @@
+"""
+Cold-start import-time report.
+
+Runs a fresh interpreter with ``-X importtime`` over the modules `app.py`
+imports at the top level (read from its source, so the report follows the
+app) and prints what each one costs on a cold start. Modules the app only
+imports when first needed (Plotly when a chart is drawn, yfinance on the
+first network fetch) can be measured for comparison with --deferred.
+
+Usage:
+    python -m startup
+    python -m startup --deferred --json startup_report.json
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+
+APP_FILE = "app.py"
+
+# Imported lazily by the app; not part of a cold start
+DEFERRED_MODULES = ["plotly.graph_objects", "yfinance"]
+
+
+def app_imports(path=APP_FILE):
+    """Modules imported at the top level of `path`, in source order."""
+    with open(path, "r") as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure(modules):
+    """
+    Import `modules` in order in a fresh interpreter.
+
+    Returns:
+        list of (module, cumulative seconds or None if not installed) in import
+        order; a module already pulled in by an earlier one costs ~0
+    """
+    lines = ["import time as _t"]
+    for m in modules:
+        lines += [
+            "_s = _t.perf_counter()",
+            "try:",
+            f"    import {m}",
+            f"    print('@@', {m!r}, _t.perf_counter() - _s)",
+            "except ImportError:",
+            f"    print('@@', {m!r}, None)",
+        ]
+    proc = subprocess.run([sys.executable, "-c", "\n".join(lines)], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    timings = []
+    for line in proc.stdout.splitlines():
+        # Marked so output printed by the imported modules themselves is skipped
+        if line.startswith("@@ "):
+            _, name, seconds = line.split(" ")
+            timings.append((name, None if seconds == "None" else float(seconds)))
+    return timings
+
+
+def heaviest_modules(modules, limit=15):
+    """The `limit` most expensive individual modules (self time) from -X importtime."""
+    code = "\n".join(f"try:\n    import {m}\nexcept ImportError:\n    pass" for m in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:limit]
+
+
+def report(path=APP_FILE, deferred=False, top=15):
+    modules = app_imports(path)
+    result = {"startup": measure(modules), "heaviest": heaviest_modules(modules, top)}
+    if deferred:
+        # Measured on top of the startup imports, i.e. the extra cost paid on first use
+        result["deferred"] = measure(modules + DEFERRED_MODULES)[len(modules):]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the cold-start import time of the AlphaStream app")
+    parser.add_argument("--app", default=APP_FILE)
+    parser.add_argument("--deferred", action="store_true", help="Also time the lazily imported modules")
+    parser.add_argument("--top", type=int, default=15, help="Heaviest individual modules to list")
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    result = report(args.app, args.deferred, args.top)
+    total = sum(s or 0 for _, s in result["startup"])
+    print(f"Cold-start imports of {args.app}: {total * 1000:.0f} ms")
+    for name, seconds in result["startup"]:
+        print(f"  {name:<28} {'not installed' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+    if "deferred" in result:
+        print("Deferred until first use:")
+        for name, seconds in result["deferred"]:
+            print(f"  {name:<28} {'not installed' if seconds is None else f'{seconds * 1000:8.1f} ms'}")
+    print("Heaviest modules (self time):")
+    for name, self_s, cumulative_s in result["heaviest"]:
+        print(f"  {name:<40} {self_s * 1000:8.1f} ms  (cumulative {cumulative_s * 1000:.1f} ms)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+Persistence layer for the AlphaStream database.
+
+The database is a single document:
+    {"profiles": {name: profile}, "global_logs": [...]}
+
+Activity history and the cross-profile audit stream are not part of it;
+they are kept in the activity log (activity.py).
+
+Interchangeable backends store it, selected with ALPHASTREAM_STORAGE:
+
+- json (default): the whole document in `alphastream_wealth.json`
+- sqlite: normalized tables in `alphastream_wealth.db` (WAL mode), where a
+  save only writes the rows that actually changed
+- journal: an append-only event journal with snapshot compaction (journal.py)
+- split: a summary index plus one lazily loaded document per profile
+  (split_store.py)
+
+Import an existing JSON database into SQLite (or another backend) with:
+    python -m storage import-json alphastream_wealth.json alphastream_wealth.db
+    python -m storage import-json alphastream_wealth.json alphastream_profiles --to split
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+from lots import FIFO, build_ledger
+
+DB_FILE = "alphastream_wealth.json"
+SQLITE_FILE = "alphastream_wealth.db"
+
+STORAGE_BACKEND = os.environ.get("ALPHASTREAM_STORAGE", "json")
+STORAGE_PATH = os.environ.get("ALPHASTREAM_DB_PATH")
+
+
+def normalize_profile(p):
+    """Fill in fields added by later versions of the schema."""
+    p.setdefault("drift_tolerance", 5.0)
+    p.setdefault("rebalance_stats", [])
+    p.setdefault("last_rebalanced", None)
+    p.setdefault("benchmark", None)
+    p.setdefault("benchmarks", [])
+    p.setdefault("min_trade", 0.0)
+    p.setdefault("no_trade_band", 0.0)
+    p.setdefault("lot_method", FIFO)
+    p.setdefault("rebalance_events", [])
+    # ASSET ALLOCATION: Add new tracking field
+    p.setdefault("allocated_pct", 0.0)
+    # ASSET ALLOCATION: Ensure all assets have purchases list
+    for asset_key, asset_data in p.get("assets", {}).items():
+        asset_data.setdefault("purchases", [])
+        # Tax lots: rebuilt from the purchases for assets recorded before the ledger
+        if "lots" not in asset_data:
+            build_ledger(asset_data, default_date=p.get("start_date"))
+    return p
+
+
+class JsonBackend:
+    """The whole database as one JSON document, rewritten on every save."""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+
+    def load(self):
+        base_schema = {"profiles": {}, "global_logs": []}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                try:
+                    data = json.load(f)
+                    data.setdefault("profiles", {})
+                    data.setdefault("global_logs", [])
+                    for p in data["profiles"].values():
+                        normalize_profile(p)
+                    return data
+                except:
+                    return base_schema
+        return base_schema
+
+    def save(self, data, profiles=None, events=None):
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=2)
+
+
+# ===== SQLITE BACKEND =====
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    currency TEXT,
+    principal REAL,
+    yearly_goal_pct REAL,
+    start_date TEXT,
+    drift_tolerance REAL,
+    last_rebalanced TEXT,
+    benchmark TEXT,
+    allocated_pct REAL,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS assets (
+    profile TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    units REAL,
+    target REAL,
+    extra TEXT,
+    PRIMARY KEY (profile, ticker)
+);
+CREATE TABLE IF NOT EXISTS purchases (
+    profile TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    date TEXT,
+    amount REAL,
+    price REAL,
+    quantity REAL,
+    allocated_pct REAL,
+    extra TEXT,
+    PRIMARY KEY (profile, ticker, seq)
+);
+CREATE TABLE IF NOT EXISTS rebalance_events (
+    profile TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    date TEXT,
+    changes TEXT,
+    PRIMARY KEY (profile, seq)
+);
+CREATE TABLE IF NOT EXISTS logs (
+    profile TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    date TEXT,
+    event TEXT,
+    PRIMARY KEY (profile, kind, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_PROFILE_COLUMNS = ("currency", "principal", "yearly_goal_pct", "start_date", "drift_tolerance",
+                    "last_rebalanced", "benchmark", "allocated_pct")
+_PROFILE_NESTED = ("assets", "rebalance_logs", "rebalance_stats", "rebalance_events")
+_PURCHASE_COLUMNS = ("date", "amount", "price", "quantity", "allocated_pct")
+
+# Table -> number of leading key columns
+_KEYS = {"profiles": 1, "assets": 2, "purchases": 3, "rebalance_events": 2, "logs": 3}
+_COLUMNS = {
+    "profiles": ("name", "position") + _PROFILE_COLUMNS + ("extra",),
+    "assets": ("profile", "ticker", "units", "target", "extra"),
+    "purchases": ("profile", "ticker", "seq") + _PURCHASE_COLUMNS + ("extra",),
+    "rebalance_events": ("profile", "seq", "date", "changes"),
+    "logs": ("profile", "kind", "key", "date", "event"),
+}
+
+
+def _extra(d, known):
+    rest = {k: v for k, v in d.items() if k not in known}
+    return json.dumps(rest, sort_keys=True) if rest else None
+
+
+def _log_rows(name, kind, entries):
+    """
+    Rows for a newest-first, capped log list.
+
+    Each entry is keyed by its content (plus an occurrence counter for exact
+    duplicates) so prepending an entry and truncating the tail only inserts one
+    row and deletes one, instead of shifting every position.
+    """
+    rows, seen = [], {}
+    for entry in reversed(entries):
+        if isinstance(entry, dict):
+            when, event = entry.get("date", ""), entry.get("event", "")
+        else:
+            when, event = str(entry)[:16], str(entry)
+        base = f"{when}|{event}"
+        seen[base] = seen.get(base, 0) + 1
+        rows.append((name, kind, f"{base}|{seen[base]}", when, event))
+    return rows
+
+
+def profile_rows(name, position, p):
+    """Flatten one profile into {table: {key: row}}."""
+    tables = {t: {} for t in _KEYS}
+    row = (name, position) + tuple(p.get(c) for c in _PROFILE_COLUMNS) + \
+        (_extra(p, set(_PROFILE_COLUMNS) | set(_PROFILE_NESTED)),)
+    tables["profiles"][row[:1]] = row
+
+    for ticker, a in p.get("assets", {}).items():
+        row = (name, ticker, a.get("units"), a.get("target"), _extra(a, {"units", "target", "purchases"}))
+        tables["assets"][row[:2]] = row
+        for seq, pur in enumerate(a.get("purchases", [])):
+            row = (name, ticker, seq) + tuple(pur.get(c) for c in _PURCHASE_COLUMNS) + \
+                (_extra(pur, set(_PURCHASE_COLUMNS)),)
+            tables["purchases"][row[:3]] = row
+
+    for seq, ev in enumerate(p.get("rebalance_events", [])):
+        row = (name, seq, ev.get("date"), json.dumps(ev.get("changes", {}), sort_keys=True))
+        tables["rebalance_events"][row[:2]] = row
+
+    for kind, field in (("activity", "rebalance_logs"), ("rebalance", "rebalance_stats")):
+        for row in _log_rows(name, kind, p.get(field, [])):
+            tables["logs"][row[:3]] = row
+    return tables
+
+
+class SqliteBackend:
+    """
+    Normalized SQLite storage with row-level change detection.
+
+    The backend remembers every row it last loaded or wrote; `save` rebuilds
+    the rows of the profiles it is told changed and only issues INSERT/DELETE
+    statements for rows that differ.
+    """
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._rows = {}  # profile name -> {table: {key: row}}
+        self._global_logs = None
+
+    def close(self):
+        self._conn.close()
+
+    def load(self):
+        with self._lock:
+            c = self._conn
+            profiles = {}
+            for row in c.execute(f"SELECT {', '.join(_COLUMNS['profiles'])} FROM profiles ORDER BY position"):
+                p = json.loads(row[-1]) if row[-1] else {}
+                p.update(zip(_PROFILE_COLUMNS, row[2:-1]))
+                p.update({"assets": {}, "rebalance_logs": [], "rebalance_stats": [], "rebalance_events": []})
+                profiles[row[0]] = p
+
+            for name, ticker, units, target, extra in c.execute(
+                    "SELECT profile, ticker, units, target, extra FROM assets ORDER BY rowid"):
+                a = json.loads(extra) if extra else {}
+                a.update({"units": units, "target": target, "purchases": []})
+                profiles[name]["assets"][ticker] = a
+
+            for row in c.execute(f"SELECT {', '.join(_COLUMNS['purchases'])} FROM purchases "
+                                 "ORDER BY profile, ticker, seq"):
+                pur = json.loads(row[-1]) if row[-1] else {}
+                pur.update(zip(_PURCHASE_COLUMNS, row[3:-1]))
+                profiles[row[0]]["assets"][row[1]]["purchases"].append(pur)
+
+            for name, seq, when, changes in c.execute(
+                    "SELECT profile, seq, date, changes FROM rebalance_events ORDER BY profile, seq"):
+                profiles[name]["rebalance_events"].append({"date": when, "changes": json.loads(changes)})
+
+            for name, kind, when, event in c.execute(
+                    "SELECT profile, kind, date, event FROM logs ORDER BY date DESC, rowid DESC"):
+                if kind == "activity":
+                    profiles[name]["rebalance_logs"].append({"date": when, "event": event})
+                else:
+                    profiles[name]["rebalance_stats"].append(event)
+
+            row = c.execute("SELECT value FROM meta WHERE key = 'global_logs'").fetchone()
+            global_logs = json.loads(row[0]) if row else []
+
+            for p in profiles.values():
+                normalize_profile(p)
+            self._rows = {name: profile_rows(name, i, p) for i, (name, p) in enumerate(profiles.items())}
+            self._global_logs = json.dumps(global_logs)
+            return {"profiles": profiles, "global_logs": global_logs}
+
+    def save(self, data, profiles=None, events=None):
+        """
+        Persist changes.
+
+        Args:
+            data: The full database document
+            profiles: Names of the profiles that were mutated; None diffs all
+                profiles and also removes profiles no longer present
+            events: Ignored; changes are detected from the rows themselves
+        """
+        all_profiles = data.get("profiles", {})
+        names = list(all_profiles) if profiles is None else list(profiles)
+        with self._lock, self._conn as c:
+            positions = {name: i for i, name in enumerate(all_profiles)}
+            for name in names:
+                old = self._rows.get(name, {t: {} for t in _KEYS})
+                new = profile_rows(name, positions[name], all_profiles[name]) if name in all_profiles \
+                    else {t: {} for t in _KEYS}
+                self._apply(c, old, new)
+                if name in all_profiles:
+                    self._rows[name] = new
+                else:
+                    self._rows.pop(name, None)
+
+            if profiles is None:
+                for name in set(self._rows) - set(all_profiles):
+                    self._apply(c, self._rows.pop(name), {t: {} for t in _KEYS})
+
+            global_logs = json.dumps(data.get("global_logs", []))
+            if global_logs != self._global_logs:
+                c.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('global_logs', ?)", (global_logs,))
+                self._global_logs = global_logs
+
+    @staticmethod
+    def _apply(c, old, new):
+        """Write the difference between two {table: {key: row}} snapshots."""
+        for table, n_keys in _KEYS.items():
+            cols = _COLUMNS[table]
+            before, after = old.get(table, {}), new.get(table, {})
+            where = " AND ".join(f"{col} = ?" for col in cols[:n_keys])
+            removed = [key for key in before if key not in after]
+            if removed:
+                c.executemany(f"DELETE FROM {table} WHERE {where}", removed)
+            changed = [row for key, row in after.items() if before.get(key) != row]
+            if changed:
+                c.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) "
+                    f"VALUES ({', '.join('?' * len(cols))})",
+                    changed,
+                )
+
+
+def import_json(json_path=DB_FILE, sqlite_path=SQLITE_FILE, kind="sqlite"):
+    """One-shot import of a JSON database into a (new or existing) backend, SQLite by default."""
+    data = JsonBackend(json_path).load()
+    backend = open_backend(kind, sqlite_path)
+    try:
+        backend.load()
+        backend.save(data)
+    finally:
+        if hasattr(backend, "close"):
+            backend.close()
+    return len(data["profiles"])
+
+
+def open_backend(kind=STORAGE_BACKEND, path=STORAGE_PATH):
+    """Create the storage backend selected by ALPHASTREAM_STORAGE."""
+    if kind == "json":
+        return JsonBackend(path or DB_FILE)
+    if kind == "sqlite":
+        return SqliteBackend(path or SQLITE_FILE)
+    if kind == "journal":
+        from journal import JOURNAL_DIR, JournalBackend
+        return JournalBackend(path or JOURNAL_DIR)
+    if kind == "split":
+        from split_store import SPLIT_DIR, SplitBackend
+        return SplitBackend(path or SPLIT_DIR)
+    raise ValueError(f"Unknown storage backend '{kind}'")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def default_backend():
+    """The process-wide backend used by load_db/save_db."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = open_backend()
+        return _backend
+
+
+def load_db(backend=None):
+    return (backend or default_backend()).load()
+
+
+def save_db(data, profiles=None, events=None, backend=None):
+    (backend or default_backend()).save(data, profiles, events)
+
+
+def profile_index(data):
+    """
+    {name: profile} view for listing profiles without loading their details.
+
+    Backends that load profiles lazily return summaries (settings plus asset
+    units and targets); the others return the full profiles.
+    """
+    profiles = data["profiles"]
+    return profiles.summaries() if hasattr(profiles, "summaries") else profiles
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AlphaStream storage tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import-json", help="Import a JSON database into SQLite or another backend")
+    imp.add_argument("json_path", nargs="?", default=DB_FILE)
+    imp.add_argument("sqlite_path", nargs="?", default=SQLITE_FILE)
+    imp.add_argument("--to", default="sqlite", choices=["sqlite", "journal", "split"], help="Target backend")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-json":
+        count = import_json(args.json_path, args.sqlite_path, kind=args.to)
+        print(f"Imported {count} profiles from {args.json_path} into {args.sqlite_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Local symbol-universe index.
+
+A list of tradable symbols (symbol, name, exchange, currency) kept in a CSV
+file and loaded into sorted arrays, so ticker validation and autocomplete are
+answered with a binary search instead of a Yahoo Finance round-trip. The
+network is then only needed for the live price of the symbol the user picks.
+
+Fill the index from the NASDAQ Trader symbol directories (all US-listed
+stocks and ETFs) or import your own CSV/pipe-delimited lists:
+    python -m symbols download
+    python -m symbols import tsx_symbols.csv --exchange TSX --currency CAD
+"""
+import argparse
+import csv
+import os
+import tempfile
+import threading
+import urllib.request
+from bisect import bisect_left
+
+SYMBOLS_FILE = os.environ.get("ALPHASTREAM_SYMBOLS", "symbols.csv")
+
+FIELDS = ["symbol", "name", "exchange", "currency"]
+
+NASDAQ_TRADER_URLS = {
+    "nasdaqlisted": "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "otherlisted": "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+}
+
+# Column names used by common symbol lists, mapped to our fields
+_ALIASES = {
+    "symbol": "symbol", "ticker": "symbol", "act symbol": "symbol", "code": "symbol",
+    "name": "name", "security name": "name", "description": "name", "company": "name",
+    "exchange": "exchange", "listing exchange": "exchange", "market": "exchange",
+    "currency": "currency",
+}
+
+# Exchange codes of the NASDAQ Trader "otherlisted" file
+_OTHERLISTED_EXCHANGES = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+
+
+def _rows_from_text(text, exchange=None, currency=None):
+    """Parse a comma- or pipe-delimited symbol list into entry dicts."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    delimiter = "|" if lines[0].count("|") > lines[0].count(",") else ","
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = [_ALIASES.get(h.strip().lower(), h.strip().lower()) for h in next(reader)]
+    if "symbol" not in header:
+        raise ValueError("Symbol list has no symbol/ticker column")
+
+    rows = []
+    for values in reader:
+        record = dict(zip(header, (v.strip() for v in values)))
+        symbol = record.get("symbol", "").upper()
+        # NASDAQ Trader files end with a "File Creation Time" line; test issues are flagged
+        if not symbol or symbol.startswith("FILE CREATION TIME") or record.get("test issue") == "Y":
+            continue
+        listed_on = record.get("exchange") or exchange
+        if record.get("exchange") in _OTHERLISTED_EXCHANGES:
+            listed_on = _OTHERLISTED_EXCHANGES[record["exchange"]]
+        rows.append({
+            "symbol": symbol,
+            "name": record.get("name") or symbol,
+            "exchange": listed_on or "",
+            "currency": (record.get("currency") or currency or "").upper(),
+        })
+    return rows
+
+
+class SymbolUniverse:
+    """Sorted, in-memory symbol index with prefix search."""
+
+    def __init__(self, path=SYMBOLS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._symbols = []   # sorted symbols
+        self._names = []     # sorted (lowercase name, symbol)
+        self._load()
+
+    def _load(self):
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    entries[row["symbol"]] = row
+        self._index(entries)
+
+    def _index(self, entries):
+        with self._lock:
+            self._entries = entries
+            self._symbols = sorted(entries)
+            self._names = sorted((e["name"].lower(), s) for s, e in entries.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, symbol):
+        return symbol in self._entries
+
+    def get(self, symbol):
+        """Entry dict for an exact symbol, or None."""
+        return self._entries.get(symbol)
+
+    def suggest(self, text, limit=10):
+        """
+        Entries whose symbol (first) or name starts with `text`, in sorted order.
+
+        An exact symbol match always comes first.
+        """
+        text = text.strip()
+        if not text:
+            return []
+        symbols, names = self._symbols, self._names
+        found = []
+
+        prefix = text.upper()
+        i = bisect_left(symbols, prefix)
+        while i < len(symbols) and len(found) < limit and symbols[i].startswith(prefix):
+            found.append(symbols[i])
+            i += 1
+
+        prefix = text.lower()
+        i = bisect_left(names, (prefix,))
+        while i < len(names) and len(found) < limit and names[i][0].startswith(prefix):
+            if names[i][1] not in found:
+                found.append(names[i][1])
+            i += 1
+        return [self._entries[s] for s in found]
+
+    def merge(self, rows):
+        """Add or replace entries and rewrite the index file; returns the new size."""
+        entries = dict(self._entries)
+        for row in rows:
+            entries[row["symbol"]] = {k: row.get(k, "") for k in FIELDS}
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(entries[s] for s in sorted(entries))
+        os.replace(tmp, self.path)
+        self._index(entries)
+        return len(entries)
+
+    def import_file(self, path, exchange=None, currency=None):
+        """Import a CSV or pipe-delimited symbol list (e.g. a NASDAQ Trader file)."""
+        with open(path, "r", encoding="utf-8-sig") as f:
+            rows = _rows_from_text(f.read(), exchange, currency)
+        self.merge(rows)
+        return len(rows)
+
+    def download(self, urls=None):
+        """Download and import the NASDAQ Trader symbol directories (US listings, USD)."""
+        rows = []
+        for source, url in (urls or NASDAQ_TRADER_URLS).items():
+            with urllib.request.urlopen(url, timeout=30) as resp:
+                text = resp.read().decode("utf-8", errors="replace")
+            rows.extend(_rows_from_text(text, exchange="NASDAQ" if source == "nasdaqlisted" else None, currency="USD"))
+        self.merge(rows)
+        return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local symbol-universe index")
+    parser.add_argument("--path", default=SYMBOLS_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("download", help="Download US listings from NASDAQ Trader")
+    imp = sub.add_parser("import", help="Import CSV or pipe-delimited symbol lists")
+    imp.add_argument("files", nargs="+")
+    imp.add_argument("--exchange", default=None, help="Exchange for rows without one")
+    imp.add_argument("--currency", default=None, help="Currency for rows without one")
+    find = sub.add_parser("suggest", help="Look up symbols by prefix")
+    find.add_argument("text")
+    args = parser.parse_args(argv)
+
+    universe = SymbolUniverse(args.path)
+    if args.command == "download":
+        count = universe.download()
+        print(f"Imported {count} symbols into {args.path} ({len(universe)} total)")
+    elif args.command == "import":
+        for path in args.files:
+            count = universe.import_file(path, args.exchange, args.currency)
+            print(f"Imported {count} symbols from {path}")
+        print(f"{len(universe)} symbols in {args.path}")
+    else:
+        for e in universe.suggest(args.text):
+            print(f"{e['symbol']:<10} {e['name']} ({e['exchange']}, {e['currency']})")
+
+
+if __name__ == "__main__":
+    main()
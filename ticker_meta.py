@@ -0,0 +1,121 @@
+"""
+Persistent ticker-metadata index.
+
+`yf.Ticker(t).info` is the slowest Yahoo Finance endpoint, yet the app only
+needs a handful of descriptive fields from it. Those fields are kept in a small
+JSON index that is served from memory, filled lazily (or in bulk) on a miss and
+refreshed once an entry is older than the TTL.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from providers import provider_from_env
+
+TICKER_META_FILE = os.environ.get("ALPHASTREAM_TICKER_META", "ticker_meta.json")
+TICKER_META_TTL_SECONDS = float(os.environ.get("ALPHASTREAM_TICKER_META_TTL", str(7 * 24 * 3600)))
+
+_FETCH_WORKERS = 8
+
+# Failed lookups are not retried more often than this, so an unknown symbol
+# does not cost an `.info` round-trip on every rerun
+_FAILURE_RETRY_SECONDS = 3600
+
+
+class TickerMetadataIndex:
+    """In-memory ticker metadata backed by a JSON file, with TTL expiry."""
+
+    def __init__(self, path=TICKER_META_FILE, ttl=TICKER_META_TTL_SECONDS, provider=None):
+        self.path = path
+        self.ttl = ttl
+        self.provider = provider or provider_from_env()
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._failed_at = {}
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+
+    def _is_fresh(self, entry):
+        return entry is not None and time.time() - entry.get("refreshed_at", 0) < self.ttl
+
+    def get_many(self, tickers, fetch_missing=True):
+        """
+        Return {ticker: entry} for the given tickers.
+
+        Missing or expired entries are fetched concurrently when `fetch_missing`
+        is set; a failed fetch falls back to the expired entry if there is one,
+        otherwise the ticker is left out of the result.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        with self._lock:
+            result = {t: self._entries[t] for t in tickers if t in self._entries}
+            now = time.time()
+            stale = [
+                t for t in tickers
+                if not self._is_fresh(self._entries.get(t))
+                and now - self._failed_at.get(t, 0) >= _FAILURE_RETRY_SECONDS
+            ]
+
+        if stale and fetch_missing:
+            def attempt(t):
+                try:
+                    entry = {"name": t, "exchange": None, "currency": None, "asset_type": None}
+                    entry.update(self.provider.info(t))
+                    entry["refreshed_at"] = time.time()
+                    return t, entry
+                except Exception:
+                    return t, None
+
+            with ThreadPoolExecutor(max_workers=min(_FETCH_WORKERS, len(stale))) as pool:
+                fetched = {t: e for t, e in pool.map(attempt, stale) if e is not None}
+
+            with self._lock:
+                for t in stale:
+                    if t not in fetched:
+                        self._failed_at[t] = now
+                if fetched:
+                    self._entries.update(fetched)
+                    self._save()
+                result.update(fetched)
+        return result
+
+    def get(self, ticker, fetch_missing=True):
+        """Return the metadata entry for a ticker, or None if unavailable."""
+        return self.get_many([ticker], fetch_missing).get(ticker)
+
+    def names(self, tickers):
+        """Return {ticker: display name}, falling back to the symbol itself."""
+        entries = self.get_many(tickers)
+        return {t: entries.get(t, {}).get("name") or t for t in tickers}
+
+    def put_many(self, entries):
+        """Insert or refresh entries from data already at hand (e.g. a bulk import)."""
+        now = time.time()
+        with self._lock:
+            for ticker, fields in entries.items():
+                entry = {"name": ticker, "exchange": None, "currency": None, "asset_type": None}
+                entry.update(fields)
+                entry.setdefault("refreshed_at", now)
+                self._entries[ticker] = entry
+            self._save()
+
+    def put(self, ticker, **fields):
+        """Insert or refresh a single entry."""
+        self.put_many({ticker: fields})
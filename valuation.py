@@ -0,0 +1,132 @@
+"""
+Vectorized portfolio valuation.
+
+The NAV series is computed as a single product of a (days x assets) price
+matrix with either a constant holdings vector or a (days x assets) holdings
+matrix reconstructed from each asset's purchase history and the profile's
+rebalance events.
+"""
+import numpy as np
+import pandas as pd
+
+
+def align_prices(prices):
+    """
+    Forward-fill gaps (holidays on one exchange, late listings) and zero-fill
+    the days before an asset's first close so NaNs never poison the NAV.
+    """
+    return prices.ffill().fillna(0.0)
+
+
+def holdings_vector(asset_dict, tickers):
+    """Current units of each ticker, in column order."""
+    return np.array([float(asset_dict[t].get("units", 0.0)) for t in tickers], dtype="float64")
+
+
+def _event_rows(index, when):
+    """Row positions at which dated events take effect (next trading day if closed)."""
+    days = np.array([str(w)[:10] for w in when], dtype="datetime64[D]")
+    return np.searchsorted(index.values.astype("datetime64[D]"), days, side="left")
+
+
+def holdings_over_time(index, asset_dict, tickers, rebalance_events=None):
+    """
+    Build a (days x assets) holdings matrix from purchases and rebalance events.
+
+    Every purchase adds its quantity from its date onwards and every rebalance
+    event applies its signed unit changes from its date onwards. Whatever part
+    of the current `units` is not explained by recorded events (units entered
+    by hand, or history predating event tracking) is assumed held since the
+    first day, so the last row always equals today's holdings.
+
+    Args:
+        index: DatetimeIndex of the price matrix
+        asset_dict: Profile "assets" mapping
+        tickers: Column order of the price matrix
+        rebalance_events: List of {"date": ..., "changes": {ticker: delta_units}}
+
+    Returns:
+        np.ndarray of shape (len(index), len(tickers))
+    """
+    col = {t: j for j, t in enumerate(tickers)}
+    when, cols, deltas = [], [], []
+
+    for t in tickers:
+        for p in asset_dict[t].get("purchases", []):
+            when.append(p["date"])
+            cols.append(col[t])
+            deltas.append(float(p.get("quantity", 0.0)))
+
+    for event in rebalance_events or []:
+        for t, delta in event.get("changes", {}).items():
+            if t in col:
+                when.append(event["date"])
+                cols.append(col[t])
+                deltas.append(float(delta))
+
+    flows = np.zeros((len(index), len(tickers)), dtype="float64")
+    if deltas:
+        rows = _event_rows(index, when)
+        inside = rows < len(index)
+        np.add.at(flows, (rows[inside], np.asarray(cols)[inside]), np.asarray(deltas)[inside])
+
+    held = np.cumsum(flows, axis=0)
+    recorded = np.zeros(len(tickers)) if not len(index) else held[-1]
+    baseline = holdings_vector(asset_dict, tickers) - recorded
+    return np.clip(held + baseline, 0.0, None)
+
+
+def portfolio_value_series(prices, holdings):
+    """
+    Daily portfolio value.
+
+    Args:
+        prices: DataFrame of closes (index: dates, columns: tickers)
+        holdings: Units per ticker, either a vector (constant holdings) or a
+            matrix with one row per date
+
+    Returns:
+        pd.Series of portfolio value indexed like `prices`
+    """
+    px = align_prices(prices).to_numpy(dtype="float64")
+    holdings = np.asarray(holdings, dtype="float64")
+    if holdings.ndim == 1:
+        values = px @ holdings
+    else:
+        values = np.einsum("ij,ij->i", px, holdings)
+    return pd.Series(values, index=prices.index)
+
+
+def portfolio_returns(prices, holdings):
+    """
+    Daily portfolio returns excluding cash flows.
+
+    Each day's return uses the previous day's holdings, so purchases and
+    rebalances change the weights but never show up as performance.
+
+    Args:
+        prices: DataFrame of closes (index: dates, columns: tickers)
+        holdings: Units per ticker, a vector or a matrix with one row per date
+
+    Returns:
+        pd.Series of simple returns indexed by `prices.index[1:]`; days on
+        which the portfolio held nothing are NaN
+    """
+    px = align_prices(prices).to_numpy(dtype="float64")
+    holdings = np.asarray(holdings, dtype="float64")
+    if holdings.ndim == 1:
+        holdings = np.broadcast_to(holdings, px.shape)
+    before = np.einsum("ij,ij->i", px[:-1], holdings[:-1])
+    after = np.einsum("ij,ij->i", px[1:], holdings[:-1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(before > 0, after / before - 1, np.nan)
+    return pd.Series(returns, index=prices.index[1:])
+
+
+def unit_changes(old_units, new_units, min_change=0.0001):
+    """Signed unit change per ticker, ignoring changes below `min_change`."""
+    return {
+        t: new_units[t] - old_units.get(t, 0.0)
+        for t in new_units
+        if abs(new_units[t] - old_units.get(t, 0.0)) > min_change
+    }